@@ -1,4 +1,5 @@
 import builtins
+import select
 import time
 
 from direct.interval.IntervalManager import ivalMgr
@@ -9,9 +10,10 @@ from direct.task.TaskManagerGlobal import taskMgr
 from panda3d.core import (
     ClockObject,
     ConfigVariableBool,
-    GraphicsEngine,
+    ConfigVariableDouble,
     NodePath,
     PandaNode,
+    PStatClient,
     TrueClock,
     VirtualFileSystem,
 )
@@ -26,7 +28,31 @@ class AIBase:
         builtins.__dev__ = ConfigVariableBool("want-dev", __debug__).value
         vfs = VirtualFileSystem.getGlobalPtr()
 
+        # How long to sleep each frame, if we're not using the adaptive
+        # frame loop.
         self.AISleep = 0.04
+
+        # Rather than sleep the same time every frame, the adaptive
+        # frame loop waits until there's something to do: a message
+        # from the server, a doLater coming due, or, if any task runs
+        # every frame, the next tick.
+        self.wantAdaptiveFrames = ConfigVariableBool("want-adaptive-ai-frames", True).value
+
+        # How many times a second the every-frame tasks run.
+        self.tickRate = ConfigVariableDouble("ai-tick-rate", 25.0).value
+
+        # The most frames we run in a second however fast messages come
+        # in, and the longest we wait with nothing to do.
+        self.maxFrameRate = ConfigVariableDouble("ai-max-frame-rate", 200.0).value
+        self.maxIdleTime = ConfigVariableDouble("ai-max-idle-time", 1.0).value
+
+        # Tasks that run every frame only to look for work.  They don't
+        # count as work themselves; see __hasFrameWork().
+        self.pollTaskNames = ("resetPrevTransform", "ivalLoop", "eventManager", "aiFrameWait", "aiTick")
+        self.pollTaskPrefixes = ("readerPollTask",)
+
+        self.frameStartTime = 0.0
+
         self.eventMgr = eventMgr
         self.messenger = messenger
 
@@ -38,7 +64,9 @@ class AIBase:
 
         self.hidden = NodePath("hidden")
 
-        self.graphicsEngine = GraphicsEngine()
+        # Nothing is ever rendered here, so there's no graphics engine;
+        # we tick the clock ourselves (see __tick).
+        self.graphicsEngine = None
 
         clock = ClockObject.getGlobalClock()
 
@@ -59,6 +87,72 @@ class AIBase:
         time.sleep(self.AISleep)
         return task.cont
 
+    def __frameWaitTask(self, task):
+        # The first thing in the frame.  Waits until it's time to run
+        # the rest of it: as soon as a message comes in from the
+        # server, or the next doLater is due, or one tick after the last
+        # frame started if any task runs every frame, but no sooner
+        # than maxFrameRate allows, and no later than maxIdleTime.
+        clock = globalClock
+        earliest = self.frameStartTime + 1.0 / self.maxFrameRate
+        if self.__hasFrameWork():
+            deadline = self.frameStartTime + 1.0 / self.tickRate
+        else:
+            deadline = self.frameStartTime + self.maxIdleTime
+            wakeTime = self.taskMgr.mgr.getNextWakeTime()
+            if wakeTime >= 0:
+                deadline = min(deadline, wakeTime)
+        deadline = max(deadline, earliest)
+
+        now = clock.getRealTime()
+        if now < earliest:
+            time.sleep(earliest - now)
+            now = clock.getRealTime()
+        if now >= deadline:
+            return task.cont
+
+        sock = self.__getServerSocket()
+        if sock is None:
+            time.sleep(deadline - now)
+        else:
+            # Make sure anything we sent this frame has gone out before
+            # we wait for the answer.
+            self.air.flush()
+            select.select([sock], [], [], deadline - now)
+        return task.cont
+
+    def __hasFrameWork(self):
+        # Returns true if something needs to run next frame, whether or
+        # not a message comes in.
+        if not self.eventMgr.eventQueue.isQueueEmpty():
+            return True
+        if ivalMgr.getNumIntervals():
+            return True
+        for task in self.taskMgr.mgr.getActiveTasks():
+            name = task.getName()
+            if name not in self.pollTaskNames and not name.startswith(self.pollTaskPrefixes):
+                return True
+        return False
+
+    def __getServerSocket(self):
+        # Returns the socket our connection to the message director is
+        # on, or None if we can't wait on it.
+        air = getattr(self, "air", None)
+        if air is None or not air.isConnected():
+            return None
+        sock = air.getBdc().GetSocket()
+        if sock < 0:
+            return None
+        return sock
+
+    def __tick(self, task):
+        # Runs right after the wait, at the start of the frame, in
+        # place of the renderFrame() that used to tick the clock.
+        globalClock.tick()
+        self.frameStartTime = globalClock.getFrameTime()
+        PStatClient.mainTick()
+        return task.cont
+
     @staticmethod
     def __resetPrevTransform(task):
         PandaNode.resetAllPrevTransform()
@@ -69,23 +163,22 @@ class AIBase:
         ivalMgr.step()
         return task.cont
 
-    def __igLoop(self, task):
-        self.graphicsEngine.renderFrame()
-        return task.cont
-
     def shutdown(self):
         self.taskMgr.remove("ivalLoop")
-        self.taskMgr.remove("igLoop")
         self.taskMgr.remove("aiSleep")
+        self.taskMgr.remove("aiFrameWait")
+        self.taskMgr.remove("aiTick")
         self.eventMgr.shutdown()
 
     def restart(self):
         self.shutdown()
         self.taskMgr.add(self.__resetPrevTransform, "resetPrevTransform", priority=-51)
         self.taskMgr.add(self.__ivalLoop, "ivalLoop", priority=20)
-        self.taskMgr.add(self.__igLoop, "igLoop", priority=50)
-        if self.AISleep >= 0:
+        if self.wantAdaptiveFrames:
+            self.taskMgr.add(self.__frameWaitTask, "aiFrameWait", priority=55)
+        elif self.AISleep >= 0:
             self.taskMgr.add(self.__sleepCycleTask, "aiSleep", priority=55)
+        self.taskMgr.add(self.__tick, "aiTick", priority=50)
 
         self.eventMgr.restart()
 
@@ -0,0 +1,248 @@
+"""Times the goon feeler casting in the CFO room: the old per-goon
+CollisionTraverser, the per-goon obstacle grid, and the batched numpy
+obstacle grid, with every goon choosing a direction at once (as after
+~bossBattle goons or the opening burst of goons).
+
+Run from the repository root:
+
+    python -m scripts.benchmarkGoonDirections [rounds]
+
+or, to check that both kinds of grid cast strike the same things at
+the same distances as the traverser does over many random rooms:
+
+    python -m scripts.benchmarkGoonDirections --check [rooms]
+"""
+
+import math
+import random
+import sys
+import time
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+from toontown.coghq.cfo.CashbotBossObstacleGrid import CashbotBossObstacleGrid, numpy
+
+GOON_COUNTS = (10, 30, 60)
+BOSS_POS = (120, -315, 0)
+
+# These match DistributedCashbotBossGoonAI, which can't be imported
+# outside of a running AI.
+HEADINGS = [0, 10, -10, 20, -20, 40, -40, 60, -60, 80, -80, 120, -120, 180]
+FEELER_START = 1
+FEELER_LENGTH = 15
+
+# How far apart a grid distance and a traverser distance may be and
+# still count as the same; the traverser works in single precision.
+TOLERANCE = 0.005
+
+
+def makeRoom(numGoons, seed):
+    # Returns (safes, shields, goons): safes and crane shields as
+    # (x, y, z, radius), goons as (x, y, z, h, target or None).
+    rng = random.Random(seed)
+    safes = [(x, y, z, 6) for x, y, z, _h, _p, _r in CraneLeagueGlobals.SAFE_POSHPR]
+    shields = []
+    for x, y, z, h, _p, _r in CraneLeagueGlobals.ALL_CRANE_POSHPR:
+        # The shield sits 6 feet behind the crane's origin.
+        rad = math.radians(h)
+        shields.append((x + 6 * math.sin(rad), y - 6 * math.cos(rad), z, 6))
+
+    goons = []
+    for _ in range(numGoons):
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(15, 40)
+        x = BOSS_POS[0] + dist * math.cos(angle)
+        y = BOSS_POS[1] + dist * math.sin(angle)
+        h = rng.uniform(-180, 180)
+        target = None
+        if rng.random() < 0.5:
+            rad = math.radians(h)
+            target = (x - 10 * math.sin(rad), y + 10 * math.cos(rad))
+        goons.append((x, y, 0, h, target))
+    return safes, shields, goons
+
+
+def makeGrid(safes, shields, goons):
+    grid = CashbotBossObstacleGrid()
+    grid.setSphere("walls", BOSS_POS[0], BOSS_POS[1], BOSS_POS[2], 13)
+    grid.setBoundary(BOSS_POS[0], BOSS_POS[1], BOSS_POS[2], 42)
+    for i, (x, y, z, radius) in enumerate(safes):
+        grid.setSphere(("safe", i), x, y, z, radius)
+    for i, (x, y, z, radius) in enumerate(shields):
+        grid.setSphere(("crane", i), x, y, z, radius)
+    for i, (x, y, z, _h, target) in enumerate(goons):
+        if target is None:
+            target = (x, y)
+        grid.setTube(("goon", i), x, y, target[0], target[1], z, 2)
+    return grid
+
+
+def makeTraverser(safes, shields, goons):
+    # Rebuilds the collision scene the goons used to traverse, one
+    # feeler spray and path tube per goon.
+    from panda3d.core import (
+        BitMask32,
+        CollisionHandlerQueue,
+        CollisionInvSphere,
+        CollisionNode,
+        CollisionSegment,
+        CollisionSphere,
+        CollisionTraverser,
+        CollisionTube,
+        NodePath,
+        Point3,
+        Vec3,
+    )
+
+    scene = NodePath("scene")
+    walls = CollisionNode("walls")
+    walls.addSolid(CollisionSphere(0, 0, 0, 13))
+    walls.addSolid(CollisionInvSphere(0, 0, 0, 42))
+    scene.attachNewNode(walls).setPos(*BOSS_POS)
+
+    for x, y, z, radius in safes + shields:
+        cn = CollisionNode("sphere")
+        cn.addSolid(CollisionSphere(0, 0, 0, radius))
+        scene.attachNewNode(cn).setPos(x, y, z)
+
+    casters = []
+    for x, y, z, h, target in goons:
+        goon = scene.attachNewNode("goon")
+        goon.setPosHpr(x, y, z, h, 0, 0)
+
+        cn = CollisionNode("tubeNode")
+        tube = CollisionTube(0, 0, 0, 0, 0, 0, 2)
+        if target is not None:
+            tube.setPointB(goon.getRelativePoint(scene, Point3(target[0], target[1], z)))
+        cn.addSolid(tube)
+        goon.attachNewNode(cn)
+
+        cn = CollisionNode("feelerNode")
+        feelers = []
+        for heading in HEADINGS:
+            rad = math.radians(heading)
+            dx = -math.sin(rad)
+            dy = math.cos(rad)
+            seg = CollisionSegment(dx * FEELER_START, dy * FEELER_START, 0, dx * FEELER_LENGTH, dy * FEELER_LENGTH, 0)
+            cn.addSolid(seg)
+            feelers.append(seg)
+        cn.setIntoCollideMask(BitMask32(0))
+        feelerNodePath = goon.attachNewNode(cn)
+
+        trav = CollisionTraverser("goon")
+        queue = CollisionHandlerQueue()
+        trav.addCollider(feelerNodePath, queue)
+        casters.append((goon, feelers, trav, queue))
+
+    def castAll():
+        # Returns, for each goon, the distance at which each of its
+        # feelers strikes something (or None), read off the queue the
+        # way the goons used to: the first entry on each feeler wins.
+        result = []
+        for goon, feelers, trav, queue in casters:
+            tubeNode = goon.find("tubeNode").node()
+            tubeNode.setIntoCollideMask(BitMask32(0))
+            trav.traverse(scene)
+            tubeNode.setIntoCollideMask(CollisionNode.getDefaultCollideMask())
+            queue.sortEntries()
+            entries = {}
+            for i in range(queue.getNumEntries() - 1, -1, -1):
+                entry = queue.getEntry(i)
+                entries[entry.getFrom()] = Vec3(entry.getSurfacePoint(goon)).length()
+            result.append([entries.get(seg) for seg in feelers])
+        return result
+
+    return castAll
+
+
+def timeIt(func, rounds):
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000.0
+
+
+def sameDistance(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) <= TOLERANCE
+
+
+def check(numRooms):
+    # Casts every goon's feelers in numRooms random rooms all three
+    # ways, and reports each feeler on which the grid disagrees with
+    # the traverser.  Returns the number of disagreements.
+    numGoons = GOON_COUNTS[-1]
+    feelers = 0
+    mismatches = 0
+    for seed in range(numRooms):
+        safes, shields, goons = makeRoom(numGoons, seed)
+        grid = makeGrid(safes, shields, goons)
+        casters = [(("goon", i), x, y, z, h) for i, (x, y, z, h, _target) in enumerate(goons)]
+        expected = makeTraverser(safes, shields, goons)()
+
+        results = {}
+        results["grid"] = [
+            grid.castFeelers(x, y, z, h, HEADINGS, FEELER_START, FEELER_LENGTH, ignore=key)
+            for key, x, y, z, h in casters
+        ]
+        if numpy is not None:
+            batch = grid.castFeelersBatch(casters, HEADINGS, FEELER_START, FEELER_LENGTH)
+            results["batch"] = [[None if math.isnan(dist) else float(dist) for dist in row] for row in batch]
+
+        for i in range(numGoons):
+            for j in range(len(HEADINGS)):
+                feelers += 1
+                for name, result in results.items():
+                    if not sameDistance(expected[i][j], result[i][j]):
+                        mismatches += 1
+                        print(
+                            "room %d goon %d heading %d: traverser %s, %s %s"
+                            % (seed, i, HEADINGS[j], expected[i][j], name, result[i][j])
+                        )
+
+    print("%d feelers in %d rooms, %d mismatches" % (feelers, numRooms, mismatches))
+    return mismatches
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--check":
+        numRooms = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+        sys.exit(1 if check(numRooms) else 0)
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print("%6s %14s %14s %14s" % ("goons", "traverser ms", "grid ms", "batch ms"))
+    for numGoons in GOON_COUNTS:
+        safes, shields, goons = makeRoom(numGoons, numGoons)
+        grid = makeGrid(safes, shields, goons)
+        casters = [(("goon", i), x, y, z, h) for i, (x, y, z, h, _target) in enumerate(goons)]
+
+        try:
+            traverser = timeIt(makeTraverser(safes, shields, goons), rounds)
+        except ImportError:
+            traverser = None
+
+        def castEach(grid=grid, casters=casters):
+            for key, x, y, z, h in casters:
+                grid.castFeelers(x, y, z, h, HEADINGS, FEELER_START, FEELER_LENGTH, ignore=key)
+
+        def castBatch(grid=grid, casters=casters):
+            grid.castFeelersBatch(casters, HEADINGS, FEELER_START, FEELER_LENGTH)
+
+        each = timeIt(castEach, rounds)
+        batch = timeIt(castBatch, rounds) if numpy is not None else None
+
+        print(
+            "%6d %14s %14s %14s"
+            % (
+                numGoons,
+                "-" if traverser is None else "%.3f" % traverser,
+                "%.3f" % each,
+                "-" if batch is None else "%.3f" % batch,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
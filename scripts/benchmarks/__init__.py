@@ -0,0 +1,160 @@
+"""Micro-benchmarks for the hot paths of the CFO and of logging in,
+run in this process against the headless AI (see scripts/headlessAI),
+with no cluster.  See __main__ for running them.
+
+A benchmark is registered with @benchmark(name) on a setup function,
+which builds whatever the benchmark needs and returns the function to
+time.  The setup raises SkipBenchmark if something the benchmark needs
+isn't there (say, the resources checkout), and the benchmark is
+reported as skipped rather than failed.
+"""
+
+import datetime
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import timeit
+
+from scripts import headlessAI  # noqa: F401 (sets up the builtins for everything below)
+
+# Bump this when a change to the benchmarks themselves makes older
+# results incomparable.
+RESULTS_VERSION = 1
+
+# Each timed sample runs the benchmark enough times to take at least
+# this long.
+MIN_SAMPLE_TIME = 0.05
+
+# (name, setup) in the order they were registered.
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def benchmark(name):
+    # Registers the decorated setup function under name.
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+
+    return register
+
+
+def timeBenchmark(func, repeat):
+    # Returns (best, median, number): the seconds per call of the best
+    # and the median of repeat samples, and the calls per sample.
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_SAMPLE_TIME:
+        number *= 2
+    samples = [timer.timeit(number) / number for _ in range(repeat)]
+    return min(samples), statistics.median(samples), number
+
+
+def runBenchmarks(names=None, repeat=7, log=print):
+    # Runs the benchmarks whose names start with one of names (or all
+    # of them), and returns a results dictionary ready to be saved.
+    results = {}
+    skipped = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+
+        try:
+            func = setup()
+        except SkipBenchmark as e:
+            skipped[name] = str(e)
+            log("%-44s skipped: %s" % (name, e))
+            continue
+
+        best, median, number = timeBenchmark(func, repeat)
+        results[name] = {"best": best, "median": median, "number": number, "repeat": repeat}
+        log("%-44s %12.2f us %12.2f us" % (name, best * 1e6, median * 1e6))
+
+    return {"version": RESULTS_VERSION, "machine": getMachineInfo(), "results": results, "skipped": skipped}
+
+
+def getMachineInfo():
+    # What the results were measured on, so nobody compares a laptop
+    # against a server by accident.
+    info = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "commit": None,
+        "panda3d": None,
+        "numpy": None,
+    }
+
+    try:
+        from panda3d.core import PandaSystem
+
+        info["panda3d"] = PandaSystem.getVersionString()
+    except ImportError:
+        pass
+
+    try:
+        import numpy
+
+        info["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+
+    try:
+        info["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    return info
+
+
+def saveResults(results, filename):
+    with open(filename, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def loadResults(filename):
+    with open(filename) as file:
+        return json.load(file)
+
+
+def compareResults(results, baseline, threshold, log=print):
+    # Compares the best times in results with those in baseline.
+    # Returns the names of the benchmarks that got slower by more than
+    # threshold (0.2 is 20% slower).
+    if baseline.get("version") != results.get("version"):
+        log("the baseline is from a different version of the benchmarks; not comparing")
+        return []
+
+    machine = baseline.get("machine", {})
+    if machine.get("host") != results["machine"]["host"] or machine.get("processor") != results["machine"]["processor"]:
+        log("warning: the baseline was measured on %s (%s)" % (machine.get("host"), machine.get("processor")))
+
+    regressions = []
+    log("%-44s %12s %12s %8s" % ("benchmark", "baseline us", "now us", "change"))
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            log("%-44s %12s %12.2f %8s" % (name, "-", result["best"] * 1e6, "new"))
+            continue
+
+        change = result["best"] / old["best"] - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        log("%-44s %12.2f %12.2f %+7.0f%%%s" % (name, old["best"] * 1e6, result["best"] * 1e6, change * 100, flag))
+
+    return regressions
@@ -0,0 +1,59 @@
+"""Runs the micro-benchmarks, and optionally saves the results and
+compares them with a baseline.
+
+Run from the repository root:
+
+    python -m scripts.benchmarks [names...] [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+
+names are prefixes, e.g. "cfo." or "toonDNA."; with none, everything
+runs.  With --baseline, the exit status is 1 if any benchmark got
+slower than the baseline by more than the threshold.  To make a
+baseline, save a run with --output.
+"""
+
+import argparse
+import sys
+
+from scripts.benchmarks import (
+    BENCHMARKS,
+    cfoBenchmarks,  # noqa: F401
+    compareResults,
+    loadResults,
+    loginBenchmarks,  # noqa: F401
+    magicWordBenchmarks,  # noqa: F401
+    runBenchmarks,
+    saveResults,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the CFO and login micro-benchmarks.")
+    parser.add_argument("names", nargs="*", help="only run benchmarks whose names start with these")
+    parser.add_argument("--repeat", type=int, default=7, help="timed samples per benchmark")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that fails the run, 0.2 is 20%%")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _setup in BENCHMARKS:
+            print(name)
+        return
+
+    print("%-44s %15s %15s" % ("benchmark", "best", "median"))
+    results = runBenchmarks(args.names, args.repeat)
+    if args.output:
+        saveResults(results, args.output)
+        print("saved to %s" % args.output)
+
+    if args.baseline:
+        print()
+        regressions = compareResults(results, loadResults(args.baseline), args.threshold)
+        if regressions:
+            print("%d benchmarks got slower than the baseline: %s" % (len(regressions), ", ".join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Benchmarks for the CFO: goons choosing where to walk, treasure,
+hits on the boss, and rolling modifiers into a ruleset."""
+
+import functools
+import math
+import random
+
+from scripts import headlessAI
+from scripts.benchmarks import SkipBenchmark, benchmark
+
+from toontown.coghq.cfo import CraneLeagueGlobals, DistributedCashbotBossGoonAI
+from toontown.coghq.cfo.CashbotBossObstacleGrid import numpy
+from toontown.toonbase.globals import TTGlobalsBosses
+
+# Goons in the room, from a quiet opening to ~bossBattle.
+GOON_DENSITIES = (10, 30, 60)
+
+# A toon's avId, for updates that need a sender.
+AV_ID = 10000
+
+
+def makeBoss(seed=1):
+    # Returns a boss fighting two toons, in the middle of the round.
+    air = headlessAI.HeadlessAIRepository()
+    toons = [headlessAI.HeadlessToon(air, AV_ID + i) for i in range(2)]
+    boss = headlessAI.makeBoss(air, toons)
+    boss.seedOverride = seed
+    boss.b_setState("BattleThree")
+    return boss
+
+
+def makeGoons(boss, numGoons, seed):
+    # Fills the room with numGoons goons standing around the boss, half
+    # of them walking somewhere.  Returns the goons.
+    rng = random.Random(seed)
+    while len(boss.goons) < numGoons:
+        goon = DistributedCashbotBossGoonAI.DistributedCashbotBossGoonAI(boss.air, boss)
+        goon.generateWithRequired(boss.zoneId)
+        boss.goons.append(goon)
+
+    for goon in boss.goons[:numGoons]:
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(15, 40)
+        x = 120 + dist * math.cos(angle)
+        y = -315 + dist * math.sin(angle)
+        goon.setPosHpr(x, y, 0, rng.uniform(-180, 180), 0, 0)
+        goon.isObstacle = 1
+        goon.isWalking = rng.random() < 0.5
+        if goon.isWalking:
+            rad = math.radians(goon.getH())
+            goon.target = (x - 10 * math.sin(rad), y + 10 * math.cos(rad))
+        goon.updateObstacle()
+    return boss.goons[:numGoons]
+
+
+def setDebug(boss, debug):
+    # Turns all of the ruleset's activity log debug flags on or off.
+    flags = dict.fromkeys(CraneLeagueGlobals.ACTIVITY_CATEGORY_FLAGS.values(), debug)
+    boss.ruleset = boss.ruleset.derive(**flags)
+    boss.updateActivityLogging()
+
+
+def setupChooseDirection(numGoons):
+    # Every goon in the room choosing its next direction, one at a
+    # time, as without numpy.
+    boss = makeBoss()
+    goons = makeGoons(boss, numGoons, numGoons)
+
+    def chooseDirections():
+        for goon in goons:
+            goon.chooseDirection()
+
+    return chooseDirections
+
+
+def setupChooseGoonDirections(numGoons):
+    # The same, in one batch.
+    if numpy is None:
+        raise SkipBenchmark("numpy isn't installed")
+
+    boss = makeBoss()
+    goons = makeGoons(boss, numGoons, numGoons)
+    return functools.partial(boss.chooseGoonDirections, goons)
+
+
+for _numGoons in GOON_DENSITIES:
+    benchmark("cfo.goon.chooseDirection[%d goons]" % _numGoons)(functools.partial(setupChooseDirection, _numGoons))
+    benchmark("cfo.boss.chooseGoonDirections[%d goons]" % _numGoons)(
+        functools.partial(setupChooseGoonDirections, _numGoons)
+    )
+
+
+@benchmark("cfo.boss.makeTreasure")
+def setupMakeTreasure():
+    # A goon dropping a treasure, which is then grabbed and recycled,
+    # so every drop after the first reuses a treasure object.
+    boss = makeBoss()
+    (goon,) = makeGoons(boss, 1, 1)
+    goon.strength = boss.ruleset.MAX_GOON_DAMAGE
+
+    def makeTreasure():
+        boss.makeTreasure(goon)
+        boss.recycledTreasures.extend(boss.treasures.values())
+        boss.treasures.clear()
+
+    return makeTreasure
+
+
+def setupRecordHit(debug):
+    # A goon hit from a crane that doesn't stun the boss, and the
+    # batched updates it sends; with the debug flags on, also the
+    # activity log.
+    boss = makeBoss()
+    setDebug(boss, debug)
+    crane = boss.cranes[0]
+    air = boss.air
+
+    def recordHit():
+        boss.bossDamage = 0
+        boss.attackCode = TTGlobalsBosses.BossCogNoAttack
+        air.sender = AV_ID
+        boss.recordHit(3, 0.5, crane.doId)
+        air.sender = 0
+        boss.eventBatcher.flush()
+
+    return recordHit
+
+
+benchmark("cfo.boss.recordHit")(functools.partial(setupRecordHit, False))
+benchmark("cfo.boss.recordHit[debug]")(functools.partial(setupRecordHit, True))
+
+
+@benchmark("cfo.boss.considerStun")
+def setupConsiderStun():
+    boss = makeBoss()
+    normalCrane = boss.cranes[0]
+    sideCrane = boss.cranes[4]
+
+    def considerStun():
+        boss.considerStun(normalCrane, 10, 0.5)
+        boss.considerStun(normalCrane, 40, 1.0)
+        boss.considerStun(sideCrane, 10, 0.9)
+
+    return considerStun
+
+
+@benchmark("cfo.modifiers.rollAndApply")
+def setupRollAndApply():
+    # Rolling a round's modifiers and applying them, as at the start of
+    # a round.  After the first few rolls, most rulesets come out of
+    # the cache.
+    boss = makeBoss()
+    boss.numModsWanted = 3
+
+    def rollAndApply():
+        boss.rollRandomModifiers()
+        boss.applyModifiers()
+
+    return rollAndApply
+
+
+@benchmark("cfo.modifiers.compileRuleset")
+def setupCompileRuleset():
+    # Building a ruleset with modifiers from scratch, past the cache:
+    # the ruleset, the modifiers applied, validate() and freeze().
+    boss = makeBoss()
+    boss.numModsWanted = 3
+    boss.rollRandomModifiers()
+    modifierKey = CraneLeagueGlobals.getModifierKey(boss.modifiers)
+    compileRuleset = CraneLeagueGlobals.compileRuleset.__wrapped__
+    return functools.partial(compileRuleset, boss.rulesetClass, modifierKey)
+
+
+@benchmark("cfo.ruleset.validate")
+def setupValidate():
+    ruleset = CraneLeagueGlobals.CFORuleset()
+    return ruleset.validate
+
+
+def setupStateTransitions(debug):
+    # A safe picked up, dropped and let go, and a goon stomped, as the
+    # clients' requests would move them along; with the debug flags
+    # on, each transition is also logged.
+    boss = makeBoss()
+    safe = boss.safes[1]
+    crane = boss.cranes[0]
+    (goon,) = makeGoons(boss, 1, 1)
+    setDebug(boss, debug)
+
+    def stateTransitions():
+        safe.demand("Grabbed", AV_ID, crane.doId)
+        safe.demand("Dropped", AV_ID, crane.doId)
+        safe.demand("SlidingFloor", AV_ID)
+        safe.demand("WaitFree")
+        safe.demand("Free")
+        goon.demand("Battle")
+        goon.demand("Stunned")
+        goon.demand("Recovery")
+
+    return stateTransitions
+
+
+benchmark("cfo.objects.stateTransitions")(functools.partial(setupStateTransitions, False))
+benchmark("cfo.objects.stateTransitions[debug]")(functools.partial(setupStateTransitions, True))
@@ -0,0 +1,105 @@
+"""Benchmarks for what the servers do while a toon logs in or is made:
+checking and unpacking its DNA, and looking names up in the name
+lists."""
+
+import builtins
+import os
+import random
+
+from panda3d.core import VirtualFileSystem, getModelPath
+
+from scripts.benchmarks import SkipBenchmark, benchmark
+
+from toontown.toon import ToonDNA
+
+# Where the resources checkout goes, for NameMasterEnglish.txt.
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "resources")
+
+# Different DNA for each call, so we're not timing one lucky toon.
+NUM_TOONS = 100
+
+
+def makeNetStrings():
+    rng = random.Random(1)
+    netStrings = []
+    for i in range(NUM_TOONS):
+        dna = ToonDNA.ToonDNA()
+        dna.newToonRandom(seed=rng.getrandbits(32), gender=rng.choice(("m", "f")))
+        netStrings.append(dna.makeNetString())
+    return netStrings
+
+
+@benchmark("toonDNA.makeNetString")
+def setupMakeNetString():
+    toons = [ToonDNA.ToonDNA(netString) for netString in makeNetStrings()]
+
+    def makeNetString():
+        for dna in toons:
+            dna.makeNetString()
+
+    return makeNetString
+
+
+@benchmark("toonDNA.isValidNetString")
+def setupIsValidNetString():
+    netStrings = makeNetStrings()
+
+    def isValidNetString():
+        for netString in netStrings:
+            ToonDNA.ToonDNA.isValidNetString(netString)
+
+    return isValidNetString
+
+
+@benchmark("toonDNA.makeFromNetString")
+def setupMakeFromNetString():
+    netStrings = makeNetStrings()
+    dna = ToonDNA.ToonDNA()
+
+    def makeFromNetString():
+        for netString in netStrings:
+            dna.makeFromNetString(netString)
+
+    return makeFromNetString
+
+
+def makeNameGenerator():
+    # The name generator reads its lists out of the resources, and
+    # loads a font when it's imported, so it needs a loader.
+    if not os.path.exists(os.path.join(RESOURCES, "phase_3", "etc", "NameMasterEnglish.txt")):
+        raise SkipBenchmark("needs the resources checkout in %s" % RESOURCES)
+
+    from direct.showbase.Loader import Loader
+
+    getModelPath().appendDirectory(RESOURCES)
+    builtins.vfs = VirtualFileSystem.getGlobalPtr()
+    if not hasattr(builtins, "loader"):
+        builtins.loader = Loader(None)
+
+    from toontown.makeatoon.NameGenerator import NameGenerator
+
+    return NameGenerator()
+
+
+@benchmark("names.generateLists")
+def setupGenerateLists():
+    return makeNameGenerator().generateLists
+
+
+@benchmark("names.returnUniqueID")
+def setupReturnUniqueID():
+    # Looking up a name from each list, as when a toon's name is
+    # checked.
+    nameGenerator = makeNameGenerator()
+    names = [
+        (nameGenerator.boyTitles[-1], 0),
+        (nameGenerator.girlFirsts[-1], 1),
+        (nameGenerator.lastPrefixes[-1], 2),
+        (nameGenerator.lastSuffixes[-1], 3),
+    ]
+
+    def returnUniqueID():
+        for name, listNumber in names:
+            nameGenerator.returnUniqueID(name, listNumber)
+
+    return returnUniqueID
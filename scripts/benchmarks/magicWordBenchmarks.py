@@ -0,0 +1,33 @@
+"""Benchmarks for parsing magic words out of chat."""
+
+from scripts.benchmarks import SkipBenchmark, benchmark
+
+# A mix of what people type: good words, with and without arguments,
+# and the mistakes that get turned away.
+WORDS = (
+    "~sethp 50",
+    "~maxhp 137",
+    "~toonup",
+    '~sethp "12"',
+    "~sethp lots",
+    "~sethp 1 2",
+    "~nosuchword 1",
+    "not a magic word",
+)
+
+
+@benchmark("magicWords.parseArgs")
+def setupParseArgs():
+    try:
+        import toontown.chat.magic.MagicWordImportsAI  # noqa: F401 (registers the words)
+        from toontown.chat.magic.MagicWordRunner import MagicWordRunner
+    except ImportError as e:
+        # The words import the client's Toon, which needs the game's
+        # own build of panda3d.
+        raise SkipBenchmark("can't import the magic words: %s" % e) from e
+
+    def parseArgs():
+        for word in WORDS:
+            MagicWordRunner.parseArgs(word)
+
+    return parseArgs
@@ -0,0 +1,334 @@
+"""Runs the CFO's AI objects in this process, with no Astron, no clients
+and nothing rendered: a stand-in for the AI repository, toons that are
+just enough of a toon for the boss, and a clock that only moves when
+told to, so a round goes as fast as the CPU allows.
+
+Import this before anything from toontown, since it sets up the
+builtins the AI code expects.  It's used by the other headless tools
+in scripts/, e.g.:
+
+    python -m scripts.replayCraneRound recording.crr
+"""
+
+import builtins
+import os
+from types import SimpleNamespace
+
+from panda3d.core import ClockObject, Datagram, DatagramIterator, Filename, NodePath, loadPrcFileData
+
+loadPrcFileData("headlessAI", "default-directnotify-level warning\nnotify-level warning\n")
+
+from direct.directnotify.DirectNotifyGlobal import directNotify  # noqa: E402
+from direct.showbase.MessengerGlobal import messenger  # noqa: E402
+from direct.task.TaskManagerGlobal import taskMgr  # noqa: E402
+from panda3d.direct import CConnectionRepository, DCPacker  # noqa: E402
+
+globalClock = ClockObject.getGlobalClock()
+globalClock.setMode(ClockObject.MSlave)
+
+builtins.directNotify = directNotify
+builtins.messenger = messenger
+builtins.taskMgr = taskMgr
+builtins.globalClock = globalClock
+builtins.__dev__ = False
+builtins.simbase = SimpleNamespace(air=None)
+
+DC_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc", "toontown.dc")
+
+# The stand-in repository hands out doIds from here up.
+FIRST_DO_ID = 100000000
+
+
+def step(dt):
+    # Moves the clock on by dt seconds and runs one frame.
+    globalClock.setFrameTime(globalClock.getFrameTime() + dt)
+    taskMgr.step()
+
+
+def runUntil(frameTime, frameLength):
+    # Runs frames of frameLength seconds until the next one would end
+    # after frameTime.  Returns the number of frames run.  The clock
+    # only ever moves on a whole frame, so it reads exactly as it did
+    # in a run with the same frames; even a tiny nudge to line it up
+    # with frameTime can move a goon's arrival to another frame.  (A
+    # frame that would end within half a millisecond of frameTime
+    # still runs, as recordings only keep the time to the millisecond.)
+    frames = 0
+    while globalClock.getFrameTime() + frameLength <= frameTime + 0.0005:
+        step(frameLength)
+        frames += 1
+    return frames
+
+
+def packField(do, fieldName, args):
+    # Returns the field number and arguments of the indicated update to
+    # do, packed as a client would send them.
+    field = do.dclass.getFieldByName(fieldName)
+    packer = DCPacker()
+    packer.rawPackUint16(field.getNumber())
+    packer.beginPack(field)
+    field.packArgs(packer, args)
+    if not packer.endPack():
+        raise ValueError("Could not pack %s%s" % (fieldName, tuple(args)))
+    return packer.getBytes()
+
+
+class HeadlessResultStore:
+    """Holds on to crane round results, rather than writing them to a
+    database."""
+
+    def __init__(self):
+        self.results = []
+
+    def addResult(self, *args):
+        self.results.append(args)
+
+
+class HeadlessAIRepository(CConnectionRepository):
+    """Just enough of ToontownAIRepository for the boss and its objects.
+    Generates and deletes take effect right away; updates are packed
+    just as they would be for the wire, counted, and thrown away."""
+
+    notify = directNotify.newCategory("HeadlessAIRepository")
+
+    def __init__(self):
+        CConnectionRepository.__init__(self, False, False)
+        self.dcFile = self.getDcFile()
+        self.dcFile.read(Filename.fromOsSpecific(DC_FILE))
+
+        # Each dclass under its own name, and with AI on the end, the
+        # way the real repository does it for dcSuffix="AI".
+        self.dclassesByName = {}
+        for i in range(self.dcFile.getNumClasses()):
+            dclass = self.dcFile.getClass(i)
+            self.dclassesByName[dclass.getName()] = dclass
+            self.dclassesByName[dclass.getName() + "AI"] = dclass
+
+        self.ourChannel = 1000000
+        self.districtId = 2000000
+        self.nextDoId = FIRST_DO_ID
+        self.doId2do = {}
+        self.craneLeagueResults = HeadlessResultStore()
+        self.roundRecorders = {}
+
+        # The avatar whose update we're handling, if any.
+        self.sender = 0
+
+        # (dclass name, field name) -> [messages, bytes], for
+        # everything we've been asked to send.
+        self.sentUpdates = {}
+
+        # Called with (do, fieldName, args) for each update sent, if
+        # set.
+        self.updateHook = None
+
+        simbase.air = self
+
+    def allocateChannel(self):
+        self.nextDoId += 1
+        return self.nextDoId
+
+    def deallocateChannel(self, channel):
+        pass
+
+    def allocateZone(self):
+        return self.allocateChannel()
+
+    def deallocateZone(self, zoneId):
+        pass
+
+    def generateWithRequired(self, do, parentId, zoneId, optionalFields=()):
+        self.generateWithRequiredAndId(do, self.allocateChannel(), parentId, zoneId, optionalFields)
+
+    def generateWithRequiredAndId(self, do, doId, parentId, zoneId, optionalFields=()):
+        do.doId = doId
+        self.addDOToTables(do, (parentId, zoneId))
+        recorder = self.roundRecorders.get(zoneId)
+        if recorder:
+            recorder.recordGenerate(do)
+
+    def addDOToTables(self, do, location):
+        self.doId2do[do.doId] = do
+        do.parentId, do.zoneId = location
+
+    def storeObjectLocation(self, do, parentId, zoneId):
+        do.parentId = parentId
+        do.zoneId = zoneId
+
+    def sendSetLocation(self, do, parentId, zoneId):
+        pass
+
+    def requestDelete(self, do):
+        if self.doId2do.pop(do.doId, None) is do:
+            do.delete()
+
+    def sendUpdate(self, do, fieldName, args):
+        self.sendUpdateToChannel(do, do.doId, fieldName, args)
+
+    def sendUpdateToChannel(self, do, channelId, fieldName, args):
+        field = do.dclass.getFieldByName(fieldName)
+        datagram = field.aiFormatUpdate(do.doId, channelId, self.ourChannel, args)
+        key = (do.dclass.getName(), fieldName)
+        counts = self.sentUpdates.get(key)
+        if counts is None:
+            counts = self.sentUpdates[key] = [0, 0]
+        counts[0] += 1
+        counts[1] += datagram.getLength()
+
+        if channelId == do.doId:
+            recorder = self.roundRecorders.get(do.zoneId)
+            if recorder:
+                recorder.recordOutbound(do, fieldName, args)
+        if self.updateHook:
+            self.updateHook(do, fieldName, args)
+
+    def receiveUpdate(self, avId, do, data):
+        # Hands do a field update from avId, packed as the field number
+        # followed by its arguments, as a client would have sent it.
+        recorder = self.roundRecorders.get(do.zoneId)
+        if recorder:
+            recorder.recordInbound(do, avId, data)
+
+        self.sender = avId
+        try:
+            datagram = Datagram(data)
+            do.dclass.receiveUpdate(do, DatagramIterator(datagram))
+        finally:
+            self.sender = 0
+
+    def clientSend(self, avId, do, fieldName, args=()):
+        # As if avId's client sent do the indicated update.
+        self.receiveUpdate(avId, do, packField(do, fieldName, args))
+
+    def getAvatarIdFromSender(self):
+        return self.sender
+
+    def getMsgSender(self):
+        return self.sender
+
+    def getAvatarExitEvent(self, avId):
+        return "distObjDelete-%d" % avId
+
+    def writeServerEvent(self, logtype, *args, **kwargs):
+        self.notify.info("server event %s: %s" % (logtype, args))
+
+    def setAllowClientSend(self, avId, distObj, fieldNameList=None):
+        pass
+
+    def startMessageBundle(self, name):
+        pass
+
+    def sendMessageBundle(self, senderChannel):
+        pass
+
+    def doFindAllInstances(self, cls):
+        return [do for do in self.doId2do.values() if isinstance(do, cls)]
+
+
+class HeadlessToon(NodePath):
+    """Stands in for a DistributedToonAI in the boss's eyes: a position,
+    laff, and the ghost and immortal flags, and no more.  Smooth
+    position updates sent to it move it around."""
+
+    def __init__(self, air, avId, hp=137, maxHp=137):
+        NodePath.__init__(self, "toon-%d" % avId)
+        self.air = air
+        self.doId = avId
+        self.parentId = air.districtId
+        self.zoneId = 0
+        self.dclass = air.dclassesByName["DistributedToon"]
+        self.hp = hp
+        self.maxHp = maxHp
+        self.ghostMode = False
+        self.immortalMode = False
+        air.doId2do[avId] = self
+
+    def delete(self):
+        # The toon has logged out.
+        if self.air.doId2do.pop(self.doId, None) is self:
+            messenger.send(self.air.getAvatarExitEvent(self.doId))
+
+    def getHp(self):
+        return self.hp
+
+    def setHp(self, hp):
+        self.hp = hp
+
+    def b_setHp(self, hp):
+        self.setHp(hp)
+
+    def getMaxHp(self):
+        return self.maxHp
+
+    def b_setMaxHp(self, maxHp):
+        self.maxHp = maxHp
+
+    def takeDamage(self, deduction):
+        if not self.immortalMode:
+            self.hp = max(0, self.hp - deduction)
+
+    def toonUp(self, hpGained):
+        if self.hp > 0:
+            self.hp = min(self.maxHp, self.hp + hpGained)
+
+    def b_setGhostMode(self, flag):
+        self.ghostMode = flag
+
+    def b_setImmortalMode(self, flag):
+        self.immortalMode = flag
+
+    # The smooth position updates a client sends for its toon.  Any
+    # other field sent to the toon has no method here, and is ignored.
+    def setSmStop(self, timestamp=None):
+        pass
+
+    def setSmH(self, h, timestamp=None):
+        self.setH(h)
+
+    def setSmZ(self, z, timestamp=None):
+        self.setZ(z)
+
+    def setSmXY(self, x, y, timestamp=None):
+        self.setX(x)
+        self.setY(y)
+
+    def setSmXZ(self, x, z, timestamp=None):
+        self.setX(x)
+        self.setZ(z)
+
+    def setSmPos(self, x, y, z, timestamp=None):
+        self.setPos(x, y, z)
+
+    def setSmHpr(self, h, p, r, timestamp=None):
+        self.setHpr(h, p, r)
+
+    def setSmXYH(self, x, y, h, timestamp=None):
+        self.setX(x)
+        self.setY(y)
+        self.setH(h)
+
+    def setSmXYZH(self, x, y, z, h, timestamp=None):
+        self.setPos(x, y, z)
+        self.setH(h)
+
+    def setSmPosHpr(self, x, y, z, h, p, r, timestamp=None):
+        self.setPosHpr(x, y, z, h, p, r)
+
+    def setSmPosHprL(self, l, x, y, z, h, p, r, timestamp=None):
+        self.setPosHpr(x, y, z, h, p, r)
+
+
+def makeBoss(air, toons, bossClass=None):
+    # Makes a boss with the indicated toons in a zone of its own, as
+    # the lobby manager would, and leaves it in the Off state.
+    if bossClass is None:
+        from toontown.coghq.cfo.DistributedCashbotBossCLAI import DistributedCashbotBossCLAI as bossClass
+
+    zoneId = air.allocateZone()
+    boss = bossClass(air)
+    for toon in toons:
+        toon.zoneId = zoneId
+        boss.addToon(toon.doId)
+    boss.acceptNewToons()
+    boss.generateWithRequired(zoneId)
+    return boss
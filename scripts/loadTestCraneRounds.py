@@ -0,0 +1,406 @@
+"""Finds out how many crane rounds one AI process can keep up with.
+Runs any number of CFO rooms at once, headless (see headlessAI), each
+with scripted bots playing the round: walking to a crane, grabbing
+goons and safes and swinging them at the boss, getting off to stomp
+goons and pick up treasure, and getting hit by gears and goons, with
+about the timing of real players.  The bots send the AI the same
+packed updates a client would.
+
+Reports how long the AI took over each frame (all rooms together),
+the messages and bytes per second each dclass sent and received, and
+the memory each room cost.  With --capacity, keeps doubling the rooms
+until the slowest frames no longer fit in the frame budget, and reports
+the most rooms that did.
+
+Run from the repository root:
+
+    python -m scripts.loadTestCraneRounds [--rooms 20] [--toons 2] [--seconds 300] [--capacity] [--record DIR]
+
+This runs everything in one process, with no Astron and no real
+clients, so it measures the AI alone: logging in, the elevator and the
+message director aren't part of the number.
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+
+from scripts import headlessAI
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+from toontown.toonbase.globals import TTGlobalsBosses
+
+# Seconds between position updates from a toon on foot, as
+# DistributedSmoothNode broadcasts them.
+POS_PERIOD = 0.2
+
+# Avatar ids are handed out from here up, well below the doIds of the
+# headless repository.
+FIRST_AV_ID = 10000
+
+
+class CraneBot:
+    """One scripted player.  The bot reads what it needs straight off
+    the AI objects, which is what a client would know from their
+    broadcasts anyway, and sends its updates through the room."""
+
+    def __init__(self, room, toon, index, rng):
+        self.room = room
+        self.toon = toon
+        self.avId = toon.doId
+        self.index = index
+        self.rng = rng
+        self.reset()
+
+    def reset(self):
+        # Starts over, as at the beginning of a round.
+        self.script = self.play()
+        self.wakeTime = 0.0
+        self.onFoot = True
+        self.nextPosTime = 0.0
+        self.cranes = self.room.boss.cranes
+        self.lastAttack = None
+        self.zapTime = None
+        self.zapCode = None
+
+    def send(self, do, fieldName, args=()):
+        self.room.send(self.avId, do, fieldName, args)
+
+    def think(self, now):
+        boss = self.room.boss
+        if boss.cranes is not self.cranes:
+            # The round started over, with all new cranes and safes.
+            self.reset()
+        if self.toon.getHp() <= 0 or self.avId not in boss.involvedToons:
+            return
+
+        self.now = now
+        self.__watchAttacks(now)
+
+        if self.onFoot and now >= self.nextPosTime:
+            self.nextPosTime = now + POS_PERIOD
+            x, y = self.toon.getX() + self.rng.uniform(-3, 3), self.toon.getY() + self.rng.uniform(-3, 3)
+            self.send(self.toon, "setSmPosHpr", [x, y, 0, self.rng.uniform(-180, 180), 0, 0, 0])
+
+        while now >= self.wakeTime:
+            self.wakeTime = now + next(self.script)
+
+    def __watchAttacks(self, now):
+        # Gets hit by some of the gears the boss throws at us, and
+        # some of his jumps.
+        boss = self.room.boss
+        attack = (boss.attackCode, boss.attackAvId)
+        if attack != self.lastAttack:
+            self.lastAttack = attack
+            if boss.attackCode == TTGlobalsBosses.BossCogSlowDirectedAttack and boss.attackAvId == self.avId:
+                if self.rng.random() < 0.5:
+                    self.zapTime = now + self.rng.uniform(1.0, 2.0)
+                    self.zapCode = boss.attackCode
+            elif boss.attackCode == TTGlobalsBosses.BossCogAreaAttack and self.onFoot:
+                if self.rng.random() < 0.5:
+                    self.zapTime = now + 1.0
+                    self.zapCode = boss.attackCode
+
+        if self.zapTime is not None and now >= self.zapTime:
+            self.zapTime = None
+            x, y, z = self.toon.getPos()
+            self.send(boss, "zapToon", [x, y, z, 0, 0, 0, 0, -1, self.zapCode, 0])
+
+    def play(self):
+        # The bot's part in the round.  Yields the seconds to wait
+        # before going on.
+        while True:
+            # Walk over to a crane and get on.
+            self.onFoot = True
+            yield self.rng.uniform(1.5, 3.0)
+            crane = self.__findCrane()
+            if crane is None:
+                yield 1.0
+                continue
+            self.send(crane, "requestControl")
+            yield 0.1
+            if crane.avId != self.avId:
+                continue
+
+            self.onFoot = False
+            x, y, z, h, _p, _r = CraneLeagueGlobals.ALL_CRANE_POSHPR[crane.index]
+            self.toon.setPosHpr(x, y, z, h, 0, 0)
+            getOffTime = self.now + self.rng.uniform(20.0, 40.0)
+            while self.now < getOffTime and crane.avId == self.avId:
+                yield from self.__swingSomething(crane)
+
+            if crane.avId == self.avId:
+                self.send(crane, "requestFree")
+
+            # Stomp some goons and grab some treasure on foot.
+            self.onFoot = True
+            getOnTime = self.now + self.rng.uniform(4.0, 8.0)
+            while self.now < getOnTime:
+                yield self.rng.uniform(0.8, 1.5)
+                self.__doSomethingOnFoot()
+
+    def __findCrane(self):
+        # Our own crane if it's free, or else any free one.  Side
+        # cranes can't pick up safes, so they're the last resort.
+        cranes = [crane for crane in self.room.boss.cranes or () if crane.avId == 0 and crane.state == "Free"]
+        if not cranes:
+            return None
+        cranes.sort(key=lambda crane: (crane.index != self.index, crane.index >= 4, crane.index))
+        return cranes[0]
+
+    def __swingSomething(self, crane):
+        boss = self.room.boss
+        if boss.attackCode == TTGlobalsBosses.BossCogDizzy or self.rng.random() < 0.3:
+            # He's stunned, or we're after his helmet; hit him with a
+            # safe.
+            targets = [safe for safe in boss.safes or () if safe.state in ("Initial", "Free") and safe.index != 0]
+        else:
+            targets = [goon for goon in boss.goons or () if goon.state == "Walk"]
+        if not targets:
+            yield 0.5
+            return
+
+        target = self.rng.choice(targets)
+        yield self.rng.uniform(1.0, 3.0)  # Swinging the magnet over to it
+        if target.air is None:
+            return
+        self.send(target, "requestGrab")
+        yield 0.1
+        if target.air is None or target.avId != self.avId or target.state != "Grabbed":
+            return
+
+        yield self.rng.uniform(0.8, 2.0)  # Swinging it at the boss
+        if target.air is not None and self.rng.random() < 0.75:
+            self.send(target, "hitBoss", [self.rng.uniform(0.4, 1.0), crane.doId])
+            yield 0.1
+        if target.air is None or target.avId != self.avId:
+            # A goon blows up when it hits; we're done with it.
+            return
+
+        # Let go of it, and steer it down to the floor.
+        self.send(target, "requestDrop")
+        x, y = target.getX(), target.getY()
+        for _ in range(self.rng.randint(2, 5)):
+            yield POS_PERIOD
+            if target.air is None:
+                return
+            x += self.rng.uniform(-2, 2)
+            y += self.rng.uniform(-2, 2)
+            self.send(target, "setSmPosHpr", [x, y, 0, target.getH(), 0, 0, 0])
+        if target.air is not None:
+            self.send(target, "requestFree", [x, y, 0, target.getH()])
+
+    def __doSomethingOnFoot(self):
+        boss = self.room.boss
+        goons = [goon for goon in boss.goons or () if goon.state == "Walk"]
+        roll = self.rng.random()
+        if goons and roll < 0.15:
+            # Walked into one.
+            self.send(self.rng.choice(goons), "requestBattle", [0])
+        elif goons and roll < 0.65:
+            self.send(self.rng.choice(goons), "requestStunned", [0])
+        elif boss.treasures and self.toon.getHp() < self.toon.getMaxHp():
+            self.send(self.rng.choice(list(boss.treasures.values())), "requestGrab")
+
+
+class Room:
+    """One CFO battle, with a bot for each toon.  When a round ends,
+    the room starts another, as a group of players would."""
+
+    def __init__(self, air, index, numToons, seed, recordingDirectory):
+        self.air = air
+        self.rng = random.Random(seed)
+        self.recordingDirectory = recordingDirectory
+        self.toons = []
+        for i in range(numToons):
+            self.toons.append(headlessAI.HeadlessToon(air, FIRST_AV_ID + index * 100 + i))
+        self.boss = None
+        self.rounds = 0
+        self.start()
+        self.bots = [CraneBot(self, toon, i, random.Random(self.rng.random())) for i, toon in enumerate(self.toons)]
+
+        # (avId, do, packed field) for the AI to handle next frame.
+        self.outbox = []
+
+    def start(self):
+        for toon in self.toons:
+            toon.hp = toon.maxHp
+            toon.setPos(self.rng.uniform(100, 140), self.rng.uniform(-335, -295), 0)
+        self.boss = headlessAI.makeBoss(self.air, self.toons)
+        self.boss.seedOverride = self.rng.getrandbits(32)
+        if self.recordingDirectory:
+            self.boss.recordingDirectory = self.recordingDirectory
+        self.boss.b_setState("BattleThree")
+        self.rounds += 1
+
+    def stop(self):
+        self.boss.setState("Off")
+        self.boss.requestDelete()
+
+    def send(self, avId, do, fieldName, args):
+        self.outbox.append((avId, do, headlessAI.packField(do, fieldName, args)))
+
+    def think(self, now):
+        if self.boss.state != "BattleThree":
+            # Won, or everybody went sad; go again.
+            self.stop()
+            self.start()
+        for bot in self.bots:
+            bot.think(now)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def getMemory():
+    # The most memory we've used so far, in kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(numRooms, numToons, seconds, frameLength, seed, recordingDirectory=None):
+    # Runs numRooms rooms for the indicated seconds of game time.
+    # Returns a dictionary of results.
+    air = headlessAI.HeadlessAIRepository()
+    memoryBefore = getMemory()
+    rooms = [Room(air, i, numToons, seed + i, recordingDirectory) for i in range(numRooms)]
+
+    received = {}
+    tickTimes = []
+    errors = 0
+    now = headlessAI.globalClock.getFrameTime()
+    endTime = now + seconds
+    while now < endTime:
+        now += frameLength
+
+        # The AI's frame: the updates that came in, then the tasks.
+        start = time.perf_counter()
+        for room in rooms:
+            outbox = room.outbox
+            room.outbox = []
+            for avId, do, data in outbox:
+                if do.air is None:
+                    # Deleted before the update got there.
+                    continue
+
+                counts = received.setdefault(do.dclass.getName(), [0, 0])
+                counts[0] += 1
+                counts[1] += len(data)
+                try:
+                    air.receiveUpdate(avId, do, data)
+                except Exception as e:
+                    errors += 1
+                    if errors <= 5:
+                        print("error handling %s from %s: %r" % (do.dclass.getName(), avId, e))
+        headlessAI.globalClock.setFrameTime(now)
+        headlessAI.taskMgr.step()
+        tickTimes.append(time.perf_counter() - start)
+
+        # And the clients'.
+        for room in rooms:
+            room.think(now)
+
+    memoryAfter = getMemory()
+    sent = {}
+    for (className, _fieldName), (messages, numBytes) in air.sentUpdates.items():
+        counts = sent.setdefault(className, [0, 0])
+        counts[0] += messages
+        counts[1] += numBytes
+
+    results = {
+        "rooms": numRooms,
+        "toons": numToons,
+        "seconds": seconds,
+        "frameLength": frameLength,
+        "rounds": sum(room.rounds for room in rooms),
+        "tickTimes": sorted(tickTimes),
+        "sent": sent,
+        "received": received,
+        "memoryPerRoom": (memoryAfter - memoryBefore) / numRooms,
+        "errors": errors,
+    }
+    for room in rooms:
+        room.stop()
+    return results
+
+
+def report(results):
+    ticks = results["tickTimes"]
+    seconds = results["seconds"]
+    print(
+        "%d rooms of %d toons, %.0f game seconds, %d rounds played"
+        % (results["rooms"], results["toons"], seconds, results["rounds"])
+    )
+    print(
+        "AI frame time (ms): p50 %.2f  p90 %.2f  p99 %.2f  max %.2f  (budget %.0f)"
+        % (
+            percentile(ticks, 0.5) * 1000,
+            percentile(ticks, 0.9) * 1000,
+            percentile(ticks, 0.99) * 1000,
+            ticks[-1] * 1000,
+            results["frameLength"] * 1000,
+        )
+    )
+    print("memory per room: %.0f KB, %d errors" % (results["memoryPerRoom"], results["errors"]))
+
+    print("%-34s %12s %12s %12s %12s" % ("dclass", "sent msg/s", "sent B/s", "recv msg/s", "recv B/s"))
+    sent = results["sent"]
+    received = results["received"]
+    for className in sorted(set(sent) | set(received)):
+        sentMessages, sentBytes = sent.get(className, (0, 0))
+        receivedMessages, receivedBytes = received.get(className, (0, 0))
+        print(
+            "%-34s %12.1f %12.0f %12.1f %12.0f"
+            % (
+                className,
+                sentMessages / seconds,
+                sentBytes / seconds,
+                receivedMessages / seconds,
+                receivedBytes / seconds,
+            )
+        )
+
+
+def findCapacity(args):
+    # Doubles the rooms until the 99th percentile frame runs over the
+    # budget, and returns the most rooms that stayed under it.
+    budget = args.frame * args.budget
+    numRooms = 1
+    best = 0
+    while True:
+        results = run(numRooms, args.toons, args.seconds, args.frame, args.seed)
+        p99 = percentile(results["tickTimes"], 0.99)
+        print("%5d rooms: p99 frame %.2f ms" % (numRooms, p99 * 1000))
+        if p99 > budget:
+            break
+        best = numRooms
+        numRooms *= 2
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs CFO rooms full of bots against a headless AI.")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--toons", type=int, default=2, help="bots per room")
+    parser.add_argument("--seconds", type=float, default=300.0, help="game seconds to run for")
+    parser.add_argument("--frame", type=float, default=0.04, help="seconds of game time per AI frame")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", metavar="DIR", help="record every round to this directory")
+    parser.add_argument("--capacity", action="store_true", help="find the most rooms that fit in the budget")
+    parser.add_argument(
+        "--budget", type=float, default=0.5, help="fraction of a frame the AI may spend, for --capacity"
+    )
+    args = parser.parse_args()
+
+    if args.capacity:
+        best = findCapacity(args)
+        print("capacity: %d rooms of %d toons" % (best, args.toons))
+        sys.exit(0 if best else 1)
+
+    report(run(args.rooms, args.toons, args.seconds, args.frame, args.seed, args.record))
+
+
+if __name__ == "__main__":
+    main()
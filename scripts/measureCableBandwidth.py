@@ -0,0 +1,115 @@
+"""Estimates how much bandwidth one controlled crane spends on
+setCablePos, sending every 0.05 seconds as the crane used to and
+deciding with CashbotBossCableSync as it does now.  The crane follows a
+synthetic round: hanging still, moving the arm around, and swinging
+the magnet hard, in turns.
+
+Run from the repository root:
+
+    python -m scripts.measureCableBandwidth [seconds]
+"""
+
+import math
+import random
+import sys
+
+from toontown.coghq.cfo.CashbotBossCableSync import CashbotBossCableSync
+
+FRAME_RATE = 60.0
+CABLE_LENGTH = 20
+NUM_LINKS = 3
+
+# The size of the setCablePos arguments before and after, as packed by
+# DCPacker, and a rough figure for the message header around them.
+OLD_PAYLOAD = 25
+NEW_PAYLOAD = 19
+MESSAGE_OVERHEAD = 10
+
+# (phase, seconds) that the synthetic round cycles through.
+PHASES = (
+    ("rest", 6.0),
+    ("move", 4.0),
+    ("swing", 3.0),
+    ("rest", 3.0),
+    ("move", 2.0),
+    ("swing", 5.0),
+)
+
+
+def makeTrace(seconds, seed):
+    # Returns a list of (time, y, h, links) at FRAME_RATE.
+    rng = random.Random(seed)
+    trace = []
+    y = 0.0
+    h = 0.0
+    swing = 0.0
+    phases = list(PHASES)
+    phase, phaseLeft = phases[0]
+    phaseNum = 0
+    vy = vh = 0.0
+
+    for frame in range(int(seconds * FRAME_RATE)):
+        t = frame / FRAME_RATE
+        if phaseLeft <= 0:
+            phaseNum += 1
+            phase, phaseLeft = phases[phaseNum % len(phases)]
+            vy = rng.uniform(-8, 8)
+            vh = rng.uniform(-40, 40)
+        phaseLeft -= 1 / FRAME_RATE
+
+        if phase == "rest":
+            swing *= 0.9
+        else:
+            y = max(-20.0, min(20.0, y + vy / FRAME_RATE))
+            h = max(-50.0, min(50.0, h + vh / FRAME_RATE))
+            if phase == "swing":
+                swing = min(1.0, swing + 0.05)
+            else:
+                swing = min(0.2, swing + 0.01)
+
+        # A pendulum hanging from the arm, swinging harder as swing
+        # goes toward 1.
+        angle = swing * 0.8 * math.sin(t * 2 * math.pi * 0.6)
+        links = []
+        for linkNum in range(NUM_LINKS):
+            length = float(linkNum + 1) / NUM_LINKS * CABLE_LENGTH
+            links.append((length * math.sin(angle), 0.0, -length * math.cos(angle)))
+        trace.append((t, y, h, links))
+    return trace
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 120.0
+    trace = makeTrace(seconds, 1)
+
+    oldMessages = 0
+    nextSend = 0.0
+    for t, _y, _h, _links in trace:
+        if t >= nextSend:
+            oldMessages += 1
+            nextSend = t + 0.05
+
+    sync = CashbotBossCableSync()
+    newMessages = 0
+    worstError = 0.0
+    for t, y, h, links in trace:
+        if sync.shouldSend(t, y, h, links):
+            newMessages += 1
+            sync.markSent(t, y, h, links)
+            magnet, offsets = sync.packLinks(links)
+            # What the other clients get, after the DC file rounds it.
+            magnet = tuple(round(v * 100) / 100 for v in magnet)
+            offsets = [tuple(round(v * 5) / 5 for v in offset) for offset in offsets]
+            for link, received in zip(links, sync.unpackLinks(magnet, offsets)):
+                worstError = max(worstError, max(abs(a - b) for a, b in zip(link, received)))
+
+    oldRate = oldMessages * (OLD_PAYLOAD + MESSAGE_OVERHEAD) / seconds
+    newRate = newMessages * (NEW_PAYLOAD + MESSAGE_OVERHEAD) / seconds
+    print("%8s %10s %10s %12s" % ("", "messages", "msgs/sec", "bytes/sec"))
+    print("%8s %10d %10.1f %12.1f" % ("before", oldMessages, oldMessages / seconds, oldRate))
+    print("%8s %10d %10.1f %12.1f" % ("after", newMessages, newMessages / seconds, newRate))
+    print("saved %.0f%%, worst link error %.2f ft" % (100.0 * (1 - newRate / oldRate), worstError))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Measures how long the AI's frame loop (otp/ai/AIBase) takes to answer
+a message from the server, and how much CPU it burns doing it, with the
+fixed per-frame sleep and with the adaptive frame loop.
+
+A client thread sends requests down a socket pair standing in for the
+connection to the message director, at random times; the AI reads them
+in a reader task, as the repository would, and answers each one right
+away, as a boss broadcasting the result of a grab would.  The time from
+request to answer is the latency a player sees on top of the network.
+Each loop is measured idle (nothing else running) and busy (with a
+task that does a millisecond of work every frame, like a boss would).
+
+Run from the repository root:
+
+    python -m scripts.measureFrameLatency [--requests 400] [--rate 20]
+
+Each measurement runs in a process of its own, since the frame loop is
+set up when AIBase is made.
+"""
+
+import argparse
+import builtins
+import random
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+REQUEST = struct.Struct("<Id")
+
+
+class LoopbackAir:
+    """Just enough of the repository for the frame loop to wait on our
+    end of the socket pair."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def isConnected(self):
+        return True
+
+    def getBdc(self):
+        return self
+
+    def GetSocket(self):
+        return self.sock.fileno()
+
+    def flush(self):
+        pass
+
+
+def runClient(sock, numRequests, rate, latencies, done):
+    # Sends numRequests requests at random, about rate a second, and
+    # times the answers.
+    rng = random.Random(1)
+    sentTimes = {}
+
+    def readAnswers():
+        buffer = b""
+        while len(latencies) < numRequests:
+            data = sock.recv(4096)
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= REQUEST.size:
+                requestId, _ = REQUEST.unpack_from(buffer)
+                buffer = buffer[REQUEST.size :]
+                latencies.append(time.perf_counter() - sentTimes[requestId])
+        done.set()
+
+    reader = threading.Thread(target=readAnswers, daemon=True)
+    reader.start()
+    for requestId in range(numRequests):
+        time.sleep(rng.expovariate(rate))
+        sentTimes[requestId] = time.perf_counter()
+        sock.sendall(REQUEST.pack(requestId, 0.0))
+
+
+def measure(adaptive, busy, numRequests, rate):
+    # Runs one frame loop until every request is answered.  Returns
+    # (latencies, frames, wall seconds, CPU seconds).
+    from panda3d.core import loadPrcFileData
+
+    loadPrcFileData(
+        "measureFrameLatency",
+        "default-directnotify-level warning\nwant-adaptive-ai-frames %d\n" % adaptive,
+    )
+
+    from direct.directnotify.DirectNotifyGlobal import directNotify
+
+    builtins.directNotify = directNotify
+
+    from otp.ai.AIBase import AIBase
+
+    base = AIBase()
+    serverSide, aiSide = socket.socketpair()
+    aiSide.setblocking(False)
+    base.air = LoopbackAir(aiSide)
+
+    def readerPoll(task):
+        # Answers every request that's come in.
+        try:
+            data = aiSide.recv(65536)
+        except BlockingIOError:
+            data = b""
+        if data:
+            aiSide.sendall(data)
+        return task.cont
+
+    base.taskMgr.add(readerPoll, "readerPollTask-1")
+
+    if busy:
+
+        def bossFrame(task):
+            end = time.perf_counter() + 0.001
+            while time.perf_counter() < end:
+                pass
+            return task.cont
+
+        base.taskMgr.add(bossFrame, "bossFrame")
+
+    latencies = []
+    done = threading.Event()
+    client = threading.Thread(target=runClient, args=(serverSide, numRequests, rate, latencies, done), daemon=True)
+
+    frames = 0
+    wallStart = time.perf_counter()
+    cpuStart = time.process_time()
+    client.start()
+    while not done.is_set():
+        base.taskMgr.step()
+        frames += 1
+    return latencies, frames, time.perf_counter() - wallStart, time.process_time() - cpuStart
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the AI frame loop's latency and CPU use.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests a second")
+    parser.add_argument("--run", choices=("fixed", "adaptive"), help=argparse.SUPPRESS)
+    parser.add_argument("--busy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        latencies, frames, wall, cpu = measure(args.run == "adaptive", args.busy, args.requests, args.rate)
+        print(
+            "%-9s %-5s %8.2f %8.2f %8.2f %8.2f %9.0f %7.1f%%"
+            % (
+                args.run,
+                "busy" if args.busy else "idle",
+                percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.9) * 1000,
+                percentile(latencies, 0.99) * 1000,
+                max(latencies) * 1000,
+                frames / wall,
+                cpu / wall * 100,
+            )
+        )
+        return
+
+    print(
+        "%-9s %-5s %8s %8s %8s %8s %9s %8s"
+        % ("loop", "load", "p50 ms", "p90 ms", "p99 ms", "max ms", "frames/s", "CPU")
+    )
+    sys.stdout.flush()
+    for busy in (False, True):
+        for run in ("fixed", "adaptive"):
+            command = [sys.executable, "-m", "scripts.measureFrameLatency", "--run", run]
+            command += ["--requests", str(args.requests), "--rate", str(args.rate)]
+            if busy:
+                command.append("--busy")
+            subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Plays a recorded crane round (see CraneRoundRecorder) back against a
+boss running headless, with no server and no clients, as fast as the
+CPU allows.  Every update the clients sent is handed to the same object
+at the same point in the round, from the same toon, and the boss plays
+the round from the same seed, so it makes a realistic and repeatable
+workload for profiling the AI.  What the boss broadcasts this time is
+compared with what it broadcast when the round was recorded.
+
+Run from the repository root:
+
+    python -m scripts.replayCraneRound recording.crr [--frame 0.04] [--repeat 3] [--profile] [--check]
+
+With --check, the exit status is 1 if the replay broadcast different
+updates than the recording did, as after a change in behavior.
+"""
+
+import argparse
+import cProfile
+import importlib
+import pstats
+import sys
+import time
+from collections import Counter, deque
+
+from scripts import headlessAI
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+from toontown.coghq.cfo.CraneRoundRecorder import CraneRoundRecorder
+
+
+class ReplayAIRepository(headlessAI.HeadlessAIRepository):
+    """A headless repository that gives the objects the replayed boss
+    makes the same doIds they had in the recording: the nth object of
+    each class made gets the doId of the nth one made then.  So the
+    doIds the clients sent, as the crane in a hitBoss() or the toon in
+    a setStandings(), mean the same objects they did then."""
+
+    def __init__(self, records):
+        headlessAI.HeadlessAIRepository.__init__(self)
+
+        # dclass name -> the doIds the recording made of that class,
+        # in order.
+        self.recordedDoIds = {}
+        for kind, _seconds, doId, className, _data in records:
+            if kind == CraneRoundRecorder.GENERATE:
+                self.recordedDoIds.setdefault(className, deque()).append(doId)
+
+    def generateWithRequired(self, do, parentId, zoneId, optionalFields=()):
+        doIds = self.recordedDoIds.get(do.dclass.getName())
+        doId = None
+        while doIds and doId is None:
+            doId = doIds.popleft()
+            if doId in self.doId2do:
+                doId = None
+        if doId is None:
+            doId = self.allocateChannel()
+
+        # Don't hand out the same doId again later.
+        self.nextDoId = max(self.nextDoId, doId)
+        self.generateWithRequiredAndId(do, doId, parentId, zoneId, optionalFields)
+
+
+class ReplayTracker:
+    """Sits where a CraneRoundRecorder would, on the headless repository
+    and on the boss, and keeps track of the updates the replayed boss
+    broadcasts.  Like the recorder, it stops when the boss stops
+    recording, at the end of the round, so the replay counts just what
+    the recording did."""
+
+    def __init__(self, air, zoneId):
+        self.air = air
+        self.zoneId = zoneId
+        self.broadcasts = Counter()
+        air.roundRecorders[zoneId] = self
+
+    def stop(self):
+        if self.air.roundRecorders.get(self.zoneId) is self:
+            del self.air.roundRecorders[self.zoneId]
+
+    def recordGenerate(self, do):
+        pass
+
+    def recordInbound(self, do, avId, data):
+        pass
+
+    def recordOutbound(self, do, fieldName, args):
+        self.broadcasts[(do.dclass.getName(), fieldName)] += 1
+
+
+def replay(header, records, frameLength):
+    # Plays the recording through once.  Returns (stats, the updates
+    # broadcast in the recording, the updates broadcast this time).
+
+    # Start the clock where the AI's was, so everything that goes by
+    # the clock happens on the same frames.
+    headlessAI.globalClock.setFrameTime(header["frameTime"])
+    air = ReplayAIRepository(records)
+    toons = []
+    for avId, hp, maxHp, _spectating in header["toons"]:
+        toons.append(headlessAI.HeadlessToon(air, avId, hp, maxHp))
+
+    module = importlib.import_module("toontown.coghq.cfo." + header["bossClass"])
+    boss = headlessAI.makeBoss(air, toons, getattr(module, header["bossClass"]))
+    for name, value in header["settings"].items():
+        setattr(boss, name, value)
+    boss.modifiers = list(CraneLeagueGlobals.getModifiers(header["modifiers"]))
+    boss.applyModifiers()
+    boss.seedOverride = header["seed"]
+    for avId, _hp, _maxHp, spectating in header["toons"]:
+        if spectating:
+            boss.enableSpectator(air.doId2do[avId])
+
+    tracker = ReplayTracker(air, boss.zoneId)
+
+    stats = Counter()
+    broadcasts = Counter()
+    startTime = headlessAI.globalClock.getFrameTime()
+    boss.b_setState("BattleThree")
+
+    # The boss only started recording if it has somewhere to put the
+    # recording; either way, the tracker stands in for it now.
+    boss.stopRecording()
+    boss.recorder = tracker
+
+    wallStart = time.perf_counter()
+    for kind, seconds, doId, avId, data in records:
+        stats["frames"] += headlessAI.runUntil(startTime + seconds, frameLength)
+
+        if kind == CraneRoundRecorder.OUTBOUND:
+            field = air.dcFile.getFieldByIndex(int.from_bytes(data[:2], "little"))
+            broadcasts[(field.getClass().getName(), field.getName())] += 1
+
+        elif kind == CraneRoundRecorder.INBOUND:
+            do = air.doId2do.get(doId)
+            if do is None or do.air is None:
+                # The replay hasn't made this object, or has deleted
+                # it already.
+                stats["unmatched"] += 1
+                continue
+
+            try:
+                air.receiveUpdate(avId, do, data)
+                stats["inbound"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                if stats["errors"] <= 5:
+                    print("error replaying an update to %s: %r" % (do.dclass.getName(), e))
+
+    stats["seconds"] = headlessAI.globalClock.getFrameTime() - startTime
+    stats["wallTime"] = time.perf_counter() - wallStart
+    replayed = Counter(tracker.broadcasts)
+
+    # Clean up, so the next run starts from nothing.
+    boss.setState("Off")
+    boss.requestDelete()
+    return stats, broadcasts, replayed
+
+
+def compareBroadcasts(recorded, replayed):
+    # Prints the broadcasts whose counts differ.  Returns true if they
+    # all match.
+    # The recording may list a field under the dclass it was declared
+    # in, so compare by field name alone.
+    recordedByField = Counter()
+    for (_className, fieldName), count in recorded.items():
+        recordedByField[fieldName] += count
+    replayedByField = Counter()
+    for (_className, fieldName), count in replayed.items():
+        replayedByField[fieldName] += count
+
+    different = sorted(
+        name for name in set(recordedByField) | set(replayedByField) if recordedByField[name] != replayedByField[name]
+    )
+    if not different:
+        print("broadcasts match the recording (%d updates)" % sum(recordedByField.values()))
+        return True
+
+    print("%-28s %10s %10s" % ("broadcasts that differ", "recorded", "replayed"))
+    for name in different:
+        print("%-28s %10d %10d" % (name, recordedByField[name], replayedByField[name]))
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a recorded crane round headless.")
+    parser.add_argument("recording")
+    parser.add_argument("--frame", type=float, default=0.04, help="seconds of game time per AI frame")
+    parser.add_argument("--repeat", type=int, default=1, help="times to play the round through")
+    parser.add_argument("--profile", action="store_true", help="profile the AI and print the hot spots")
+    parser.add_argument("--check", action="store_true", help="fail if the broadcasts differ from the recording")
+    args = parser.parse_args()
+
+    header, records = CraneRoundRecorder.readRecording(args.recording)
+    print(
+        "%s: %s with %d toons, seed %s, %d records"
+        % (args.recording, header["bossClass"], len(header["toons"]), header["seed"], len(records))
+    )
+
+    profile = cProfile.Profile() if args.profile else None
+    matched = True
+    for run in range(args.repeat):
+        if profile:
+            profile.enable()
+        stats, recorded, replayed = replay(header, records, args.frame)
+        if profile:
+            profile.disable()
+
+        print(
+            "run %d: %.1f game seconds in %.3f seconds (%.0fx), %d frames, %d updates, %d unmatched, %d errors"
+            % (
+                run + 1,
+                stats["seconds"],
+                stats["wallTime"],
+                stats["seconds"] / max(stats["wallTime"], 1e-9),
+                stats["frames"],
+                stats["inbound"],
+                stats["unmatched"],
+                stats["errors"],
+            )
+        )
+        if not compareBroadcasts(recorded, replayed):
+            matched = False
+
+    if profile:
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(25)
+
+    if args.check and not matched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+import bisect
+import select
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from direct.task.Task import TaskManager
+from panda3d.core import ConfigVariableInt, DatagramIterator
+
+from toontown.coghq.DistributedBossCogAI import DistributedBossCogAI
+
+
+class AIProfiler:
+    """Keeps track of where the AI's time goes, boss by boss: how long
+    each task runs, and how long each field update from a client takes
+    to handle, with call counts, over the last minute or so and since
+    profiling started.  Off until someone turns it on (with the ~perf
+    magic word, or want-ai-profiler), and costs next to nothing while
+    it's off: nothing is wrapped until then.
+
+    Tasks are wrapped where they're made, so a task is charged to the
+    boss its method belongs to (or to the boss of the goon, crane, etc.
+    it belongs to), under its name with the doId taken off.  Field
+    updates are timed by the repository (see handleDatagram in
+    ToontownAIRepository) and charged to the boss of the object they're
+    for, under dclass.field.  Anything that doesn't belong to a boss is
+    charged to doId 0.
+
+    If ai-profiler-port is set, the numbers are also served on that port
+    of localhost, at /metrics, in Prometheus text format."""
+
+    notify = directNotify.newCategory("AIProfiler")
+
+    # Upper bounds of the histogram buckets, in seconds.
+    buckets = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+    TASK = "task"
+    FIELD = "field"
+
+    def __init__(self, air):
+        self.air = air
+        self.enabled = False
+        self.startTime = 0.0
+
+        # How many seconds the rolling numbers cover.
+        self.window = ConfigVariableInt("ai-profiler-window", 60).value
+        self.port = ConfigVariableInt("ai-profiler-port", 0).value
+        self.httpServer = None
+
+        # (kind, owner doId, name) -> ProfileStat
+        self.stats = {}
+
+    def enable(self):
+        if self.enabled:
+            return
+
+        self.enabled = True
+        self.startTime = time.monotonic()
+
+        # Every task from now on gets wrapped as it's added, and every
+        # task there is already, right now.
+        taskMgr.add = self.__add
+        taskMgr.doMethodLater = self.__doMethodLater
+        for task in taskMgr.getAllTasks():
+            self.wrapTask(task)
+
+        if self.port:
+            self.startHttpServer()
+        self.notify.info("Profiling the AI")
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        del taskMgr.add
+        del taskMgr.doMethodLater
+        for task in taskMgr.getAllTasks():
+            function = task.getFunction()
+            if isinstance(function, ProfiledTaskFunction):
+                task.setFunction(function.function)
+
+        self.stopHttpServer()
+        self.notify.info("Stopped profiling the AI")
+
+    def reset(self):
+        self.stats = {}
+        self.startTime = time.monotonic()
+        if self.enabled:
+            # The wrapped tasks hold on to their old stats.
+            for task in taskMgr.getAllTasks():
+                function = task.getFunction()
+                if isinstance(function, ProfiledTaskFunction):
+                    function.stat = self.getTaskStat(task, function.function)
+
+    def __add(self, *args, **kwargs):
+        task = TaskManager.add(taskMgr, *args, **kwargs)
+        self.wrapTask(task)
+        return task
+
+    def __doMethodLater(self, *args, **kwargs):
+        task = TaskManager.doMethodLater(taskMgr, *args, **kwargs)
+        self.wrapTask(task)
+        return task
+
+    def wrapTask(self, task):
+        function = task.getFunction()
+        if function is None or isinstance(function, ProfiledTaskFunction):
+            return
+
+        task.setFunction(ProfiledTaskFunction(self, function, self.getTaskStat(task, function)))
+
+    def getTaskStat(self, task, function):
+        name = task.getName()
+        owner = getattr(function, "__self__", None)
+        base, _, suffix = name.rpartition("-")
+        if base and suffix.isdigit():
+            # A uniqueName(); the doId tells us whose it is, if the
+            # method didn't.
+            name = base
+            if owner is None:
+                owner = self.air.doId2do.get(int(suffix))
+        return self.getStat(self.TASK, self.getOwnerId(owner), name)
+
+    def getOwnerId(self, obj):
+        # The doId of the boss obj belongs to, or 0.
+        if not isinstance(obj, DistributedBossCogAI):
+            obj = getattr(obj, "boss", None)
+            if not isinstance(obj, DistributedBossCogAI):
+                return 0
+        return obj.doId or 0
+
+    def getStat(self, kind, ownerId, name):
+        key = (kind, ownerId, name)
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = ProfileStat(kind, ownerId, name, len(self.buckets) + 1)
+        return stat
+
+    def record(self, stat, elapsed):
+        stat.add(elapsed, int(time.monotonic()), self.window, bisect.bisect_left(self.buckets, elapsed))
+
+    def profileSetField(self, di, handleDatagram):
+        # Runs handleDatagram(di) on a field update, and charges the
+        # time it took to the field.  We read the doId and field from a
+        # copy of the iterator, so the update goes on untouched.
+        peek = DatagramIterator(di.getDatagram(), di.getCurrentIndex())
+        do = self.air.doId2do.get(peek.getUint32())
+        if do is None:
+            handleDatagram(di)
+            return
+
+        field = do.dclass.getFieldByIndex(peek.getUint16())
+        name = "%s.%s" % (do.dclass.getName(), field.getName() if field else "?")
+        stat = self.getStat(self.FIELD, self.getOwnerId(do), name)
+
+        start = time.perf_counter()
+        try:
+            handleDatagram(di)
+        finally:
+            self.record(stat, time.perf_counter() - start)
+
+    def getTop(self, count=10):
+        # Returns the stats that took the most time in the window, most
+        # first, as (stat, calls, seconds, worst).
+        since = int(time.monotonic()) - self.window
+        top = []
+        for stat in self.stats.values():
+            calls, seconds, worst = stat.getWindow(since)
+            if calls:
+                top.append((stat, calls, seconds, worst))
+        top.sort(key=lambda entry: entry[2], reverse=True)
+        return top[:count]
+
+    def formatTop(self, count=10):
+        # The top stats, a line each, for the ~perf magic word.
+        seconds = min(self.window, max(1.0, time.monotonic() - self.startTime))
+        lines = ["Busiest over the last %ds (boss, name: ms/s, calls/s, worst ms):" % seconds]
+        for stat, calls, total, worst in self.getTop(count):
+            lines.append(
+                "%s %s: %.2f, %.1f, %.2f"
+                % (stat.ownerId or "-", stat.name, total * 1000 / seconds, calls / seconds, worst * 1000)
+            )
+        if len(lines) == 1:
+            lines.append("Nothing yet.")
+        return "\n".join(lines)
+
+    def getMetrics(self):
+        # Everything since profiling started, in Prometheus text
+        # format.
+        lines = []
+        for kind, description in (
+            (self.TASK, "Time spent running AI tasks"),
+            (self.FIELD, "Time spent handling field updates"),
+        ):
+            metric = "toontown_ai_%s_seconds" % kind
+            lines.append("# HELP %s %s." % (metric, description))
+            lines.append("# TYPE %s histogram" % metric)
+            for stat in self.stats.values():
+                if stat.kind != kind:
+                    continue
+
+                labels = 'boss="%s",name="%s"' % (stat.ownerId, escapeLabel(stat.name))
+                cumulative = 0
+                for bound, count in zip(self.buckets, stat.buckets):
+                    cumulative += count
+                    lines.append('%s_bucket{%s,le="%g"} %d' % (metric, labels, bound, cumulative))
+                lines.append('%s_bucket{%s,le="+Inf"} %d' % (metric, labels, stat.count))
+                lines.append("%s_sum{%s} %.6f" % (metric, labels, stat.total))
+                lines.append("%s_count{%s} %d" % (metric, labels, stat.count))
+        return "\n".join(lines) + "\n"
+
+    def startHttpServer(self):
+        try:
+            self.httpServer = HTTPServer(("127.0.0.1", self.port), ProfilerRequestHandler)
+        except OSError as e:
+            self.notify.warning("Couldn't serve profiler metrics on port %s: %s" % (self.port, e))
+            return
+
+        self.httpServer.profiler = self
+        # Requests are handled between frames, so nobody reads the
+        # stats while they're being changed.
+        taskMgr.add(self.__pollHttpServer, "aiProfilerHttp")
+
+    def stopHttpServer(self):
+        if self.httpServer:
+            taskMgr.remove("aiProfilerHttp")
+            self.httpServer.server_close()
+            self.httpServer = None
+
+    def __pollHttpServer(self, task):
+        while select.select([self.httpServer], [], [], 0)[0]:
+            self.httpServer.handle_request()
+        return task.cont
+
+
+class ProfileStat:
+    """The times of one task or field for one boss: a histogram of
+    everything since profiling started, and counts per second for the
+    rolling window."""
+
+    __slots__ = ("kind", "ownerId", "name", "count", "total", "buckets", "seconds")
+
+    def __init__(self, kind, ownerId, name, numBuckets):
+        self.kind = kind
+        self.ownerId = ownerId
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * numBuckets
+
+        # second -> [calls, seconds, worst]
+        self.seconds = {}
+
+    def add(self, elapsed, second, window, bucket):
+        self.count += 1
+        self.total += elapsed
+        self.buckets[bucket] += 1
+
+        entry = self.seconds.get(second)
+        if entry is None:
+            entry = self.seconds[second] = [0, 0.0, 0.0]
+            # A new second; forget the ones that have left the window.
+            for old in [old for old in self.seconds if old < second - window]:
+                del self.seconds[old]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+
+    def getWindow(self, since):
+        # Returns (calls, seconds, worst) since the indicated second.
+        calls = 0
+        seconds = 0.0
+        worst = 0.0
+        for second, (entryCalls, entrySeconds, entryWorst) in self.seconds.items():
+            if second >= since:
+                calls += entryCalls
+                seconds += entrySeconds
+                worst = max(worst, entryWorst)
+        return calls, seconds, worst
+
+
+class ProfiledTaskFunction:
+    """Stands in for a task's function while we're profiling, and times
+    it."""
+
+    __slots__ = ("profiler", "function", "stat")
+
+    def __init__(self, profiler, function, stat):
+        self.profiler = profiler
+        self.function = function
+        self.stat = stat
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            self.profiler.record(self.stat, time.perf_counter() - start)
+
+
+class ProfilerRequestHandler(BaseHTTPRequestHandler):
+    # Requests are handled on the AI's main loop, so a client that
+    # connects and then says nothing (or stops reading) mustn't hold
+    # it up for more than this many seconds.
+    timeout = 0.5
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.profiler.getMetrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, message, *args):
+        AIProfiler.notify.debug(message % args)
+
+
+def escapeLabel(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
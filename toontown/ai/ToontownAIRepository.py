@@ -1,3 +1,6 @@
+import atexit
+
+from direct.distributed.MsgTypes import MsgName2Id
 from direct.task.Task import Task
 from panda3d.core import *
 from panda3d.toontown import *
@@ -5,7 +8,9 @@ from panda3d.toontown import *
 from otp.ai.AIZoneData import AIZoneDataStore
 from otp.ai.TimeManagerAI import TimeManagerAI
 from otp.distributed.DistributedDistrictAI import DistributedDistrictAI
+from toontown.ai.AIProfiler import AIProfiler
 from toontown.chat.magic.DistributedMagicWordManagerAI import DistributedMagicWordManagerAI
+from toontown.coghq.cfo.CraneLeagueResultStore import CraneLeagueResultStore
 from toontown.distributed.ToontownInternalRepository import ToontownInternalRepository
 from toontown.toonbase.globals.TTGlobalsCore import *
 from toontown.toonbase.globals.TTGlobalsWorld import DynamicZonesBegin, DynamicZonesEnd, ZoneIDs
@@ -33,6 +38,14 @@ class ToontownAIRepository(ToontownInternalRepository):
 
         self._avatarDisconnectReasons = {}
 
+        self.craneLeagueResults = None
+
+        # Maps zoneId -> the CraneRoundRecorder writing down that zone.
+        self.roundRecorders = {}
+
+        # Times tasks and field updates per boss, when turned on.
+        self.profiler = AIProfiler(self)
+
     def handleConnected(self):
         self.districtId = self.allocateChannel()
         self.district = DistributedDistrictAI(self)
@@ -71,6 +84,21 @@ class ToontownAIRepository(ToontownInternalRepository):
 
         self.zoneAllocator = UniqueIdAllocator(DynamicZonesBegin, DynamicZonesEnd)
 
+        # The results of every crane round, written out on each
+        # leaderboardFlush.
+        self.craneLeagueResults = CraneLeagueResultStore(
+            ConfigVariableString("crane-league-results-db", "database/craneLeagueResults.db").value
+        )
+        self.craneLeagueResults.start()
+
+        # Results are only buffered between flushes, and the database
+        # thread won't hold the process open, so write out whatever is
+        # left on the way down, however the AI goes down.
+        atexit.register(self.craneLeagueResults.stop)
+
+        if ConfigVariableBool("want-ai-profiler", False).value:
+            self.profiler.enable()
+
     def generateHood(self, hoodConstructor, zoneId):
         self.dnaStoreMap[zoneId] = DNAStorage()
         dnaFile = ZoneUtil.genDNAFileName(zoneId)
@@ -83,6 +111,50 @@ class ToontownAIRepository(ToontownInternalRepository):
     def createZones(self):
         self.generateHood(CashbotHQDataAI, ZoneIDs.CashbotHQ)
 
+    def handleDatagram(self, di):
+        if (self.roundRecorders or self.profiler.enabled) and self.getMsgType() == MsgName2Id[
+            "STATESERVER_OBJECT_SET_FIELD"
+        ]:
+            if self.roundRecorders:
+                self.__recordSetField(di)
+            if self.profiler.enabled:
+                self.profiler.profileSetField(di, self.__handleDatagram)
+                return
+
+        ToontownInternalRepository.handleDatagram(self, di)
+
+    def __handleDatagram(self, di):
+        ToontownInternalRepository.handleDatagram(self, di)
+
+    def __recordSetField(self, di):
+        # Hands a field update from a client to the recorder of the
+        # object's zone, if there is one.  We read from a copy of the
+        # iterator, so the update goes on to the object untouched.
+        peek = DatagramIterator(di.getDatagram(), di.getCurrentIndex())
+        do = self.doId2do.get(peek.getUint32())
+        if do is None:
+            return
+
+        recorder = self.roundRecorders.get(do.zoneId)
+        if recorder:
+            recorder.recordInbound(do, self.getAvatarIdFromSender(), peek.getRemainingBytes())
+
+    def sendUpdate(self, do, fieldName, args):
+        if self.roundRecorders:
+            recorder = self.roundRecorders.get(do.zoneId)
+            if recorder:
+                recorder.recordOutbound(do, fieldName, args)
+
+        ToontownInternalRepository.sendUpdate(self, do, fieldName, args)
+
+    def generateWithRequired(self, do, parentId, zoneId, optionalFields=()):
+        ToontownInternalRepository.generateWithRequired(self, do, parentId, zoneId, optionalFields)
+
+        if self.roundRecorders:
+            recorder = self.roundRecorders.get(zoneId)
+            if recorder:
+                recorder.recordGenerate(do)
+
     def getAvatarExitEvent(self, avId):
         return f"distObjDelete-{int(avId)}"
 
@@ -72,3 +72,25 @@ class RestartCraneRound(MagicWord, RestartCraneRoundStub):
         boss.b_setState("Off")
         boss.b_setState("BattleThree")
         return True, "Successfully restarted the crane round"
+
+
+@MagicWordRegistry.command
+class Perf(MagicWord, PerfStub):
+    def invoke(self) -> Tuple[bool, str]:
+        profiler = simbase.air.profiler
+        action = self.args["action"]
+        if action == "on":
+            profiler.enable()
+            return True, "Profiling the AI; ~perf top to see where the time goes."
+
+        if action == "off":
+            profiler.disable()
+            return True, "Stopped profiling the AI."
+
+        if action == "reset":
+            profiler.reset()
+            return True, "Cleared the AI profile."
+
+        if not profiler.enabled:
+            return False, "The AI isn't being profiled; ~perf on first."
+        return True, profiler.formatTop()
@@ -1,7 +1,7 @@
 from enum import Enum
 
 from toontown.chat.magic.MagicBase import MagicWordLocation, MagicWordParameter, MagicWordRegistry, MagicWordStub
-from toontown.chat.magic.MagicWordTypes import MWTInteger
+from toontown.chat.magic.MagicWordTypes import MWTInteger, MWTNormalEnum
 from toontown.toonbase.globals.TTGlobalsCore import AccessLevels
 
 
@@ -9,6 +9,13 @@ class InstanceArguments(Enum):
     seed = "seed"
 
 
+class PerfActions(Enum):
+    top = "top"
+    on = "on"
+    off = "off"
+    reset = "reset"
+
+
 @MagicWordRegistry.stub("sethp", "hp", "setlaff", "laff")
 class SetHPStub(MagicWordStub):
     description = "Sets the health/laff points of target toon"
@@ -61,3 +68,14 @@ class RestartCraneRoundStub(MagicWordStub):
 
     location = MagicWordLocation.SERVER
     permissionLevel = AccessLevels.DEVELOPER
+
+
+@MagicWordRegistry.stub("perf")
+class PerfStub(MagicWordStub):
+    description = "Profiles the AI's tasks and field updates by boss: on, off, top or reset"
+
+    signature = [
+        MagicWordParameter(MWTNormalEnum(PerfActions), "action", "What to do", default="top"),
+    ]
+    location = MagicWordLocation.SERVER
+    permissionLevel = AccessLevels.DEVELOPER
@@ -59,6 +59,11 @@ class BossSpeedrunTimer:
     def override_time(self, secs):
         self.overridden_time = secs
 
+    def set_elapsed(self, secs):
+        # Makes the timer read secs into the round as of now, as if it
+        # had started that long ago.
+        self.started = datetime.now(tz=timezone.utc) - timedelta(seconds=secs)
+
     def cleanup(self):
         self.stop_updating()
         self.time_text.cleanup()
@@ -10,6 +10,10 @@ AllBossCogs = []
 class DistributedBossCogAI(DistributedAvatarAI.DistributedAvatarAI):
     notify = directNotify.newCategory("DistributedBossCogAI")
 
+    # Where progressRandomValue() gets its random numbers; bosses
+    # with random streams of their own can point this at one.
+    progressRandom = random
+
     def __init__(self, air, dept):
         DistributedAvatarAI.DistributedAvatarAI.__init__(self, air)
 
@@ -182,6 +186,29 @@ class DistributedBossCogAI(DistributedAvatarAI.DistributedAvatarAI):
             else:
                 self.looseToons.append(toonId)
 
+    def prewarmOffice(self):
+        # Called by the lobby manager on a boss it's keeping parked in
+        # its pool, right after it's generated, so we can build ahead
+        # of time whatever we'd otherwise build when the toons arrive.
+        pass
+
+    def resetOffice(self):
+        # Called by the lobby manager once our toons have all gone, to
+        # make us as good as new before we go back in the pool for the
+        # next group.
+        taskMgr.remove(self.uniqueName("BossDone"))
+        self.ignoreBarrier(self.barrier)
+        self.barrier = None
+
+        self.looseToons = []
+        self.involvedToons = []
+        self.nearToons = []
+
+        self.bossDamage = 0
+        self.attackCode = None
+        self.attackAvId = 0
+        self.hitCount = 0
+
     def moveSuits(self, active):
         for suit in active:
             self.reserveSuits.append((suit, 0))
@@ -207,7 +234,7 @@ class DistributedBossCogAI(DistributedAvatarAI.DistributedAvatarAI):
 
         radius = radius * (1.0 - abs(t - 0.5) * 2.0)
 
-        t += radius * random.uniform(-1, 1)
+        t += radius * self.progressRandom.uniform(-1, 1)
         t = max(min(t, 1.0), 0.0)
 
         return fromValue + (toValue - fromValue) * t
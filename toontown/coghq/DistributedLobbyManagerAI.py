@@ -1,21 +1,42 @@
 from direct.distributed import DistributedObjectAI
+from panda3d.core import ConfigVariableInt
 
 
 class DistributedLobbyManagerAI(DistributedObjectAI.DistributedObjectAI):
     notify = directNotify.newCategory("LobbyManagerAI")
 
+    # We keep a few boss offices generated and parked, each in a zone of
+    # its own, with their cranes and safes already built, so there's
+    # nothing to make when an elevator leaves.  We try to keep at least
+    # poolMin of them waiting, and never keep more than poolMax; set
+    # boss-office-pool-max to 0 to make every office on the spot and
+    # delete it afterwards.
+    poolMin = ConfigVariableInt("boss-office-pool-min", 2).value
+    poolMax = ConfigVariableInt("boss-office-pool-max", 6).value
+
     def __init__(self, air, bossConstructor):
         DistributedObjectAI.DistributedObjectAI.__init__(self, air)
         self.air = air
         self.bossConstructor = bossConstructor
 
+        # The parked offices, oldest first.
+        self.pool = []
+
     def generate(self):
         DistributedObjectAI.DistributedObjectAI.generate(self)
         self.notify.debug("generate")
 
+        # Warm up the pool now, while the AI is starting anyway.
+        while len(self.pool) < min(self.poolMin, self.poolMax):
+            self.pool.append(self.makeBossOffice())
+
     def delete(self):
         self.notify.debug("delete")
         self.ignoreAll()
+        taskMgr.remove(self.uniqueName("refillPool"))
+        for bossCog in self.pool:
+            self.deleteBossOffice(bossCog)
+        self.pool = []
         DistributedObjectAI.DistributedObjectAI.delete(self)
 
     def requestSoloBoss(self):
@@ -24,21 +45,55 @@ class DistributedLobbyManagerAI(DistributedObjectAI.DistributedObjectAI):
         self.sendUpdateToAvatarId(toonId, "setBossZoneId", [zoneId])
 
     def createBossOffice(self, avIdList):
-        bossZone = self.air.allocateZone()
-        self.notify.info("createBossOffice: %s" % bossZone)
-        bossCog = self.bossConstructor(self.air)
+        # Hands out a parked office if we have one, or makes one if we
+        # don't.
+        bossCog = self.pool.pop(0) if self.pool else self.makeBossOffice()
+        self.notify.info("createBossOffice: %s (%s still parked)" % (bossCog.zoneId, len(self.pool)))
+
         for avId in avIdList:
             if avId:
                 bossCog.addToon(avId)
 
         bossCog.acceptNewToons()
-        bossCog.generateWithRequired(bossZone)
         self.acceptOnce(bossCog.uniqueName("BossDone"), self.destroyBossOffice, extraArgs=[bossCog])
         bossCog.b_setState("WaitForToons")
-        return bossZone
+
+        # Make up for the one we took, after the toons are on their way.
+        if len(self.pool) < min(self.poolMin, self.poolMax):
+            taskMgr.remove(self.uniqueName("refillPool"))
+            taskMgr.add(self.__refillPool, self.uniqueName("refillPool"))
+
+        return bossCog.zoneId
 
     def destroyBossOffice(self, bossCog):
+        # The toons have all left the office.  It goes back in the pool
+        # for the next group, if there's room for it.
+        if len(self.pool) < self.poolMax:
+            self.notify.info("parkBossOffice: %s" % bossCog.zoneId)
+            bossCog.resetOffice()
+            self.pool.append(bossCog)
+            return
+
+        self.deleteBossOffice(bossCog)
+
+    def makeBossOffice(self):
+        bossZone = self.air.allocateZone()
+        self.notify.info("makeBossOffice: %s" % bossZone)
+        bossCog = self.bossConstructor(self.air)
+        bossCog.generateWithRequired(bossZone)
+        bossCog.prewarmOffice()
+        return bossCog
+
+    def deleteBossOffice(self, bossCog):
         bossZone = bossCog.zoneId
-        self.notify.info("destroyBossOffice: %s" % bossZone)
+        self.notify.info("deleteBossOffice: %s" % bossZone)
         bossCog.requestDelete()
         self.air.deallocateZone(bossZone)
+
+    def __refillPool(self, task):
+        # One office a frame, so we don't hold up any rounds going on.
+        if len(self.pool) >= min(self.poolMin, self.poolMax):
+            return task.done
+
+        self.pool.append(self.makeBossOffice())
+        return task.cont
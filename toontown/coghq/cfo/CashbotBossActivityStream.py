@@ -0,0 +1,154 @@
+from collections import deque
+
+from direct.showbase.DirectObject import DirectObject
+from direct.task.Task import Task
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+
+
+class CashbotBossActivityStream(DirectObject):
+    """The activity log of a CFO battle, as seen from the AI.  Events
+    are numeric codes with a few numbers attached; see
+    CraneLeagueGlobals.ACTIVITY_EVENTS.  The most recent events are
+    kept in a ring buffer, and the events of each frame are sent in
+    one message to each client that has subscribed to their category.
+    Nothing is ever turned into text here; the clients do that.
+
+    Only the categories the ruleset's debug flags turn on are recorded
+    at all.  Those are worked out again in updateEnabled() whenever the
+    ruleset changes, not every time something is logged, so a log()
+    that nobody wants is a single set lookup."""
+
+    # How many events to remember, for clients that subscribe late.
+    bufferSize = 256
+
+    # After everything else in the frame has had a chance to log.
+    taskSort = 50
+
+    def __init__(self, boss):
+        DirectObject.__init__(self)
+        self.boss = boss
+        self.running = False
+
+        # The most recent events, as (category, code, doId, args).
+        self.events = deque(maxlen=self.bufferSize)
+
+        # Events logged this frame and not yet sent.
+        self.unsent = []
+
+        # Maps avId -> bitmask of the categories that avatar wants.
+        self.subscribers = {}
+
+        # The categories anyone at all wants, as a bitmask.
+        self.wantedMask = 0
+
+        # The categories the ruleset turns on, as a bitmask, and the
+        # event codes in them; see updateEnabled().
+        self.enabledRuleset = None
+        self.enabledMask = 0
+        self.enabledEvents = frozenset()
+        self.updateEnabled()
+
+    def __getTaskName(self):
+        return self.boss.uniqueName("activityEvents")
+
+    def cleanup(self):
+        taskMgr.remove(self.__getTaskName())
+        self.ignoreAll()
+        self.running = False
+        self.events.clear()
+        self.unsent = []
+        self.subscribers = {}
+        self.wantedMask = 0
+
+    def updateEnabled(self):
+        # Works out which categories the boss's ruleset turns on.  The
+        # boss calls this whenever it changes the ruleset.  Returns true
+        # if that's different from before.
+        ruleset = self.boss.ruleset
+        if ruleset is self.enabledRuleset:
+            return False
+        self.enabledRuleset = ruleset
+
+        mask = 0
+        for category, flag in CraneLeagueGlobals.ACTIVITY_CATEGORY_FLAGS.items():
+            if getattr(ruleset, flag):
+                mask |= 1 << category
+
+        if mask == self.enabledMask:
+            return False
+        self.enabledMask = mask
+        self.enabledEvents = frozenset(
+            code for code, (category, _text) in CraneLeagueGlobals.ACTIVITY_EVENTS.items() if mask & (1 << category)
+        )
+        return True
+
+    def isEnabled(self, category):
+        return bool(self.enabledMask & (1 << category))
+
+    def wants(self, code):
+        # Returns true if an event with this code would be recorded.
+        # Call sites that have to do some work to come up with the
+        # numbers for an event can check this first.
+        return code in self.enabledEvents
+
+    def log(self, code, doId, *args):
+        # Records an activity event.  args must all be numbers; state
+        # names go through CraneLeagueGlobals.getActivityStateIndex().
+        if code not in self.enabledEvents:
+            return
+
+        self.__record(code, doId, args)
+
+    def __record(self, code, doId, args):
+        category = CraneLeagueGlobals.ACTIVITY_EVENTS[code][0]
+        event = (category, code, doId or self.boss.doId, args)
+        self.events.append(event)
+
+        if self.wantedMask & (1 << category):
+            self.unsent.append(event)
+            if not self.running:
+                self.running = True
+                taskMgr.add(self.__sendTask, self.__getTaskName(), sort=self.taskSort)
+
+    def getRecentEvents(self, categoryMask=~0):
+        # Returns the events we still remember in the indicated
+        # categories, oldest first, as (code, doId, args).
+        return [(code, doId, args) for category, code, doId, args in self.events if categoryMask & (1 << category)]
+
+    def setSubscriptions(self, avId, categoryMask):
+        # The avatar wants to hear about events in the indicated
+        # categories from now on.  We start him off with what we
+        # remember of them.
+        oldMask = self.subscribers.get(avId, 0)
+        if categoryMask:
+            self.subscribers[avId] = categoryMask
+            if not oldMask:
+                self.accept(self.boss.air.getAvatarExitEvent(avId), self.setSubscriptions, [avId, 0])
+        else:
+            self.subscribers.pop(avId, None)
+            self.ignore(self.boss.air.getAvatarExitEvent(avId))
+        self.__updateWantedMask()
+
+        newCategories = categoryMask & ~oldMask
+        if newCategories:
+            backlog = self.getRecentEvents(newCategories)
+            if backlog:
+                self.boss.d_addActivityEvents(avId, backlog)
+
+    def __updateWantedMask(self):
+        mask = 0
+        for categoryMask in self.subscribers.values():
+            mask |= categoryMask
+        self.wantedMask = mask
+
+    def __sendTask(self, task):
+        unsent = self.unsent
+        self.unsent = []
+        for avId, categoryMask in self.subscribers.items():
+            events = [(code, doId, args) for category, code, doId, args in unsent if categoryMask & (1 << category)]
+            if events:
+                self.boss.d_addActivityEvents(avId, events)
+
+        self.running = False
+        return Task.done
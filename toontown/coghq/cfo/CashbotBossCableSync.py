@@ -0,0 +1,84 @@
+class CashbotBossCableSync:
+    """Decides when the client controlling a crane should tell the
+    other clients where its arm and cable are, and packs the cable up
+    for the wire.
+
+    Nothing is sent while the cable hangs still, apart from a slow
+    heartbeat.  Once it moves, it is sent at the normal rate, or at the
+    fast rate while the magnet is really swinging.  The magnet goes out
+    at full precision, and the links above it as small offsets from
+    the magnet."""
+
+    # Seconds between sends: while the cable is at rest, while it's
+    # moving, and while it's swinging fast.
+    restPeriod = 0.5
+    normalPeriod = 0.05
+    fastPeriod = 0.025
+
+    # Movement smaller than this since the last send (in feet, and
+    # degrees for the arm) counts as being at rest.
+    posThreshold = 0.05
+    hThreshold = 0.25
+
+    # Feet per second of the fastest-moving link above which the
+    # cable counts as swinging fast.
+    fastSpeed = 15.0
+
+    # The limits of the LinkPosition and LinkOffset structs in the DC
+    # file.
+    maxPos = 327.0
+    maxOffset = 25.0
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Forgets what we last sent, so that the next check sends.
+        self.lastTime = None
+        self.lastY = 0.0
+        self.lastH = 0.0
+        self.lastLinks = []
+
+    def shouldSend(self, now, y, h, links):
+        # Returns true if it's time to send the cable, given where the
+        # arm and links are now.
+        if self.lastTime is None:
+            return True
+
+        elapsed = now - self.lastTime
+        motion = abs(y - self.lastY)
+        for link, lastLink in zip(links, self.lastLinks):
+            motion = max(motion, abs(link[0] - lastLink[0]), abs(link[1] - lastLink[1]), abs(link[2] - lastLink[2]))
+
+        if motion < self.posThreshold and abs(h - self.lastH) < self.hThreshold:
+            return elapsed >= self.restPeriod
+
+        if elapsed <= 0:
+            return False
+        if motion / elapsed >= self.fastSpeed:
+            return elapsed >= self.fastPeriod
+        return elapsed >= self.normalPeriod
+
+    def markSent(self, now, y, h, links):
+        self.lastTime = now
+        self.lastY = y
+        self.lastH = h
+        self.lastLinks = [tuple(link) for link in links]
+
+    @classmethod
+    def packLinks(cls, links):
+        # Returns (magnet, offsets) for the given link positions, the
+        # bottom link being the magnet.
+        magnet = tuple(max(-cls.maxPos, min(cls.maxPos, v)) for v in links[-1])
+        offsets = []
+        for link in links[:-1]:
+            offsets.append(tuple(max(-cls.maxOffset, min(cls.maxOffset, v - m)) for v, m in zip(link, magnet)))
+        return magnet, offsets
+
+    @staticmethod
+    def unpackLinks(magnet, offsets):
+        # Returns the link positions for the given (magnet, offsets),
+        # as packed by packLinks().
+        links = [tuple(m + o for m, o in zip(magnet, offset)) for offset in offsets]
+        links.append(tuple(magnet))
+        return links
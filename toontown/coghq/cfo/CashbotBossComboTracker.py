@@ -1,5 +1,7 @@
 import math
 
+from toontown.coghq.cfo import CraneLeagueGlobals
+
 
 class CashbotBossComboTracker:
     def __init__(self, boss, avId):
@@ -7,36 +9,53 @@ class CashbotBossComboTracker:
         self.avId = avId
         self.combo = 0
         self.pointBonus = 0
+        self.expireTimer = None
 
-    def __getTaskName(self):
-        return "cashbotBossComboTrackerTask" + str(self.avId)
+        # However many times the combo changes before the boss's timers
+        # next tick, the clients only need to hear about it once.
+        self.updateTimer = None
 
     def __expireComboLater(self):
-        taskMgr.remove(self.__getTaskName())  # cancel the task if it already exists
-        taskMgr.doMethodLater(self.boss.ruleset.COMBO_DURATION, self.__expireCombo, self.__getTaskName())
+        self.boss.timers.cancel(self.expireTimer)  # cancel the timer if it already exists
+        self.expireTimer = self.boss.timers.schedule(self.boss.ruleset.COMBO_DURATION, self.__expireCombo)
 
-    def __expireCombo(self, task):
+    def __expireCombo(self):
+        self.expireTimer = None
         if self.combo >= 2:
             self.__awardCombo()
         else:
             self.resetCombo()
 
+    def __updateComboLater(self):
+        if self.updateTimer is None:
+            self.updateTimer = self.boss.timers.schedule(0, self.__updateCombo)
+
+    def __updateCombo(self):
+        self.updateTimer = None
+        self.boss.d_updateCombo(self.avId, self.combo)
+
     def incrementCombo(self, amount):
         amount = round(amount)
         self.combo += 1
         self.pointBonus += amount
         self.__expireComboLater()
-        self.boss.d_updateCombo(self.avId, self.combo)
+        self.__updateComboLater()
 
     def resetCombo(self):
-        taskMgr.remove(self.__getTaskName())
+        self.boss.timers.cancel(self.expireTimer)
+        self.expireTimer = None
         self.combo = 0
         self.pointBonus = 0
-        self.boss.d_updateCombo(self.avId, self.combo)
+        self.__updateComboLater()
 
     def __awardCombo(self):
-        self.boss.d_awardCombo(self.avId, self.combo, int(math.ceil(self.pointBonus)))
+        self.boss.scores.addScore(
+            self.avId, int(math.ceil(self.pointBonus)), CraneLeagueGlobals.SCORE_COMBO, self.combo
+        )
         self.resetCombo()
 
     def cleanup(self):
-        taskMgr.remove(self.__getTaskName())
+        self.boss.timers.cancel(self.expireTimer)
+        self.expireTimer = None
+        self.boss.timers.cancel(self.updateTimer)
+        self.updateTimer = None
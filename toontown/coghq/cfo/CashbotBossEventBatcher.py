@@ -0,0 +1,90 @@
+from direct.task.Task import Task
+from panda3d.direct import DCPacker
+
+
+class CashbotBossEventBatcher:
+    """Holds on to the boss's stat updates (damage, scores, standings,
+    combos and attack codes) until the end of the frame, and then sends
+    them all to the clients in one applyEventBatch message, rather than
+    one message apiece.  A safe to the head or a chain of stuns makes a
+    burst of these, all in the same frame.
+
+    The batch is each update packed just as the field itself would
+    pack it, after the field's number, so the client can hand each one
+    to the usual method, in the order they happened.
+
+    None of these fields may be ram fields: the state server only
+    remembers a ram field's latest value if it's sent as that field.
+    A toon joining (or spectating) later is caught up instead by the
+    boss's battle snapshot, which isn't batched."""
+
+    # The fields that go through the batch; the client won't take
+    # anything else from one.  Anything else the boss sends goes out
+    # right away as usual.
+    batchedFields = (
+        "setBossDamage",
+        "updateScore",
+        "setStandings",
+        "updateCombo",
+        "setAttackCode",
+    )
+
+    # After everything else in the frame has had a chance to add to
+    # the batch.
+    taskSort = 60
+
+    def __init__(self, boss):
+        self.boss = boss
+        self.running = False
+
+        # The updates of this frame, as (fieldName, args).
+        self.pending = []
+
+    def __getTaskName(self):
+        return self.boss.uniqueName("eventBatch")
+
+    def cleanup(self):
+        # Forgets anything not yet sent.
+        taskMgr.remove(self.__getTaskName())
+        self.running = False
+        self.pending = []
+
+    def sendUpdate(self, fieldName, args):
+        # Sends the update at the end of the frame, along with any
+        # others.
+        self.pending.append((fieldName, args))
+        if not self.running:
+            self.running = True
+            taskMgr.add(self.__flushTask, self.__getTaskName(), sort=self.taskSort)
+
+    def flush(self):
+        # Sends whatever is waiting, right now.
+        pending = self.pending
+        self.pending = []
+        if not pending:
+            return
+
+        if len(pending) == 1:
+            # There's nothing to be gained by wrapping just one.
+            self.boss.sendUpdate(*pending[0])
+            return
+
+        dclass = self.boss.dclass
+        chunks = []
+        for fieldName, args in pending:
+            field = dclass.getFieldByName(fieldName)
+            packer = DCPacker()
+            packer.rawPackUint16(field.getNumber())
+            packer.beginPack(field)
+            field.packArgs(packer, args)
+            if packer.endPack():
+                chunks.append(packer.getBytes())
+            else:
+                self.boss.notify.warning("Could not pack %s%s into the event batch." % (fieldName, tuple(args)))
+
+        self.boss.sendUpdate("applyEventBatch", [b"".join(chunks)])
+
+    def __flushTask(self, task):
+        self.running = False
+        self.flush()
+        return Task.done
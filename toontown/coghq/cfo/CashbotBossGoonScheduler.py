@@ -0,0 +1,190 @@
+import heapq
+from array import array
+
+from direct.task.Task import Task
+
+
+class CashbotBossGoonScheduler:
+    """Keeps track of the legs the goons in a CFO battle are walking.
+    On the AI a walking goon just stands at the start of its leg until
+    it arrives, so rather than each goon waiting on its own do-later,
+    the boss keeps every leg in one place, works out where a goon
+    really is only when someone asks, and fires all of the arrivals
+    from one priority queue each frame."""
+
+    def __init__(self, boss):
+        self.boss = boss
+        self.running = False
+
+        # The frame time at which we were paused, or None if we're
+        # running; see pause().
+        self.pausedAt = None
+
+        # The legs in progress, one slot per leg, in parallel arrays.
+        # A slot is reused once its leg is over.
+        self.startX = array("d")
+        self.startY = array("d")
+        self.startZ = array("d")
+        self.targetX = array("d")
+        self.targetY = array("d")
+        self.departure = array("d")
+        self.arrival = array("d")
+        self.serials = array("q")
+        self.columns = (
+            self.startX,
+            self.startY,
+            self.startZ,
+            self.targetX,
+            self.targetY,
+            self.departure,
+            self.arrival,
+            self.serials,
+        )
+        self.goons = []
+        self.callbacks = []
+        self.freeSlots = []
+
+        # Maps goon doId -> slot of the leg that goon is walking.
+        self.slots = {}
+
+        # A heap of (arrival, serial, slot).  An entry whose serial no
+        # longer matches its slot belongs to a leg that was stopped
+        # early, and is skipped when it comes up.
+        self.arrivals = []
+        self.nextSerial = 0
+
+    def __getTaskName(self):
+        return self.boss.uniqueName("goonLegs")
+
+    def cleanup(self):
+        taskMgr.remove(self.__getTaskName())
+        self.running = False
+        for doId in list(self.slots.keys()):
+            self.__freeSlot(self.slots[doId])
+        self.arrivals = []
+        self.pausedAt = None
+
+    def startLeg(self, goon, start, target, departure, arrival, callback):
+        # The goon sets out from start toward target, leaving at time
+        # departure and arriving at time arrival, whereupon we call
+        # callback().
+        self.stopLeg(goon)
+
+        serial = self.nextSerial
+        self.nextSerial += 1
+        leg = (start[0], start[1], start[2], target[0], target[1], departure, arrival, serial)
+        if self.freeSlots:
+            slot = self.freeSlots.pop()
+            for column, value in zip(self.columns, leg):
+                column[slot] = value
+            self.goons[slot] = goon
+            self.callbacks[slot] = callback
+        else:
+            slot = len(self.goons)
+            for column, value in zip(self.columns, leg):
+                column.append(value)
+            self.goons.append(goon)
+            self.callbacks.append(callback)
+
+        self.slots[goon.doId] = slot
+        heapq.heappush(self.arrivals, (arrival, serial, slot))
+
+        if not self.running and self.pausedAt is None:
+            self.running = True
+            taskMgr.add(self.__arrivalTask, self.__getTaskName())
+
+    def pause(self):
+        # Stops the goons where they are: nobody arrives until resume(),
+        # and every leg then has as long left as it had now.
+        if self.pausedAt is not None:
+            return
+        self.pausedAt = globalClock.getFrameTime()
+        taskMgr.remove(self.__getTaskName())
+        self.running = False
+
+    def resume(self):
+        # Returns the number of seconds we were paused.
+        if self.pausedAt is None:
+            return 0.0
+
+        elapsed = globalClock.getFrameTime() - self.pausedAt
+        self.pausedAt = None
+
+        arrivals = []
+        for slot in self.slots.values():
+            self.departure[slot] += elapsed
+            self.arrival[slot] += elapsed
+            arrivals.append((self.arrival[slot], self.serials[slot], slot))
+        heapq.heapify(arrivals)
+        self.arrivals = arrivals
+
+        if self.slots:
+            self.running = True
+            taskMgr.add(self.__arrivalTask, self.__getTaskName())
+        return elapsed
+
+    def __getNow(self):
+        return globalClock.getFrameTime() if self.pausedAt is None else self.pausedAt
+
+    def stopLeg(self, goon):
+        slot = self.slots.get(goon.doId)
+        if slot is not None:
+            self.__freeSlot(slot)
+
+    def isWalking(self, goon):
+        return goon.doId in self.slots
+
+    def getPos(self, goon, elapsed=None):
+        # Returns where the goon is right now, somewhere along the leg
+        # it's walking, or where it would be elapsed seconds after
+        # setting out.
+        slot = self.slots.get(goon.doId)
+        if slot is None:
+            return goon.getPos()
+        return self.__getSlotPos(slot, self.__getNow(), elapsed)
+
+    def getPositions(self):
+        # Returns a dictionary of doId -> (x, y, z) for all of the
+        # goons walking right now.
+        now = self.__getNow()
+        return {doId: self.__getSlotPos(slot, now) for doId, slot in self.slots.items()}
+
+    def __getSlotPos(self, slot, now, elapsed=None):
+        departure = self.departure[slot]
+        duration = self.arrival[slot] - departure
+        if elapsed is None:
+            elapsed = now - departure
+        t = min(max(elapsed / duration, 0.0), 1.0) if duration > 0 else 1.0
+
+        x = self.startX[slot]
+        y = self.startY[slot]
+        return (x + (self.targetX[slot] - x) * t, y + (self.targetY[slot] - y) * t, self.startZ[slot])
+
+    def __freeSlot(self, slot):
+        goon = self.goons[slot]
+        del self.slots[goon.doId]
+        self.goons[slot] = None
+        self.callbacks[slot] = None
+        self.serials[slot] = -1
+        self.freeSlots.append(slot)
+
+    def __arrivalTask(self, task):
+        now = globalClock.getFrameTime()
+        arrivals = self.arrivals
+        while arrivals and arrivals[0][0] <= now:
+            _arrival, serial, slot = heapq.heappop(arrivals)
+            if self.serials[slot] != serial:
+                # This leg was stopped early.
+                continue
+
+            # The callback will usually stop the leg itself, to put the
+            # goon where it ended up; if not, we do.
+            self.callbacks[slot]()
+            if self.serials[slot] == serial:
+                self.__freeSlot(slot)
+
+        if not self.slots:
+            self.arrivals = []
+            self.running = False
+            return Task.done
+        return Task.cont
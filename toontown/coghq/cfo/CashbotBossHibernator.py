@@ -0,0 +1,148 @@
+from panda3d.core import ConfigVariableBool, ConfigVariableDouble
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+
+
+class CashbotBossHibernator:
+    """Puts a CFO battle to sleep while nobody is playing it: when every
+    toon still in battle three is spectating (or gone), the boss's
+    timers, goon legs and do-laters are all suspended, and game time
+    stops, until a toon is back in play.  Then everything carries on
+    with as long left as it had when it stopped, so a sleeping room
+    costs nothing at all per frame.  The clients' round timers are
+    stopped and started along with it.
+
+    Nothing polls for this; the boss calls update() whenever the toons
+    in battle three might have changed."""
+
+    notify = directNotify.newCategory("CashbotBossHibernator")
+
+    wantHibernation = ConfigVariableBool("want-boss-hibernation", True).value
+
+    # How long a room must go without a toon in play before it goes to
+    # sleep, so a toon switching to spectating and back doesn't wake and
+    # sleep everything for nothing.
+    hibernateDelay = ConfigVariableDouble("boss-hibernate-delay", 10.0).value
+
+    # We go to sleep after the frame's gameplay tasks have all run, so
+    # none of them is left behind a frame when we wake up.
+    taskSort = 40
+
+    # The boss's own do-laters that are stopped while we sleep.  The
+    # gameplay timers and the goon legs have pause() and resume() of
+    # their own.
+    taskNames = (
+        "NextAttack",
+        "NextHelmet",
+        "CheckNearbySafes",
+        "times-up-task",
+        "post-times-up-task",
+        "failedCraneRound",
+    )
+
+    def __init__(self, boss):
+        self.boss = boss
+
+        # The frame time we went to sleep, or None if we're awake.
+        self.hibernatedAt = None
+
+        # (task, seconds it had left) for each do-later we stopped.
+        self.suspendedTasks = []
+
+        # Running totals; see getStats().
+        self.numHibernations = 0
+        self.secondsHibernated = 0.0
+
+    def __getTaskName(self):
+        return self.boss.uniqueName("hibernate")
+
+    def cleanup(self):
+        # Forgets everything without waking up; the boss is about to
+        # throw away whatever we were holding anyway.
+        taskMgr.remove(self.__getTaskName())
+        self.hibernatedAt = None
+        self.suspendedTasks = []
+
+    def isHibernating(self):
+        return self.hibernatedAt is not None
+
+    def hasToonsInPlay(self):
+        doId2do = self.boss.air.doId2do
+        return any(avId in doId2do for avId in self.boss.getInvolvedToonsNotSpectating())
+
+    def update(self):
+        # Goes to sleep (after a little while) if nobody is playing,
+        # or wakes right up if somebody is.
+        if self.boss.getCurrentOrNextState() == "BattleThree" and not self.hasToonsInPlay():
+            if self.wantHibernation and not self.isHibernating():
+                taskName = self.__getTaskName()
+                if not taskMgr.hasTaskNamed(taskName):
+                    taskMgr.doMethodLater(self.hibernateDelay, self.__hibernateTask, taskName, sort=self.taskSort)
+            return
+
+        taskMgr.remove(self.__getTaskName())
+        self.wake()
+
+    def __hibernateTask(self, task):
+        self.hibernate()
+        return task.done
+
+    def hibernate(self):
+        if self.isHibernating():
+            return
+
+        boss = self.boss
+        now = globalClock.getFrameTime()
+        self.hibernatedAt = now
+        boss.timers.pause()
+        boss.goonScheduler.pause()
+
+        for name in self.taskNames:
+            for task in taskMgr.getTasksNamed(boss.uniqueName(name)):
+                self.suspendedTasks.append((task, max(0.0, task.getWakeTime() - now)))
+                taskMgr.remove(task)
+
+        boss.d_setTimerPaused(True)
+
+        self.numHibernations += 1
+        self.notify.info("%s hibernating, nobody is playing" % boss.doId)
+        boss.activity.log(CraneLeagueGlobals.ACTIVITY_HIBERNATED, None)
+
+    def wake(self):
+        if not self.isHibernating():
+            return
+
+        boss = self.boss
+        elapsed = globalClock.getFrameTime() - self.hibernatedAt
+        self.hibernatedAt = None
+        self.secondsHibernated += elapsed
+
+        # Game time stood still while we slept.
+        boss.battleThreeStart += elapsed
+        boss.battleThreeTimeStarted += elapsed
+
+        boss.timers.resume()
+        boss.goonScheduler.resume()
+        for goon in boss.goons or ():
+            goon.delayWalk(elapsed)
+
+        for task, delayTime in self.suspendedTasks:
+            taskMgr.doMethodLater(delayTime, task, task.getName())
+        self.suspendedTasks = []
+
+        boss.d_setTimerPaused(False)
+
+        self.notify.info("%s waking up after %.1fs" % (boss.doId, elapsed))
+        boss.activity.log(CraneLeagueGlobals.ACTIVITY_WOKE, None, elapsed)
+
+    def getStats(self):
+        # Returns a dictionary of whether we're asleep, how many times
+        # we've gone to sleep, and for how long all told.
+        secondsHibernated = self.secondsHibernated
+        if self.isHibernating():
+            secondsHibernated += globalClock.getFrameTime() - self.hibernatedAt
+        return {
+            "hibernating": self.isHibernating(),
+            "hibernations": self.numHibernations,
+            "secondsHibernated": secondsHibernated,
+        }
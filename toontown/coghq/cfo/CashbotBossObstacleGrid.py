@@ -0,0 +1,456 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class CashbotBossObstacleGrid:
+    """A uniform grid of the things the goons steer around in the CFO
+    battle room: safes, crane control areas, the paths of other goons
+    and the walls of the room.  The goons cast their feelers against
+    the nearby cells of this grid instead of running a collision
+    traversal over the whole scene.
+
+    The grid never goes looking for where things are; each obstacle
+    tells it whenever it moves, so a cast only reads the grid."""
+
+    # The width of a grid cell, in feet.  The room is about 90 feet
+    # across and a goon's feelers reach 15 feet, so a feeler spray
+    # only ever touches a handful of cells.
+    cellSize = 10.0
+
+    def __init__(self):
+        # Maps key -> (shape, cells), where shape is the tuple
+        # (ax, ay, bx, by, z, radius, isTube) describing either a
+        # sphere at a (with a == b), or a tube from a to b.  The two
+        # differ even when the tube has no length, the same way
+        # CollisionSphere and CollisionTube do: a feeler that starts
+        # inside a sphere strikes it where it starts, but one that
+        # starts inside a tube is pushed out to its surface.
+        self.obstacles = {}
+
+        # Maps (cellX, cellY) -> set of keys overlapping that cell.
+        self.cells = {}
+
+        # The inside of an inverted sphere that everyone must stay in.
+        self.boundary = None
+
+    def clear(self):
+        self.obstacles = {}
+        self.cells = {}
+        self.boundary = None
+
+    def setSphere(self, key, x, y, z, radius):
+        self.setShape(key, (x, y, x, y, z, radius, 0))
+
+    def setTube(self, key, ax, ay, bx, by, z, radius):
+        self.setShape(key, (ax, ay, bx, by, z, radius, 1))
+
+    def setShape(self, key, shape):
+        # Places (or moves) an obstacle, rebinning it only if it has
+        # actually changed.
+        old = self.obstacles.get(key)
+        if old is not None:
+            if old[0] == shape:
+                return
+            self.__unbin(key, old[1])
+
+        if shape is None:
+            self.obstacles.pop(key, None)
+            return
+
+        cells = self.__getCells(shape)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(key)
+        self.obstacles[key] = (shape, cells)
+
+    def remove(self, key):
+        self.setShape(key, None)
+
+    def setBoundary(self, x, y, z, radius):
+        self.boundary = (x, y, z, radius)
+
+    def __unbin(self, key, cells):
+        for cell in cells:
+            keys = self.cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cells[cell]
+
+    def __getCells(self, shape):
+        ax, ay, bx, by, z, radius, isTube = shape
+        return self.__getCellRange(
+            min(ax, bx) - radius, min(ay, by) - radius, max(ax, bx) + radius, max(ay, by) + radius
+        )
+
+    def __getCellRange(self, minX, minY, maxX, maxY):
+        size = self.cellSize
+        x0 = int(math.floor(minX / size))
+        x1 = int(math.floor(maxX / size))
+        y0 = int(math.floor(minY / size))
+        y1 = int(math.floor(maxY / size))
+        return tuple((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+
+    def getNearbyShapes(self, x, y, reach, ignore=None):
+        # Returns the shapes of all of the obstacles within the cells
+        # touched by a circle of the indicated reach around (x, y).
+        keys = set()
+        for cell in self.__getCellRange(x - reach, y - reach, x + reach, y + reach):
+            found = self.cells.get(cell)
+            if found:
+                keys.update(found)
+
+        keys.discard(ignore)
+        return [self.obstacles[key][0] for key in keys]
+
+    def castFeelers(self, x, y, z, h, headings, start, length, ignore=None):
+        # Casts a spray of horizontal feeler segments out from the
+        # point (x, y, z), one per relative heading in headings, each
+        # running from distance start to distance length along its
+        # heading, with h the heading of the caster.  Returns a list
+        # with, for each feeler, the distance from (x, y) to the
+        # nearest point at which it strikes an obstacle, or None if
+        # the way is clear.
+        shapes = self.getNearbyShapes(x, y, length, ignore=ignore)
+
+        # Flatten the shapes down to the plane of the feelers.  A
+        # sphere or tube above or below us looks like a smaller one
+        # from here, or misses us entirely.  Each is kept along with a
+        # circle around it, relative to us, so that most feelers can
+        # pass it by without a closer look; and if none of them can
+        # reach that circle, it's dropped now.
+        flat = []
+        for ax, ay, bx, by, oz, radius, isTube in shapes:
+            dz = oz - z
+            if dz * dz >= radius * radius:
+                continue
+            radius = math.sqrt(radius * radius - dz * dz)
+            ox = (ax + bx) * 0.5 - x
+            oy = (ay + by) * 0.5 - y
+            bound = math.sqrt((bx - ax) ** 2 + (by - ay) ** 2) * 0.5 + radius
+            if ox * ox + oy * oy > (length + bound) ** 2:
+                continue
+            flat.append((ox, oy, bound, ax, ay, bx, by, radius, isTube))
+
+        boundary = None
+        if self.boundary is not None:
+            cx, cy, cz, radius = self.boundary
+            dz = cz - z
+            if dz * dz < radius * radius:
+                boundary = (cx, cy, math.sqrt(radius * radius - dz * dz))
+
+        span = length - start
+        result = []
+        for heading in headings:
+            rad = math.radians(h + heading)
+            dx = -math.sin(rad)
+            dy = math.cos(rad)
+            sx = x + dx * start
+            sy = y + dy * start
+
+            # Find the struck point nearest to the start of the feeler.
+            best = None
+            bestDist = None
+            for ox, oy, bound, ax, ay, bx, by, radius, isTube in flat:
+                along = ox * dx + oy * dy
+                if along < start - bound or along > length + bound:
+                    continue
+                across = ox * dy - oy * dx
+                if across > bound or across < -bound:
+                    continue
+
+                if isTube:
+                    point = segmentEntersTube(sx, sy, dx, dy, span, ax, ay, bx, by, radius)
+                else:
+                    t = segmentEntersCircle(sx, sy, dx, dy, span, ax, ay, radius)
+                    point = None if t is None else (sx + dx * t, sy + dy * t)
+                if point is not None:
+                    dist = (point[0] - sx) ** 2 + (point[1] - sy) ** 2
+                    if best is None or dist < bestDist:
+                        best = point
+                        bestDist = dist
+
+            if boundary is not None:
+                t = segmentLeavesCircle(sx, sy, dx, dy, span, *boundary)
+                if t is not None and (best is None or t * t < bestDist):
+                    best = (sx + dx * t, sy + dy * t)
+
+            result.append(None if best is None else math.sqrt((best[0] - x) ** 2 + (best[1] - y) ** 2))
+
+        return result
+
+    def castFeelersBatch(self, casters, headings, start, length):
+        # Like castFeelers(), but for a whole list of casters at once,
+        # each given as (key, x, y, z, h); a caster never strikes the
+        # obstacle stored under its own key.  Returns a casters x
+        # headings array of distances, with nan where the way is
+        # clear.  Requires numpy.
+        keys = list(self.obstacles.keys())
+        shapes = numpy.array([self.obstacles[key][0] for key in keys], dtype=float).reshape(-1, 7)
+        x, y, z, h = numpy.array([caster[1:] for caster in casters], dtype=float).reshape(-1, 4).T
+
+        # The start point and direction of each feeler: casters x
+        # headings.
+        rad = numpy.radians(h[:, None] + numpy.asarray(headings, dtype=float)[None, :])
+        dx = -numpy.sin(rad)
+        dy = numpy.cos(rad)
+        sx = x[:, None] + dx * start
+        sy = y[:, None] + dy * start
+        span = length - start
+
+        inf = numpy.inf
+        bestKey = numpy.full(sx.shape, inf)
+        bestValue = numpy.full(sx.shape, inf)
+
+        # Pair up each caster with the obstacles within reach of its
+        # feelers (and in their plane), the same ones castFeelers()
+        # would find in the grid cells around it.
+        ax, ay, bx, by, oz, radius, isTube = shapes.T
+        flat = radius**2 - (oz[None, :] - z[:, None]) ** 2
+        reach = length + radius
+        near = (
+            (flat > 0)
+            & (x[:, None] > numpy.minimum(ax, bx) - reach)
+            & (x[:, None] < numpy.maximum(ax, bx) + reach)
+            & (y[:, None] > numpy.minimum(ay, by) - reach)
+            & (y[:, None] < numpy.maximum(ay, by) + reach)
+        )
+        keyIndex = {key: i for i, key in enumerate(keys)}
+        for i, caster in enumerate(casters):
+            j = keyIndex.get(caster[0])
+            if j is not None:
+                near[i, j] = False
+        ci, oi = numpy.nonzero(near)
+
+        if len(ci):
+            # From here on, everything is pairs x headings.
+            r = numpy.sqrt(flat[ci, oi])[:, None]
+            ax = ax[oi][:, None]
+            ay = ay[oi][:, None]
+            ux = bx[oi][:, None] - ax
+            uy = by[oi][:, None] - ay
+            pdx = dx[ci]
+            pdy = dy[ci]
+            psx = sx[ci]
+            psy = sy[ci]
+            ox = psx - ax
+            oy = psy - ay
+
+            isSphere = isTube[oi][:, None] == 0
+            axisLength = numpy.hypot(ux, uy)
+            noLength = axisLength == 0
+            safeLength = numpy.where(noLength, 1.0, axisLength)
+            ux = numpy.where(noLength, 1.0, ux / safeLength)
+            uy = numpy.where(noLength, 0.0, uy / safeLength)
+
+            # The distance from the start of the feeler to the struck
+            # point, which decides which obstacle is nearest, and the
+            # distance from the caster to it, which is what we report.
+            along = ux * ox + uy * oy
+            clamped = numpy.clip(along, 0.0, axisLength)
+            nx = ox - ux * clamped
+            ny = oy - uy * clamped
+            offset = numpy.hypot(nx, ny)
+            inside = offset < r
+
+            # Feelers that start inside a sphere strike it right where
+            # they start, and those that start inside a tube are
+            # pushed out to the nearest point on its surface.
+            centered = offset == 0
+            nx = numpy.where(centered, -ux, nx)
+            ny = numpy.where(centered, -uy, ny)
+            scale = r / numpy.where(centered, 1.0, offset)
+            px = ax + ux * clamped + nx * scale
+            py = ay + uy * clamped + ny * scale
+            key = numpy.where(isSphere, 0.0, numpy.hypot(px - psx, py - psy))
+            value = numpy.where(isSphere, start, numpy.hypot(px - x[ci][:, None], py - y[ci][:, None]))
+
+            # Everything else is struck where it first enters one of
+            # the circles at either end, or the rectangle between them.
+            t = numpy.full(ox.shape, inf)
+            for cx, cy in ((ox, oy), (ox - ux * axisLength, oy - uy * axisLength)):
+                b = pdx * cx + pdy * cy
+                disc = b * b - (cx * cx + cy * cy - r * r)
+                entry = -b - numpy.sqrt(numpy.maximum(disc, 0))
+                hit = (disc >= 0) & (entry >= 0) & (entry <= span)
+                t = numpy.where(hit & (entry < t), entry, t)
+
+            # Clip the feeler against the two slabs bounding the
+            # rectangle: along the axis and across it.
+            tMin = numpy.zeros(ox.shape)
+            tMax = numpy.full(ox.shape, float(span))
+            for origin, slope, low, high in (
+                (along, ux * pdx + uy * pdy, 0.0, axisLength),
+                (ux * oy - uy * ox, ux * pdy - uy * pdx, -r, r),
+            ):
+                flatSlope = slope == 0
+                safeSlope = numpy.where(flatSlope, 1.0, slope)
+                t0 = (low - origin) / safeSlope
+                t1 = (high - origin) / safeSlope
+                between = (origin >= low) & (origin <= high)
+                t0, t1 = (
+                    numpy.where(flatSlope, numpy.where(between, -inf, inf), numpy.minimum(t0, t1)),
+                    numpy.where(flatSlope, numpy.where(between, inf, -inf), numpy.maximum(t0, t1)),
+                )
+                tMin = numpy.maximum(tMin, t0)
+                tMax = numpy.minimum(tMax, t1)
+
+            crossed = (tMin <= tMax) & ~isSphere
+            t = numpy.where(crossed & (tMin < t), tMin, t)
+            key = numpy.where(inside, key, t)
+            value = numpy.where(inside, value, start + t)
+
+            # Now pick the nearest obstacle on each feeler, by spreading
+            # the pairs back out to casters x headings x (the most
+            # obstacles near any one caster).
+            counts = numpy.bincount(ci, minlength=len(casters))
+            rank = numpy.arange(len(ci)) - (numpy.cumsum(counts) - counts)[ci]
+            keys3 = numpy.full((len(casters), len(headings), counts.max()), inf)
+            values3 = numpy.full(keys3.shape, inf)
+            keys3[ci, :, rank] = key
+            values3[ci, :, rank] = value
+            nearest = numpy.argmin(keys3, axis=2)[:, :, None]
+            bestKey = numpy.take_along_axis(keys3, nearest, axis=2)[:, :, 0]
+            bestValue = numpy.take_along_axis(values3, nearest, axis=2)[:, :, 0]
+
+        # And the walls of the room.
+        if self.boundary is not None:
+            cx, cy, cz, radius = self.boundary
+            flat = (radius * radius - (cz - z) ** 2)[:, None]
+            ox = sx - cx
+            oy = sy - cy
+            b = dx * ox + dy * oy
+            disc = b * b - (ox * ox + oy * oy - flat)
+            root = numpy.sqrt(numpy.maximum(disc, 0))
+            t1 = -b - root
+            t2 = -b + root
+            t = numpy.select(
+                [disc < 0, t2 <= 0, t1 >= span, t1 > 0, t2 >= span],
+                [0.0, 0.0, float(span), t1, inf],
+                t2,
+            )
+            closer = (flat > 0) & (t < bestKey)
+            bestKey = numpy.where(closer, t, bestKey)
+            bestValue = numpy.where(closer, start + t, bestValue)
+
+        return numpy.where(bestValue < inf, bestValue, numpy.nan)
+
+
+def segmentEntersCircle(sx, sy, dx, dy, length, cx, cy, radius):
+    # Returns the distance along the unit direction (dx, dy) from
+    # (sx, sy) at which the segment of the indicated length first
+    # touches the circle, or None if it doesn't.  A segment that
+    # starts inside the circle touches it at 0.
+    ox = sx - cx
+    oy = sy - cy
+    b = dx * ox + dy * oy
+    c = ox * ox + oy * oy - radius * radius
+    if c <= 0:
+        return 0.0
+
+    disc = b * b - c
+    if disc < 0:
+        return None
+
+    t = -b - math.sqrt(disc)
+    if t < 0 or t > length:
+        return None
+    return t
+
+
+def segmentLeavesCircle(sx, sy, dx, dy, length, cx, cy, radius):
+    # The inverse of the above, for an inverted circle that is solid
+    # everywhere outside of it.  Returns None only if the segment
+    # stays entirely within the circle.  This follows the way
+    # CollisionInvSphere reports a segment: a segment crossing back
+    # into the circle strikes it where it crosses, and a segment lying
+    # wholly outside strikes it at one of its two ends.
+    ox = sx - cx
+    oy = sy - cy
+    b = dx * ox + dy * oy
+    disc = b * b - (ox * ox + oy * oy - radius * radius)
+    if disc < 0:
+        return 0.0
+
+    root = math.sqrt(disc)
+    t1 = -b - root
+    t2 = -b + root
+    if t2 <= 0:
+        return 0.0
+    if t1 >= length:
+        return length
+    if t1 > 0:
+        return t1
+    if t2 >= length:
+        return None
+    return t2
+
+
+def segmentEntersTube(sx, sy, dx, dy, length, ax, ay, bx, by, radius):
+    # Returns the point at which the segment first touches the tube
+    # with the indicated axis, or None if it doesn't.
+    ux = bx - ax
+    uy = by - ay
+    axisLength = math.sqrt(ux * ux + uy * uy)
+    if axisLength == 0:
+        # A tube of no length is round, but it still pushes a segment
+        # that starts inside it out to its surface.
+        ux, uy = 1.0, 0.0
+    else:
+        ux /= axisLength
+        uy /= axisLength
+    ox = sx - ax
+    oy = sy - ay
+
+    # A segment that starts inside the tube is pushed out to the
+    # nearest point on its surface, as CollisionTube does.
+    along = min(max(ux * ox + uy * oy, 0.0), axisLength)
+    nx = ox - ux * along
+    ny = oy - uy * along
+    offset = math.sqrt(nx * nx + ny * ny)
+    if offset < radius:
+        if offset == 0:
+            nx, ny, offset = -ux, -uy, 1.0
+        scale = radius / offset
+        return (ax + ux * along + nx * scale, ay + uy * along + ny * scale)
+
+    # Otherwise, the tube is the union of a circle at each end and
+    # the rectangle between them; the segment first touches it
+    # wherever it first touches any of those.
+    best = None
+    for cx, cy in ((ax, ay), (bx, by)):
+        t = segmentEntersCircle(sx, sy, dx, dy, length, cx, cy, radius)
+        if t is not None and (best is None or t < best):
+            best = t
+
+    # Clip the segment against the two slabs bounding the rectangle:
+    # along the axis between 0 and its length, and across the axis
+    # within the radius.
+    tMin = 0.0
+    tMax = length
+    for origin, slope, low, high in (
+        (ux * ox + uy * oy, ux * dx + uy * dy, 0.0, axisLength),
+        (ux * oy - uy * ox, ux * dy - uy * dx, -radius, radius),
+    ):
+        if slope == 0:
+            if origin < low or origin > high:
+                tMin = tMax + 1
+                break
+            continue
+
+        t0 = (low - origin) / slope
+        t1 = (high - origin) / slope
+        if t0 > t1:
+            t0, t1 = t1, t0
+        tMin = max(tMin, t0)
+        tMax = min(tMax, t1)
+
+    if tMin <= tMax and (best is None or tMin < best):
+        best = tMin
+
+    if best is None:
+        return None
+    return (sx + dx * best, sy + dy * best)
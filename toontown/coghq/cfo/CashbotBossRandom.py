@@ -0,0 +1,54 @@
+import hashlib
+import random
+
+
+class CashbotBossRandom:
+    """The random number generators of one CFO battle.  Each kind of
+    roll gets a stream of its own, all derived from a single round
+    seed, so a round can be played again roll for roll from its seed,
+    and rolling more for one thing (say, an extra goon) doesn't change
+    what happens to another (the treasure that drops).
+
+    The streams are attributes, e.g. boss.rng.goons.uniform(0, 1), and
+    stay the same objects across reseeds, so it's safe to hang on to
+    one."""
+
+    streamNames = (
+        "goons",  # Goon spawn sides, stats and walking directions
+        "treasure",  # Treasure drop rolls, landing spots and styles
+        "attacks",  # The boss's choice of attack and gear throw order
+        "modifiers",  # Random modifier rolls
+        "practice",  # Safe relocation and other practice helpers
+        "spawns",  # Toon spawn point order
+    )
+
+    # Seeds are kept to 32 bits, so they're easy to read out, type
+    # into a magic word, and send in an activity event.
+    seedBits = 32
+
+    def __init__(self, seed=None):
+        for name in self.streamNames:
+            setattr(self, name, random.Random())
+        self.seed = None
+        self.reseed(seed)
+
+    @classmethod
+    def makeSeed(cls):
+        return random.SystemRandom().getrandbits(cls.seedBits)
+
+    def reseed(self, seed=None):
+        # Starts all of the streams over from the indicated seed, or a
+        # fresh one if seed is None.  Returns the seed.
+        if seed is None:
+            seed = self.makeSeed()
+        self.seed = seed
+        for name in self.streamNames:
+            getattr(self, name).seed(self.getStreamSeed(seed, name))
+        return seed
+
+    @staticmethod
+    def getStreamSeed(seed, name):
+        # Each stream's seed is a hash of the round seed and the
+        # stream's name, which comes out the same in every process.
+        digest = hashlib.sha256(("%s:%s" % (seed, name)).encode()).digest()
+        return int.from_bytes(digest[:8], "big")
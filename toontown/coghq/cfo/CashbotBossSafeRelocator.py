@@ -0,0 +1,188 @@
+import math
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+
+
+class CashbotBossSafeRelocator:
+    """Finds new places on the floor for safes, near a toon, for safe
+    rush practice (see DistributedCashbotBossAI.checkNearby).  The
+    floor of the room is chopped into small cells once, and only the
+    cells wholly inside the room are kept; candidate spots are then
+    drawn from the cells within reach of the toon, a batch at a time,
+    and checked against where the other safes, the goons and the toons
+    are right now.  Each call has a fixed budget of candidates it may
+    check, so a crowded room can't hold up the frame: a safe that runs
+    out of budget goes to the best spot seen so far, or failing that
+    to any cell in reach, which is always somewhere on the floor."""
+
+    # The width of a floor cell, in feet.
+    cellSize = 2.0
+
+    # The bounding box of the room's floor; isLocationInBounds() has
+    # the actual shape.
+    minX = 77.1
+    maxX = 165.7
+    minY = -359.1
+    maxY = -274.1
+
+    # How far from the toon a safe may be put.
+    reach = 22
+
+    # How many candidates we check at once, and how many all told in
+    # one call.
+    batchSize = 8
+    budget = 96
+
+    # How close a safe may come to the middle of each of these.
+    safeClearance = 8
+    goonClearance = 6
+    toonClearance = 4
+
+    def __init__(self, boss):
+        self.boss = boss
+
+        # Maps (cellX, cellY) -> the (x, y) of the corner of that cell
+        # nearest the origin, for every cell of the floor.  Made the
+        # first time we're needed, since most rounds never are.
+        self.cells = None
+
+        # Running totals; see getStats().
+        self.numRelocated = 0
+        self.numAttempts = 0
+        self.numFallbacks = 0
+        self.mostAttempts = 0
+
+    def getCells(self):
+        if self.cells is None:
+            self.cells = {}
+            size = self.cellSize
+            inBounds = self.boss.isLocationInBounds
+            for cellX in range(int(math.floor(self.minX / size)), int(math.ceil(self.maxX / size))):
+                for cellY in range(int(math.floor(self.minY / size)), int(math.ceil(self.maxY / size))):
+                    x = cellX * size
+                    y = cellY * size
+                    # The room is convex, so if all four corners are
+                    # inside, so is everywhere in between.
+                    if (
+                        inBounds(x, y)
+                        and inBounds(x + size, y)
+                        and inBounds(x, y + size)
+                        and inBounds(x + size, y + size)
+                    ):
+                        self.cells[(cellX, cellY)] = (x, y)
+        return self.cells
+
+    def getCellsInReach(self, x, y):
+        # Returns the corners of the floor cells whose middles are
+        # within reach of (x, y).  If there aren't any (the toon must
+        # be somewhere odd), the cells nearest it instead.
+        cells = self.getCells()
+        size = self.cellSize
+        half = size / 2.0
+        reachSquared = self.reach * self.reach
+        inReach = []
+        for cellX in range(int(math.floor((x - self.reach) / size)), int(math.floor((x + self.reach) / size)) + 1):
+            for cellY in range(int(math.floor((y - self.reach) / size)), int(math.floor((y + self.reach) / size)) + 1):
+                corner = cells.get((cellX, cellY))
+                if corner is None:
+                    continue
+                dx = corner[0] + half - x
+                dy = corner[1] + half - y
+                if dx * dx + dy * dy <= reachSquared:
+                    inReach.append(corner)
+
+        if not inReach:
+            nearest = sorted(
+                cells.values(), key=lambda corner: (corner[0] + half - x) ** 2 + (corner[1] + half - y) ** 2
+            )
+            inReach = nearest[: self.batchSize * 4]
+        return inReach
+
+    def getObstacles(self, movingSafes):
+        # Returns (x, y, clearance squared) for everything a safe
+        # shouldn't be put on top of, leaving out the safes we're about
+        # to move.
+        boss = self.boss
+        obstacles = []
+        for safe in boss.safes or ():
+            if safe in movingSafes or safe.isStashed():
+                continue
+            pos = safe.getPos()
+            obstacles.append((pos[0], pos[1], self.safeClearance * self.safeClearance))
+
+        # Where the goons really are, partway along their legs.
+        for x, y, _z in boss.getGoonPositions().values():
+            obstacles.append((x, y, self.goonClearance * self.goonClearance))
+
+        for avId in boss.involvedToons:
+            toon = boss.air.doId2do.get(avId)
+            if toon:
+                pos = toon.getPos()
+                obstacles.append((pos[0], pos[1], self.toonClearance * self.toonClearance))
+        return obstacles
+
+    def relocate(self, safes, toonX, toonY):
+        # Moves each of the indicated safes somewhere near (toonX,
+        # toonY).  Returns the number of candidates checked for each.
+        rng = self.boss.rng.practice
+        cells = self.getCellsInReach(toonX, toonY)
+        obstacles = self.getObstacles(safes)
+        size = self.cellSize
+
+        remaining = self.budget
+        attemptsPerSafe = []
+        for i, safe in enumerate(safes):
+            # An even share of what's left of the budget.
+            allowed = remaining // (len(safes) - i)
+            attempts = 0
+            best = None
+            bestScore = -math.inf
+            while attempts + self.batchSize <= allowed:
+                for _ in range(self.batchSize):
+                    corner = cells[int(rng.random() * len(cells))]
+                    x = corner[0] + size * rng.random()
+                    y = corner[1] + size * rng.random()
+
+                    # The worst overlap with anything, as distance
+                    # squared less clearance squared; >= 0 is clear.
+                    score = math.inf
+                    for ox, oy, clearanceSquared in obstacles:
+                        score = min(score, (x - ox) ** 2 + (y - oy) ** 2 - clearanceSquared)
+                    if score > bestScore:
+                        best = (x, y)
+                        bestScore = score
+                attempts += self.batchSize
+                if bestScore >= 0:
+                    break
+
+            remaining -= attempts
+            clear = bestScore >= 0
+            if not clear:
+                self.numFallbacks += 1
+                if best is None:
+                    # Out of budget altogether.
+                    corner = cells[int(rng.random() * len(cells))]
+                    best = (corner[0] + size / 2.0, corner[1] + size / 2.0)
+
+            x, y = best
+            safe.move(x, y, 0, 360 * rng.random())
+            obstacles.append((x, y, self.safeClearance * self.safeClearance))
+
+            self.numRelocated += 1
+            self.numAttempts += attempts
+            self.mostAttempts = max(self.mostAttempts, attempts)
+            attemptsPerSafe.append(attempts)
+            self.boss.activity.log(CraneLeagueGlobals.ACTIVITY_SAFE_RELOCATED, safe.doId, attempts, int(clear))
+
+        return attemptsPerSafe
+
+    def getStats(self):
+        # Returns a dictionary of how many safes we've moved, how many
+        # candidates that took on average and at worst, and how many
+        # had to settle for a spot that wasn't clear.
+        return {
+            "relocated": self.numRelocated,
+            "meanAttempts": self.numAttempts / self.numRelocated if self.numRelocated else 0.0,
+            "mostAttempts": self.mostAttempts,
+            "fallbacks": self.numFallbacks,
+        }
@@ -0,0 +1,132 @@
+import bisect
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+
+
+class CashbotBossScoreKeeper:
+    """Keeps score for the toons in a CFO battle.  The AI applies the
+    point rules of the boss's ruleset as things happen, keeps every
+    toon's total and the standings, and sends the clients only the
+    points each toon gains or loses (and why), plus the new standings
+    whenever they change.  The clients just show what they're told.
+
+    Those are only changes, though, and a toon who joins partway
+    through (or comes to spectate) would miss all of the ones before;
+    the boss's battle snapshot, which carries the totals kept here,
+    is what catches him up."""
+
+    # How long to wait before awarding a low laff bonus, so that it
+    # pops up on the scoreboard after the points it's a bonus for.
+    lowLaffBonusDelay = 0.75
+
+    def __init__(self, boss):
+        self.boss = boss
+
+        # Maps avId -> points.
+        self.points = {}
+
+        # Maps avId -> [damage, stuns, stomps].
+        self.stats = {}
+
+        # Maps avId -> the order the toon was added in, to break ties.
+        self.order = {}
+
+        # The standings, best first, as a sorted list of
+        # (-points, order, avId).
+        self.standings = []
+
+        # Low laff bonuses waiting to be awarded.
+        self.bonusTimers = set()
+
+    def cleanup(self):
+        for timer in self.bonusTimers:
+            self.boss.timers.cancel(timer)
+        self.bonusTimers = set()
+        self.points = {}
+        self.stats = {}
+        self.order = {}
+        self.standings = []
+
+    def addToon(self, avId):
+        if avId in self.points:
+            return
+        self.points[avId] = 0
+        self.stats[avId] = [0, 0, 0]
+        self.order[avId] = len(self.order)
+        bisect.insort(self.standings, (0, self.order[avId], avId))
+        self.boss.sendBattleSnapshotLater()
+
+    def hasToon(self, avId):
+        return avId in self.points
+
+    def getScore(self, avId):
+        return self.points.get(avId, 0)
+
+    def getScores(self):
+        # Returns a dictionary of avId -> points.
+        return dict(self.points)
+
+    def getStats(self, avId):
+        # Returns (damage, stuns, stomps) for the toon.
+        return tuple(self.stats.get(avId, (0, 0, 0)))
+
+    def getRank(self, avId):
+        # Returns the toon's place in the standings, 0 for first, or
+        # None if we're not keeping score for him.
+        if avId not in self.points:
+            return None
+        return bisect.bisect_left(self.standings, (-self.points[avId], self.order[avId], avId))
+
+    def getStandings(self):
+        # Returns a list of (avId, points), best first.
+        return [(avId, -negPoints) for negPoints, _order, avId in self.standings]
+
+    def addScore(self, avId, amount, reason, extra=0, ignoreLaff=False):
+        # Gives the toon amount points (or takes them away, if amount
+        # is negative) for the indicated reason, one of the
+        # CraneLeagueGlobals.SCORE_* codes.
+        if avId not in self.points:
+            return
+
+        ruleset = self.boss.ruleset
+        amount = int(amount)
+
+        # Penalties only count toward the low laff bonus if the
+        # ruleset says so.
+        if not ruleset.LOW_LAFF_BONUS_INCLUDE_PENALTIES and amount <= 0:
+            ignoreLaff = True
+
+        if not ignoreLaff and ruleset.WANT_LOW_LAFF_BONUS:
+            av = self.boss.air.doId2do.get(avId)
+            if av and av.getHp() <= ruleset.LOW_LAFF_BONUS_THRESHOLD:
+                bonus = int(amount * ruleset.LOW_LAFF_BONUS)
+                if bonus:
+                    timer = self.boss.timers.schedule(self.lowLaffBonusDelay, self.__awardLowLaffBonus, avId, bonus)
+                    self.bonusTimers.add(timer)
+
+        stats = self.stats[avId]
+        if reason == CraneLeagueGlobals.SCORE_DAMAGE:
+            stats[0] += amount
+        elif reason == CraneLeagueGlobals.SCORE_STUN:
+            stats[1] += 1
+        elif reason == CraneLeagueGlobals.SCORE_GOON_STOMP:
+            stats[2] += 1
+
+        if amount:
+            oldRank = self.getRank(avId)
+            self.standings.pop(oldRank)
+            self.points[avId] += amount
+            bisect.insort(self.standings, (-self.points[avId], self.order[avId], avId))
+            rankChanged = self.getRank(avId) != oldRank
+        else:
+            rankChanged = False
+
+        # The clients still want to hear about things that are worth
+        # no points, to keep track of stuns, stomps and the like.
+        self.boss.d_updateScore(avId, amount, reason, extra)
+        if rankChanged:
+            self.boss.d_setStandings([avId for _negPoints, _order, avId in self.standings])
+
+    def __awardLowLaffBonus(self, avId, bonus):
+        self.bonusTimers = {timer for timer in self.bonusTimers if timer.isPending()}
+        self.addScore(avId, bonus, CraneLeagueGlobals.SCORE_LOW_LAFF_BONUS, ignoreLaff=True)
@@ -7,7 +7,6 @@ from direct.showbase.DirectObject import DirectObject
 from direct.task.Task import Task
 from direct.interval.IntervalGlobal import *
 
-from toontown.coghq.cfo import CraneLeagueGlobals
 from toontown.toon.ToonHead import ToonHead
 
 import random
@@ -224,6 +223,7 @@ class CashbotBossScoreboardToonRow(DirectObject):
         self.avId = avId
         self.points = 0
         self.damage, self.stuns, self.stomps = 0, 0, 0
+        self.combo = 0
         self.frame = DirectFrame(parent=scoreboard_frame)
         self.toon_head = self.createToonHead(avId, scale=0.125)
         self.toon_head_button = DirectButton(
@@ -414,6 +414,17 @@ class CashbotBossScoreboardToonRow(DirectObject):
         self.stomps += 1
         self.updateExtraStatsLabel()
 
+    def setTotals(self, points, damage, stuns, stomps):
+        # Sets the toon's totals outright, without any popups.
+        if (damage, stuns, stomps) != (self.damage, self.stuns, self.stomps):
+            self.damage, self.stuns, self.stomps = damage, stuns, stomps
+            self.updateExtraStatsLabel()
+
+        if points != self.points:
+            self.cancel_inc_ival()
+            self.points = points
+            self.points_text.setText(str(points))
+
     def expand(self):
         self.updateExtraStatsLabel()
         self.extra_stats_text.show()
@@ -428,6 +439,7 @@ class CashbotBossScoreboardToonRow(DirectObject):
         self.damage = 0
         self.stuns = 0
         self.stomps = 0
+        self.combo = 0
         self.updateExtraStatsLabel()
         self.points_text.setText("0")
         self.combo_text.setText("COMBO x0")
@@ -557,26 +569,10 @@ class CashbotBossScoreboard(DirectObject):
 
         self.hide()
 
-    def __addScoreLater(self, avId, amount, task=None):
-        self.addScore(avId, amount, reason=CraneLeagueGlobals.LOW_LAFF_BONUS_TEXT, ignoreLaff=True)
-
-    # Positive/negative amount of points to add to a player
-    def addScore(self, avId, amount, reason="", ignoreLaff=False):
-        # If we don't want to include penalties for low laff bonuses and the amount is negative ignore laff
-        if not self.ruleset.LOW_LAFF_BONUS_INCLUDE_PENALTIES and amount <= 0:
-            ignoreLaff = True
-
-        # Should we consider a low laff bonus?
-        if not ignoreLaff and self.ruleset.WANT_LOW_LAFF_BONUS:
-            av = base.cr.doId2do.get(avId)
-            if av and av.getHp() <= self.ruleset.LOW_LAFF_BONUS_THRESHOLD:
-                taskMgr.doMethodLater(
-                    0.75,
-                    self.__addScoreLater,
-                    "delayedScore",
-                    extraArgs=[avId, int(amount * self.ruleset.LOW_LAFF_BONUS)],
-                )
-
+    # Positive/negative amount of points to add to a player.  The AI
+    # has already applied the ruleset (including any low laff bonus),
+    # and tells us the standings separately.
+    def addScore(self, avId, amount, reason=""):
         # If we don't get an integer
         if not isinstance(amount, int):
             raise Exception("amount should be an int! got " + type(amount))
@@ -587,7 +583,33 @@ class CashbotBossScoreboard(DirectObject):
 
         if avId in self.rows:
             self.rows[avId].addScore(amount, reason=reason)
-            self.updatePlacements()
+
+    def setStandings(self, avIds):
+        # Places the toons in the order given, best first.
+        place = 0
+        for avId in avIds:
+            row = self.rows.get(avId)
+            if row:
+                row.place = place
+                row.updatePosition()
+                place += 1
+
+    def setScores(self, scores):
+        # The AI's totals for every toon, best first, as (avId, points,
+        # damage, stuns, stomps, combo).  A toon who joins partway
+        # through starts from these; for everyone else they should
+        # already match what the updates along the way added up to.
+        for avId, points, damage, stuns, stomps, combo in scores:
+            row = self.rows.get(avId)
+            if row:
+                row.setTotals(points, damage, stuns, stomps)
+                if combo != row.combo:
+                    self.setCombo(avId, combo)
+
+        avIds = [score[0] for score in scores if score[0] in self.rows]
+        places = [row.avId for row in sorted(self.rows.values(), key=lambda r: r.place)]
+        if avIds != places:
+            self.setStandings(avIds)
 
     def updatePlacements(self):
         # make a list of all the objects
@@ -653,6 +675,7 @@ class CashbotBossScoreboard(DirectObject):
         if not row:
             return
 
+        row.combo = amount
         row.combo_text.setText("x" + str(amount))
 
         if amount < 2:
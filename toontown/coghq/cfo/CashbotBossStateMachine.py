@@ -0,0 +1,105 @@
+from direct.fsm.FSM import AlreadyInTransition, RequestDenied
+
+
+class CashbotBossStateTable:
+    """The states of one class of CFO object, worked out once for the
+    class: every name X it has an enterX() or exitX() for, plus Off,
+    numbered in order, with the enter and exit functions of each, and
+    the (exit, enter) pair to call for each transition, by number."""
+
+    __slots__ = ("names", "indices", "enterHandlers", "exitHandlers", "transitions")
+
+    def __init__(self, cls):
+        names = {"Off"}
+        for attr in dir(cls):
+            for prefix in ("enter", "exit"):
+                if attr.startswith(prefix) and attr[len(prefix) : len(prefix) + 1].isupper():
+                    names.add(attr[len(prefix) :])
+
+        # Off is always state 0, the one we start in.
+        names.discard("Off")
+        self.names = ("Off", *sorted(names))
+        self.indices = {name: index for index, name in enumerate(self.names)}
+        self.enterHandlers = [getattr(cls, "enter" + name, None) for name in self.names]
+        self.exitHandlers = [getattr(cls, "exit" + name, None) for name in self.names]
+
+        # transitions[old][new] -> (exit function, enter function).
+        self.transitions = [
+            [(exitHandler, enterHandler) for enterHandler in self.enterHandlers] for exitHandler in self.exitHandlers
+        ]
+
+
+class CashbotBossStateMachine:
+    """Stands in for direct.fsm.FSM on the goons, safes and cranes of a
+    CFO battle, of which there are dozens to a room, all changing state
+    all the time.  It behaves as an FSM with no filters and no
+    defaultTransitions does: request() or demand() any of our states,
+    even the one we're in, and exitOld() and enterNew() are called, with
+    state, oldState and newState set the same way; a demand() made in
+    the middle of a transition waits for it to finish.  But the enter
+    and exit functions are looked up once per class rather than once per
+    transition, there's no lock, and no messenger event; instead, if
+    stateChangeHook is set, it's called at the end of every transition,
+    where the FSM would have sent its state change event."""
+
+    def __init__(self):
+        self.stateTable = self.getStateTable()
+        self.state = "Off"
+        self.stateIndex = 0
+        self.oldState = None
+        self.newState = None
+        self.stateChangeHook = None
+        self.stateQueue = []
+
+    @classmethod
+    def getStateTable(cls):
+        table = cls.__dict__.get("_stateTable")
+        if table is None:
+            table = CashbotBossStateTable(cls)
+            cls._stateTable = table
+        return table
+
+    def request(self, request, *args):
+        if self.state is None:
+            raise AlreadyInTransition("%s.request(%s) while already in transition" % (self.doId, request))
+        self.__setState(request, args)
+
+    def demand(self, request, *args):
+        if self.state is None:
+            # Wait for the transition we're in to finish.
+            self.stateQueue.append((request, args))
+            return
+        self.__setState(request, args)
+
+    def __setState(self, newState, args):
+        table = self.stateTable
+        newIndex = table.indices.get(newState)
+        if newIndex is None:
+            raise RequestDenied("%s (from state: %s)" % (newState, self.state))
+
+        exitHandler, enterHandler = table.transitions[self.stateIndex][newIndex]
+        self.oldState = self.state
+        self.newState = newState
+        self.state = None
+        try:
+            if exitHandler is not None:
+                exitHandler(self)
+            if enterHandler is not None:
+                enterHandler(self, *args)
+        except:
+            # As the FSM does.
+            self.state = "InternalError"
+            raise
+
+        if self.stateChangeHook is not None:
+            self.stateChangeHook()
+
+        self.state = newState
+        self.stateIndex = newIndex
+
+        if self.stateQueue:
+            request, args = self.stateQueue.pop(0)
+            self.demand(request, *args)
+
+    def getCurrentOrNextState(self):
+        return self.state or self.newState
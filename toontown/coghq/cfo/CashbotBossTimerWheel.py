@@ -0,0 +1,193 @@
+import math
+
+from direct.task.Task import Task
+
+
+class CashbotBossTimer:
+    """A handle to a callback scheduled on a CashbotBossTimerWheel.
+    Hang on to it to cancel the callback later."""
+
+    __slots__ = ("deadline", "slot", "callback", "args")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.slot = None
+        self.callback = callback
+        self.args = args
+
+    def isPending(self):
+        return self.slot is not None
+
+
+class CashbotBossTimerWheel:
+    """A hashed timer wheel for the short gameplay timers of a CFO
+    battle: objects waiting to be freed, treasures waiting to be
+    recycled, goons getting back up, toons waiting to be revived, and
+    so on.  Scheduling and cancelling a timer is O(1) by handle, with
+    no task names to build, and the whole wheel is driven by a single
+    task that only runs while there are timers pending."""
+
+    # The wheel is divided into slots of tickLength seconds each.  A
+    # timer is never fired early, and at most one tick late.
+    tickLength = 0.02
+    numSlots = 512
+
+    def __init__(self, boss):
+        self.boss = boss
+        self.slots = [{} for _ in range(self.numSlots)]
+        self.numPending = 0
+        self.lastTick = None
+        self.running = False
+
+        # The frame time at which we were paused, or None if we're
+        # running; see pause().
+        self.pausedAt = None
+
+        # Running totals, and the per-second rates as of the last
+        # second that went by; see getStats().
+        self.numScheduled = 0
+        self.numCancelled = 0
+        self.numFired = 0
+        self.rates = (0.0, 0.0, 0.0)
+        self.rateTime = None
+        self.rateTotals = (0, 0, 0)
+
+    def __getTaskName(self):
+        return self.boss.uniqueName("timerWheel")
+
+    def cleanup(self):
+        taskMgr.remove(self.__getTaskName())
+        self.running = False
+        for slot in self.slots:
+            for timer in slot:
+                timer.slot = None
+            slot.clear()
+        self.numPending = 0
+        self.lastTick = None
+        self.pausedAt = None
+
+    def schedule(self, delayTime, callback, *args):
+        # Calls callback(*args) after delayTime seconds.  Returns a
+        # handle that can be passed to cancel().  While we're paused,
+        # the clock is stopped at the moment we were paused.
+        now = globalClock.getFrameTime() if self.pausedAt is None else self.pausedAt
+        timer = CashbotBossTimer(now + delayTime, callback, args)
+        self.__insert(timer, now)
+        self.numPending += 1
+        self.numScheduled += 1
+
+        if not self.running and self.pausedAt is None:
+            self.running = True
+            taskMgr.add(self.__wheelTask, self.__getTaskName())
+        return timer
+
+    def __insert(self, timer, now):
+        if self.lastTick is None:
+            self.lastTick = self.__getTick(now) - 1
+
+        tick = max(int(math.ceil(timer.deadline / self.tickLength)), self.lastTick + 1)
+        timer.slot = tick % self.numSlots
+        self.slots[timer.slot][timer] = None
+
+    def pause(self):
+        # Stops the clock: nothing fires until resume(), and every
+        # timer then has as long left as it had now.
+        if self.pausedAt is not None:
+            return
+        self.pausedAt = globalClock.getFrameTime()
+        taskMgr.remove(self.__getTaskName())
+        self.running = False
+
+    def resume(self):
+        if self.pausedAt is None:
+            return
+
+        now = globalClock.getFrameTime()
+        elapsed = now - self.pausedAt
+        self.pausedAt = None
+
+        # Push every deadline back by the time we were paused, which
+        # moves most timers to another slot.
+        timers = [timer for slot in self.slots for timer in slot]
+        for slot in self.slots:
+            slot.clear()
+        self.lastTick = None
+        for timer in timers:
+            timer.deadline += elapsed
+            self.__insert(timer, now)
+
+        if self.numPending:
+            self.running = True
+            taskMgr.add(self.__wheelTask, self.__getTaskName())
+
+    def cancel(self, timer):
+        # Cancels the timer, if it hasn't already fired.  It's fine to
+        # pass None or a timer that's already gone.
+        if timer is None or timer.slot is None:
+            return
+        del self.slots[timer.slot][timer]
+        timer.slot = None
+        self.numPending -= 1
+        self.numCancelled += 1
+
+    def getStats(self):
+        # Returns a dictionary of the number of timers pending, and
+        # the number scheduled, cancelled and fired per second.
+        self.__updateRates(globalClock.getFrameTime())
+        scheduled, cancelled, fired = self.rates
+        return {
+            "pending": self.numPending,
+            "scheduledPerSecond": scheduled,
+            "cancelledPerSecond": cancelled,
+            "firedPerSecond": fired,
+        }
+
+    def __getTick(self, now):
+        return int(math.floor(now / self.tickLength))
+
+    def __updateRates(self, now):
+        totals = (self.numScheduled, self.numCancelled, self.numFired)
+        if self.rateTime is None:
+            self.rateTime = now
+            self.rateTotals = totals
+            return
+
+        elapsed = now - self.rateTime
+        if elapsed >= 1.0:
+            self.rates = tuple((total - last) / elapsed for total, last in zip(totals, self.rateTotals))
+            self.rateTime = now
+            self.rateTotals = totals
+
+    def __wheelTask(self, task):
+        now = globalClock.getFrameTime()
+        tick = self.__getTick(now)
+
+        # Visit every slot we've passed since last time, but no slot
+        # more than once.
+        first = max(self.lastTick + 1, tick - self.numSlots + 1)
+        self.lastTick = tick
+        for t in range(first, tick + 1):
+            slot = self.slots[t % self.numSlots]
+            if not slot:
+                continue
+
+            # Timers more than a revolution away wait for another
+            # time around.
+            due = [timer for timer in slot if timer.deadline <= now]
+            for timer in due:
+                if timer.slot is None:
+                    # Cancelled by an earlier timer in this batch.
+                    continue
+                del slot[timer]
+                timer.slot = None
+                self.numPending -= 1
+                self.numFired += 1
+                timer.callback(*timer.args)
+
+        self.__updateRates(now)
+
+        if not self.numPending:
+            self.running = False
+            self.lastTick = None
+            return Task.done
+        return Task.cont
@@ -1,7 +1,12 @@
+import functools
+import re
+from types import MappingProxyType
+
 from toontown.coghq.cfo.GeneralCFOGlobals import TreasureTypes
 from toontown.toonbase.globals import TTGlobalsBosses
 
 SPECIAL_MODIFIER_CHANCE = 3  # % chance you want to roll a special modifier for a cfo  *** server side only
+RULESET_CACHE_SIZE = 128  # How many compiled rulesets (see compileRuleset) to keep around
 
 # Ruleset
 
@@ -76,6 +81,9 @@ TOON_SPAWN_POSITIONS = [
 
 ALL_CRANE_POSHPR = NORMAL_CRANE_POSHPR + SIDE_CRANE_POSHPR + HEAVY_CRANE_POSHPR
 
+# The heat of a crane round with no modifiers
+BASE_HEAT = 500
+
 LOW_LAFF_BONUS_TEXT = "UBER BONUS"  # Text to display alongside a low laff bonus
 
 # Text to display in popup text for misc point gains
@@ -92,6 +100,181 @@ PENALTY_GO_SAD_TEXT = "DIED!"
 PENALTY_SANDBAG_TEXT = "SLOPPY!"
 PENALTY_UNSTUN_TEXT = "UN-STUN!"
 
+# Reasons a toon's score can change, sent to the clients along with
+# the points gained or lost.
+SCORE_DAMAGE = 0
+SCORE_STUN = 1
+SCORE_GOON_STOMP = 2
+SCORE_IMPACT = 3
+SCORE_DESAFE = 4
+SCORE_GOON_KILLED_BY_SAFE = 5
+SCORE_KILLING_BLOW = 6
+SCORE_COMBO = 7
+SCORE_LOW_LAFF_BONUS = 8
+SCORE_PENALTY_SAFEHEAD = 9
+SCORE_PENALTY_TREASURE = 10
+SCORE_PENALTY_GO_SAD = 11
+SCORE_PENALTY_SANDBAG = 12
+SCORE_PENALTY_UNSTUN = 13
+
+SCORE_REASON_TEXT = {
+    SCORE_DAMAGE: "",
+    SCORE_STUN: STUN_TEXT,
+    SCORE_GOON_STOMP: GOON_STOMP_TEXT,
+    SCORE_IMPACT: IMPACT_TEXT,
+    SCORE_DESAFE: DESAFE_TEXT,
+    SCORE_GOON_KILLED_BY_SAFE: GOON_KILLED_BY_SAFE_TEXT,
+    SCORE_KILLING_BLOW: KILLING_BLOW_TEXT,
+    SCORE_LOW_LAFF_BONUS: LOW_LAFF_BONUS_TEXT,
+    SCORE_PENALTY_SAFEHEAD: PENALTY_SAFEHEAD_TEXT,
+    SCORE_PENALTY_TREASURE: PENALTY_TREASURE_TEXT,
+    SCORE_PENALTY_GO_SAD: PENALTY_GO_SAD_TEXT,
+    SCORE_PENALTY_SANDBAG: PENALTY_SANDBAG_TEXT,
+    SCORE_PENALTY_UNSTUN: PENALTY_UNSTUN_TEXT,
+}
+
+
+def getScoreReasonText(reason, extra=0):
+    # Returns the text to pop up on the scoreboard alongside points
+    # gained or lost for the indicated reason.
+    if reason == SCORE_COMBO:
+        return "COMBO x" + str(extra) + "!"
+    return SCORE_REASON_TEXT.get(reason, "")
+
+
+# Categories of activity events the AI can send to the activity log.
+# A category is only recorded while the ruleset's flag for it is on,
+# and only sent to the clients that have asked for it.
+ACTIVITY_GENERAL = 0
+ACTIVITY_GOON_STATES = 1
+ACTIVITY_SAFE_STATES = 2
+ACTIVITY_CRANE_STATES = 3
+
+# Maps category -> the ruleset flag that turns it on.
+ACTIVITY_CATEGORY_FLAGS = {
+    ACTIVITY_GENERAL: "GENERAL_DEBUG",
+    ACTIVITY_GOON_STATES: "GOON_STATES_DEBUG",
+    ACTIVITY_SAFE_STATES: "SAFE_STATES_DEBUG",
+    ACTIVITY_CRANE_STATES: "CRANE_STATES_DEBUG",
+}
+
+# Activity event codes.  Events are sent with numbers only; the text
+# is only put together on the client that shows it.
+ACTIVITY_APPLIED_MODIFIERS = 0
+ACTIVITY_GENERATING_CRANES = 1
+ACTIVITY_GENERATING_SIDECRANES = 2
+ACTIVITY_GENERATING_HEAVY_CRANES = 3
+ACTIVITY_TOON_DAMAGED = 4
+ACTIVITY_TREASURE_LIMIT = 5
+ACTIVITY_TREASURE_ROLL = 6
+ACTIVITY_GOON_SPAWNED = 7
+ACTIVITY_NEXT_GOON = 8
+ACTIVITY_NEXT_HELMET = 9
+ACTIVITY_BOSS_DAMAGED = 10
+ACTIVITY_NEXT_ATTACK = 11
+ACTIVITY_FORCE_MAX_LAFF = 12
+ACTIVITY_HEAL_TOONS = 13
+ACTIVITY_TIME_LIMIT = 14
+ACTIVITY_ROUND_OVER = 15
+ACTIVITY_REVIVING = 16
+ACTIVITY_REVIVED = 17
+ACTIVITY_GOON_HIT = 18
+ACTIVITY_SAFE_HIT = 19
+ACTIVITY_GOON_STATE = 20
+ACTIVITY_SAFE_STATE = 21
+ACTIVITY_CRANE_STATE = 22
+ACTIVITY_CRANE_GRAB = 23
+ACTIVITY_ROUND_SEED = 24
+ACTIVITY_SAFE_RELOCATED = 25
+ACTIVITY_HIBERNATED = 26
+ACTIVITY_WOKE = 27
+
+# Maps event code -> (category, format).  Each %s in a format is
+# filled in with the name of an object state, sent as its index in
+# ACTIVITY_STATE_NAMES.
+ACTIVITY_EVENTS = {
+    ACTIVITY_APPLIED_MODIFIERS: (ACTIVITY_GENERAL, "Applied %d modifiers"),
+    ACTIVITY_GENERATING_CRANES: (ACTIVITY_GENERAL, "Generating %d normal cranes"),
+    ACTIVITY_GENERATING_SIDECRANES: (ACTIVITY_GENERAL, "Generating %d sidecranes"),
+    ACTIVITY_GENERATING_HEAVY_CRANES: (ACTIVITY_GENERAL, "Generating %d heavy cranes"),
+    ACTIVITY_TOON_DAMAGED: (ACTIVITY_GENERAL, "Damaged for %d"),
+    ACTIVITY_TREASURE_LIMIT: (ACTIVITY_GENERAL, "Not spawning treasure, already %d present"),
+    ACTIVITY_TREASURE_ROLL: (ACTIVITY_GENERAL, "Rolling for treasure drop, need > %.2f, got %.2f"),
+    ACTIVITY_GOON_SPAWNED: (
+        ACTIVITY_GENERAL,
+        "Spawning on %s, stun=%.2f, vel=%.2f, hfov=%.2f, attRadius=%.2f, str=%d, scale=%.2f",
+    ),
+    ACTIVITY_NEXT_GOON: (ACTIVITY_GENERAL, "Spawning goon in %.2fs"),
+    ACTIVITY_NEXT_HELMET: (ACTIVITY_GENERAL, "Next auto-helmet in %.2f seconds"),
+    ACTIVITY_BOSS_DAMAGED: (ACTIVITY_GENERAL, "Damaged for %d with impact: %.2f"),
+    ACTIVITY_NEXT_ATTACK: (ACTIVITY_GENERAL, "Next attack in %.2fs"),
+    ACTIVITY_FORCE_MAX_LAFF: (ACTIVITY_GENERAL, "Forcing max laff to %d"),
+    ACTIVITY_HEAL_TOONS: (ACTIVITY_GENERAL, "Healing all toons"),
+    ACTIVITY_TIME_LIMIT: (ACTIVITY_GENERAL, "Time will run out in %.1fs"),
+    ACTIVITY_ROUND_OVER: (ACTIVITY_GENERAL, "Crane round over in %.2fs"),
+    ACTIVITY_REVIVING: (ACTIVITY_GENERAL, "Reviving in %.1fs"),
+    ACTIVITY_REVIVED: (ACTIVITY_GENERAL, "Revived"),
+    ACTIVITY_GOON_HIT: (ACTIVITY_GENERAL, "Goon hit with impact=%.2f"),
+    ACTIVITY_SAFE_HIT: (ACTIVITY_GENERAL, "Safe hit with impact=%.2f"),
+    ACTIVITY_GOON_STATE: (ACTIVITY_GOON_STATES, "(Server) state change %s ---> %s"),
+    ACTIVITY_SAFE_STATE: (ACTIVITY_SAFE_STATES, "(Server) state change %s ---> %s"),
+    ACTIVITY_CRANE_STATE: (ACTIVITY_CRANE_STATES, "(Server) state change %s ---> %s"),
+    ACTIVITY_CRANE_GRAB: (ACTIVITY_CRANE_STATES, "(Server) grabbing object: %d"),
+    ACTIVITY_ROUND_SEED: (ACTIVITY_GENERAL, "Round seed: %d"),
+    ACTIVITY_SAFE_RELOCATED: (ACTIVITY_SAFE_STATES, "(Server) relocated after %d tries, clear: %d"),
+    ACTIVITY_HIBERNATED: (ACTIVITY_GENERAL, "Nobody is playing, pausing the round"),
+    ACTIVITY_WOKE: (ACTIVITY_GENERAL, "Resuming the round after %.1fs"),
+}
+
+# The states of the goons, safes and cranes, for activity events.
+ACTIVITY_STATE_NAMES = [
+    "None",
+    "Off",
+    "Initial",
+    "Walk",
+    "Battle",
+    "Stunned",
+    "Recovery",
+    "EmergeA",
+    "EmergeB",
+    "Grabbed",
+    "LocalGrabbed",
+    "Dropped",
+    "LocalDropped",
+    "SlidingFloor",
+    "WaitFree",
+    "Free",
+    "Controlled",
+    "Movie",
+]
+ACTIVITY_STATE_INDICES = {name: index for index, name in enumerate(ACTIVITY_STATE_NAMES)}
+
+
+def getActivityStateIndex(state):
+    return ACTIVITY_STATE_INDICES.get(state, 0)
+
+
+def renderActivityEvent(code, args):
+    # Returns the text for an activity event, as it should appear in
+    # the activity log.
+    event = ACTIVITY_EVENTS.get(code)
+    if event is None:
+        return "Unknown event %s %s" % (code, list(args))
+
+    _category, fmt = event
+    values = []
+    for spec, arg in zip(re.findall(r"%[-+ #0-9.]*[sdf]", fmt), args):
+        if spec == "%s":
+            index = int(arg)
+            values.append(ACTIVITY_STATE_NAMES[index] if 0 <= index < len(ACTIVITY_STATE_NAMES) else index)
+        else:
+            values.append(arg)
+
+    try:
+        return fmt % tuple(values)
+    except TypeError:
+        return "%s %s" % (fmt, list(args))
+
 
 # Ruleset
 # Instance attached to cfo boss instances, so we can easily modify stuff dynamically
@@ -250,76 +433,147 @@ class CFORuleset:
         self.MIN_GOON_IMPACT = min(self.MIN_GOON_IMPACT, 0.95)
         self.SIDECRANE_IMPACT_STUN_THRESHOLD = min(self.SIDECRANE_IMPACT_STUN_THRESHOLD, 0.95)
 
-    # Sends an astron friendly array over, ONLY STUFF THE CLIENT NEEDS TO KNOW GOES HERE
-    # ANY TIME YOU MAKE A NEW ATTRIBUTE IN THE INIT ABOVE, MAKE SURE TO ADD
-    # THE ATTRIBUTE INTO THIS LIST BELOW, AND A PARAMETER FOR IT IN THE DC FILE IN THE CFORuleset STRUCT
+    # The attributes the client needs to know about, in the order they're sent, with their DC types.
+    # ANY TIME YOU MAKE A NEW ATTRIBUTE IN THE INIT ABOVE THAT THE CLIENT NEEDS, ADD IT TO THE END OF THIS LIST,
+    # THEN PASTE THE OUTPUT OF CFORuleset.getDCStruct() OVER THE CraneLeagueRuleset STRUCT IN THE DC FILE
+    SCHEMA = (
+        ("TIMER_MODE", "bool"),
+        ("TIMER_MODE_TIME_LIMIT", "int32"),
+        ("CFO_MAX_HP", "int32"),
+        ("MIN_GOON_IMPACT", "int16/100"),
+        ("MIN_SAFE_IMPACT", "int16/100"),
+        ("MIN_DEHELMET_IMPACT", "int16/100"),
+        ("WANT_LOW_LAFF_BONUS", "bool"),
+        ("LOW_LAFF_BONUS", "int16/100"),
+        ("LOW_LAFF_BONUS_THRESHOLD", "int32"),
+        ("LOW_LAFF_BONUS_INCLUDE_PENALTIES", "bool"),
+        ("RESTART_CRANE_ROUND_ON_FAIL", "bool"),
+        ("REVIVE_TOONS_UPON_DEATH", "bool"),
+        ("REVIVE_TOONS_TIME", "int32"),
+        ("POINTS_GOON_STOMP", "int32"),
+        ("POINTS_STUN", "int32"),
+        ("POINTS_SIDESTUN", "int32"),
+        ("POINTS_IMPACT", "int32"),
+        ("POINTS_DESAFE", "int32"),
+        ("POINTS_GOON_KILLED_BY_SAFE", "int32"),
+        ("POINTS_PENALTY_SAFEHEAD", "int32"),
+        ("POINTS_PENALTY_GO_SAD", "int32"),
+        ("POINTS_PENALTY_SANDBAG", "int32"),
+        ("POINTS_PENALTY_UNSTUN", "int32"),
+        ("COMBO_DURATION", "int16/100"),
+        ("WANT_BACKWALL", "bool"),
+        ("CFO_FLINCHES_ON_HIT", "bool"),
+        ("SAFES_STUN_GOONS", "bool"),
+        ("GOONS_ALWAYS_WAKE_WHEN_GRABBED", "bool"),
+    )
+
+    # Maps attribute name -> index in the schema
+    SCHEMA_INDEX = {name: index for index, (name, _dcType) in enumerate(SCHEMA)}
+
+    # Values in a delta all travel as the same DC type, so they come out the other end as floats; this turns them
+    # back into what the attribute should hold
+    @staticmethod
+    def _castValue(dcType, value):
+        if dcType == "bool":
+            return bool(value)
+        if "/" in dcType:
+            return float(value)
+        return int(round(value))
+
+    # Returns the CraneLeagueRuleset struct for the DC file, built from the schema
+    @classmethod
+    def getDCStruct(cls, structName="CraneLeagueRuleset"):
+        lines = ["struct %s {" % structName]
+        for name, dcType in cls.SCHEMA:
+            lines.append("    %s %s;" % (dcType, name))
+        lines.append("};")
+        return "\n".join(lines)
+
+    # Returns a list of problems with the given DC struct (a DCClass), compared to the schema, for catching a DC
+    # file that wasn't updated along with the schema
+    @classmethod
+    def checkDCStruct(cls, dcStruct):
+        problems = []
+        dcNames = [dcStruct.getField(i).getName() for i in range(dcStruct.getNumFields())]
+        schemaNames = [name for name, _dcType in cls.SCHEMA]
+        if dcNames != schemaNames:
+            problems.append("%s has fields %s, but the schema has %s" % (dcStruct.getName(), dcNames, schemaNames))
+        return problems
+
+    # Sends an astron friendly array over, ONLY STUFF THE CLIENT NEEDS TO KNOW GOES HERE (see SCHEMA above)
     def asStruct(self):
-        return [
-            self.TIMER_MODE,
-            self.TIMER_MODE_TIME_LIMIT,
-            self.CFO_MAX_HP,
-            self.MIN_GOON_IMPACT,
-            self.MIN_SAFE_IMPACT,
-            self.MIN_DEHELMET_IMPACT,
-            self.WANT_LOW_LAFF_BONUS,
-            self.LOW_LAFF_BONUS,
-            self.LOW_LAFF_BONUS_THRESHOLD,
-            self.LOW_LAFF_BONUS_INCLUDE_PENALTIES,
-            self.RESTART_CRANE_ROUND_ON_FAIL,
-            self.REVIVE_TOONS_UPON_DEATH,
-            self.REVIVE_TOONS_TIME,
-            self.POINTS_GOON_STOMP,
-            self.POINTS_STUN,
-            self.POINTS_SIDESTUN,
-            self.POINTS_IMPACT,
-            self.POINTS_DESAFE,
-            self.POINTS_GOON_KILLED_BY_SAFE,
-            self.POINTS_PENALTY_SAFEHEAD,
-            self.POINTS_PENALTY_GO_SAD,
-            self.POINTS_PENALTY_SANDBAG,
-            self.POINTS_PENALTY_UNSTUN,
-            self.COMBO_DURATION,
-            self.WANT_BACKWALL,
-            self.CFO_FLINCHES_ON_HIT,
-            self.SAFES_STUN_GOONS,
-            self.GOONS_ALWAYS_WAKE_WHEN_GRABBED,
-        ]
+        return [getattr(self, name) for name, _dcType in self.SCHEMA]
 
     @classmethod
     def fromStruct(cls, attrs):
         rulesetInstance = cls()
-        rulesetInstance.TIMER_MODE = attrs[0]
-        rulesetInstance.TIMER_MODE_TIME_LIMIT = attrs[1]
-        rulesetInstance.CFO_MAX_HP = attrs[2]
-        rulesetInstance.MIN_GOON_IMPACT = attrs[3]
-        rulesetInstance.MIN_SAFE_IMPACT = attrs[4]
-        rulesetInstance.MIN_DEHELMET_IMPACT = attrs[5]
-        rulesetInstance.WANT_LOW_LAFF_BONUS = attrs[6]
-        rulesetInstance.LOW_LAFF_BONUS = attrs[7]
-        rulesetInstance.LOW_LAFF_BONUS_THRESHOLD = attrs[8]
-        rulesetInstance.LOW_LAFF_BONUS_INCLUDE_PENALTIES = attrs[9]
-        rulesetInstance.RESTART_CRANE_ROUND_ON_FAIL = attrs[10]
-        rulesetInstance.REVIVE_TOONS_UPON_DEATH = attrs[11]
-        rulesetInstance.REVIVE_TOONS_TIME = attrs[12]
-        rulesetInstance.POINTS_GOON_STOMP = attrs[13]
-        rulesetInstance.POINTS_STUN = attrs[14]
-        rulesetInstance.POINTS_SIDESTUN = attrs[15]
-        rulesetInstance.POINTS_IMPACT = attrs[16]
-        rulesetInstance.POINTS_DESAFE = attrs[17]
-        rulesetInstance.POINTS_GOON_KILLED_BY_SAFE = attrs[18]
-        rulesetInstance.POINTS_PENALTY_SAFEHEAD = attrs[19]
-        rulesetInstance.POINTS_PENALTY_GO_SAD = attrs[20]
-        rulesetInstance.POINTS_PENALTY_SANDBAG = attrs[21]
-        rulesetInstance.POINTS_PENALTY_UNSTUN = attrs[22]
-        rulesetInstance.COMBO_DURATION = attrs[23]
-        rulesetInstance.WANT_BACKWALL = attrs[24]
-        rulesetInstance.CFO_FLINCHES_ON_HIT = attrs[25]
-        rulesetInstance.SAFES_STUN_GOONS = attrs[26]
-        rulesetInstance.GOONS_ALWAYS_WAKE_WHEN_GRABBED = attrs[27]
+        for (name, _dcType), value in zip(cls.SCHEMA, attrs):
+            setattr(rulesetInstance, name, value)
         return rulesetInstance
 
+    # Returns the changes needed to turn the given struct (from asStruct) into this ruleset, as a list of
+    # (schema index, value), for sending the client only what changed
+    def getDelta(self, attrs):
+        delta = []
+        for index, ((name, _dcType), oldValue) in enumerate(zip(self.SCHEMA, attrs)):
+            value = getattr(self, name)
+            if value != oldValue:
+                delta.append((index, value))
+        return delta
+
+    # Patches this ruleset in place so that it matches the given struct with the given delta (from getDelta)
+    # applied on top, and returns the names of the attributes that changed
+    def applyDelta(self, attrs, delta):
+        values = list(attrs)
+        for index, value in delta:
+            if 0 <= index < len(values):
+                values[index] = value
+
+        changed = set()
+        for (name, dcType), value in zip(self.SCHEMA, values):
+            value = self._castValue(dcType, value)
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.add(name)
+        return changed
+
+    # Compiled rulesets (see compileRuleset below) are shared by everyone who asks for the same one, so once frozen
+    # they can't be changed; use derive() to get a changed copy instead
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen"):
+            raise AttributeError("Can't set %s on a frozen ruleset, derive() a new one instead" % name)
+        self.__dict__[name] = value
+
+    # Makes this ruleset read only, lists and dicts included, and returns it
+    def freeze(self):
+        for name, value in list(self.__dict__.items()):
+            self.__dict__[name] = _freezeValue(value)
+        self.__dict__["_frozen"] = True
+        return self
+
+    def isFrozen(self):
+        return self.__dict__.get("_frozen", False)
+
+    # Returns a validated, frozen copy of this ruleset with the given attributes changed
+    def derive(self, **changes):
+        ruleset = self.__class__.__new__(self.__class__)
+        ruleset.__dict__.update(self.__dict__)
+        ruleset.__dict__["_frozen"] = False
+        for name, value in changes.items():
+            setattr(ruleset, name, value)
+        ruleset.validate()
+        return ruleset.freeze()
+
     def __str__(self):
-        return repr(self.__dict__)
+        return repr({name: value for name, value in self.__dict__.items() if name != "_frozen"})
+
+
+def _freezeValue(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freezeValue(v) for v in value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freezeValue(v) for k, v in value.items()})
+    return value
 
 
 # Some other default rulesets to choose from
@@ -1328,5 +1582,29 @@ SPECIAL_MODIFIER_CLASSES = getModifiersOfType(CFORulesetModifierBase.SPECIAL)
 
 NON_SPECIAL_MODIFIER_CLASSES = HURTFUL_MODIFIER_CLASSES + HELPFUL_MODIFIER_CLASSES
 
+
+# Returns the key that compileRuleset and getModifiers know a list of modifier instances by
+def getModifierKey(modifiers):
+    return tuple((modifier.MODIFIER_ENUM, modifier.tier) for modifier in modifiers)
+
+
+# Given a key of (enum, tier) pairs, returns a tuple of the modifier instances, in order.  Modifiers don't change once
+# made, so the same ones are handed to everyone asking for the same key
+@functools.lru_cache(maxsize=RULESET_CACHE_SIZE)
+def getModifiers(modifierKey):
+    return tuple(CFORulesetModifierBase.fromStruct(modifierStruct) for modifierStruct in modifierKey)
+
+
+# Given a ruleset class and a key of (enum, tier) pairs, returns an instance of the ruleset with the modifiers applied
+# in order, validated and frozen.  The result is cached, so asking again for the same thing (restarting a round,
+# re-rolling into a modifier list we've seen before) costs a dictionary lookup, and nothing is ever applied twice
+@functools.lru_cache(maxsize=RULESET_CACHE_SIZE)
+def compileRuleset(rulesetClass, modifierKey=()):
+    ruleset = rulesetClass()
+    for modifier in getModifiers(modifierKey):
+        modifier.apply(ruleset)
+    ruleset.validate()
+    return ruleset.freeze()
+
 # Used for when i want to spit out a cheat sheet
 # for e, c in CFORulesetModifierBase.MODIFIER_SUBCLASSES.items():
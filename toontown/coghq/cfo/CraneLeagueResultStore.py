@@ -0,0 +1,200 @@
+import json
+import queue
+import sqlite3
+import threading
+
+from direct.showbase.DirectObject import DirectObject
+from direct.task.Task import Task
+
+
+class CraneLeagueResultStore(DirectObject):
+    """Keeps the results of every crane round played on this AI.
+    Finished rounds are buffered in memory, and written out all at
+    once whenever the AI repository sends leaderboardFlush.  All of the
+    database work happens on a thread of its own, so a slow disk never
+    holds up a frame; queries hand their results to a callback on the
+    main thread when they're ready."""
+
+    notify = directNotify.newCategory("CraneLeagueResultStore")
+
+    Schema = (
+        """CREATE TABLE IF NOT EXISTS rounds (
+            roundId INTEGER PRIMARY KEY,
+            date REAL NOT NULL,
+            ruleset TEXT NOT NULL,
+            modifiers TEXT NOT NULL,
+            heat INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            won INTEGER NOT NULL,
+            seed INTEGER
+        )""",
+        """CREATE TABLE IF NOT EXISTS roundToons (
+            roundId INTEGER NOT NULL REFERENCES rounds (roundId),
+            avId INTEGER NOT NULL,
+            damage INTEGER NOT NULL,
+            stuns INTEGER NOT NULL,
+            stomps INTEGER NOT NULL,
+            points INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS roundsByRuleset ON rounds (ruleset, won, duration)",
+        "CREATE INDEX IF NOT EXISTS roundsByDate ON rounds (date)",
+        "CREATE INDEX IF NOT EXISTS roundToonsByAvId ON roundToons (avId)",
+        "CREATE INDEX IF NOT EXISTS roundToonsByRound ON roundToons (roundId)",
+    )
+
+    def __init__(self, filename):
+        DirectObject.__init__(self)
+        self.filename = filename
+
+        # Rounds finished since the last flush.
+        self.pending = []
+
+        # Work for the database thread, and the answers to queries
+        # waiting for the main thread to pick them up.
+        self.requests = queue.Queue()
+        self.replies = queue.Queue()
+        self.numOutstanding = 0
+
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__run, name="CraneLeagueResultStore", daemon=True)
+        self.thread.start()
+        self.accept("leaderboardFlush", self.flush)
+
+    def stop(self):
+        # Writes out anything still buffered, and waits for the
+        # database thread to finish up.
+        self.ignoreAll()
+        taskMgr.remove("craneLeagueResultReplies")
+        if self.thread:
+            self.flush()
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def addResult(self, ruleset, modifiers, heat, duration, won, toons, date, seed=None):
+        # Buffers the result of a finished crane round.  modifiers is a
+        # list of (enum, tier), toons a list of (avId, damage, stuns,
+        # stomps, points), and seed the round's random seed.
+        self.pending.append((ruleset, modifiers, heat, duration, won, toons, date, seed))
+
+    def flush(self):
+        if not self.pending:
+            return
+        results = self.pending
+        self.pending = []
+        self.requests.put((self.__writeResults, (results,), None))
+
+    def getTopTimes(self, ruleset, count, callback, since=0):
+        # Eventually calls callback() with a list of the fastest won
+        # rounds played with the indicated ruleset, as (roundId, date,
+        # duration, heat, seed), fastest first.
+        self.__query(self.__queryTopTimes, (ruleset, count, since), callback)
+
+    def getTopPoints(self, ruleset, count, callback, since=0):
+        # Eventually calls callback() with a list of the best scores
+        # in rounds played with the indicated ruleset, as (avId,
+        # points, roundId, date), best first.
+        self.__query(self.__queryTopPoints, (ruleset, count, since), callback)
+
+    def getToonResults(self, avId, count, callback):
+        # Eventually calls callback() with a list of the toon's most
+        # recent rounds, as (roundId, date, ruleset, duration, won,
+        # damage, stuns, stomps, points), newest first.
+        self.__query(self.__queryToonResults, (avId, count), callback)
+
+    def __query(self, method, args, callback):
+        self.requests.put((method, args, callback))
+        self.numOutstanding += 1
+        if self.numOutstanding == 1:
+            taskMgr.add(self.__replyTask, "craneLeagueResultReplies")
+
+    def __replyTask(self, task):
+        while True:
+            try:
+                callback, result = self.replies.get_nowait()
+            except queue.Empty:
+                break
+
+            self.numOutstanding -= 1
+            callback(result)
+
+        if not self.numOutstanding:
+            return Task.done
+        return Task.cont
+
+    ##### Database thread #####
+
+    def __run(self):
+        db = sqlite3.connect(self.filename)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.Schema:
+                db.execute(statement)
+
+            # Databases from before rounds had seeds.
+            if "seed" not in [column[1] for column in db.execute("PRAGMA table_info(rounds)")]:
+                db.execute("ALTER TABLE rounds ADD COLUMN seed INTEGER")
+            db.commit()
+
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+
+                method, args, callback = request
+                try:
+                    result = method(db, *args)
+                except sqlite3.Error as e:
+                    self.notify.warning("%s failed: %s" % (method.__name__, e))
+                    db.rollback()
+                    result = []
+
+                if callback:
+                    self.replies.put((callback, result))
+        finally:
+            db.close()
+
+    def __writeResults(self, db, results):
+        with db:
+            for ruleset, modifiers, heat, duration, won, toons, date, seed in results:
+                cursor = db.execute(
+                    "INSERT INTO rounds (date, ruleset, modifiers, heat, duration, won, seed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (date, ruleset, json.dumps(modifiers), heat, duration, int(won), seed),
+                )
+                roundId = cursor.lastrowid
+                db.executemany(
+                    "INSERT INTO roundToons (roundId, avId, damage, stuns, stomps, points) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(roundId, *toon) for toon in toons],
+                )
+        self.notify.info("Wrote %s crane round results." % len(results))
+
+    def __queryTopTimes(self, db, ruleset, count, since):
+        return db.execute(
+            "SELECT roundId, date, duration, heat, seed FROM rounds"
+            " WHERE ruleset = ? AND won = 1 AND date >= ?"
+            " ORDER BY duration LIMIT ?",
+            (ruleset, since, count),
+        ).fetchall()
+
+    def __queryTopPoints(self, db, ruleset, count, since):
+        return db.execute(
+            "SELECT roundToons.avId, roundToons.points, rounds.roundId, rounds.date"
+            " FROM roundToons JOIN rounds ON roundToons.roundId = rounds.roundId"
+            " WHERE rounds.ruleset = ? AND rounds.date >= ?"
+            " ORDER BY roundToons.points DESC LIMIT ?",
+            (ruleset, since, count),
+        ).fetchall()
+
+    def __queryToonResults(self, db, avId, count):
+        return db.execute(
+            "SELECT rounds.roundId, rounds.date, rounds.ruleset, rounds.duration, rounds.won,"
+            " roundToons.damage, roundToons.stuns, roundToons.stomps, roundToons.points"
+            " FROM roundToons JOIN rounds ON roundToons.roundId = rounds.roundId"
+            " WHERE roundToons.avId = ?"
+            " ORDER BY rounds.date DESC LIMIT ?",
+            (avId, count),
+        ).fetchall()
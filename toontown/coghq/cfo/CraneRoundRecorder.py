@@ -0,0 +1,215 @@
+import json
+import os
+import struct
+import time
+
+from direct.distributed.ClockDelta import globalClockDelta
+from direct.distributed.PyDatagram import PyDatagram
+from direct.distributed.PyDatagramIterator import PyDatagramIterator
+from panda3d.direct import DCPacker
+
+from toontown.coghq.cfo import CraneLeagueGlobals
+
+
+class CraneRoundRecorder:
+    """Writes down everything that goes on in the zone of one crane
+    round: every field update a client sends to an object in the zone,
+    with the avatar that sent it, and every update the objects in the
+    zone broadcast back, each with the time it happened.  A recording
+    can be played back against a boss with no server and no clients at
+    all; see scripts/replayCraneRound.py.
+
+    The AI repository hands us the updates (see roundRecorders in
+    ToontownAIRepository), still packed the way they came off the wire,
+    so recording costs little more than the write.  The file is a
+    header, then one record after another, and is only ever appended
+    to, so a recording cut short by a crash is still good up to the
+    last record written."""
+
+    notify = directNotify.newCategory("CraneRoundRecorder")
+
+    magic = b"CRR1"
+
+    # Record kinds.
+    GENERATE = 1  # An object entered the zone: doId, dclass name
+    INBOUND = 2  # A client sent a field: doId, sender avId, field
+    OUTBOUND = 3  # An object broadcast a field: doId, field
+    END = 4  # The round is over
+
+    # The boss settings, changed by magic words, that make a round play
+    # out differently.  They go in the header so a replay can put them
+    # back.
+    settingNames = (
+        "doTimer",
+        "timerOverride",
+        "wantSafeRushPractice",
+        "wantCustomCraneSpawns",
+        "wantAimPractice",
+        "wantOpeningModifications",
+        "wantMaxSizeGoons",
+        "wantLiveGoonPractice",
+        "wantNoStunning",
+        "goonMinScale",
+        "goonMaxScale",
+        "safesWanted",
+    )
+
+    def __init__(self, boss, filename):
+        self.boss = boss
+        self.air = boss.air
+        self.zoneId = boss.zoneId
+        self.filename = filename
+        self.file = None
+        self.startTime = 0.0
+
+        self.numRecords = 0
+        self.numBytes = 0
+
+    @classmethod
+    def makeFilename(cls, directory, boss):
+        # One file per round, named so they sort by when they started.
+        return os.path.join(directory, "%s-%s-%s.crr" % (time.strftime("%Y%m%d-%H%M%S"), boss.doId, boss.rng.seed))
+
+    def start(self):
+        # Opens the file, writes the header, and starts listening to
+        # the zone.
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        self.file = open(self.filename, "wb")  # noqa: SIM115 (open for the whole round)
+        self.startTime = globalClock.getFrameTime()
+
+        boss = self.boss
+        toons = []
+        for avId in boss.involvedToons:
+            toon = self.air.doId2do.get(avId)
+            if toon:
+                toons.append((avId, toon.getHp(), toon.getMaxHp(), avId in boss.spectators))
+
+        header = {
+            "bossClass": boss.__class__.__name__,
+            "bossDoId": boss.doId,
+            "zoneId": self.zoneId,
+            "seed": boss.rng.seed,
+            "ruleset": boss.rulesetClass.__name__,
+            "modifiers": CraneLeagueGlobals.getModifierKey(boss.modifiers),
+            "settings": {name: getattr(boss, name) for name in self.settingNames},
+            "toons": toons,
+            "date": time.time(),
+            "frameTime": self.startTime,
+            "networkTime": globalClockDelta.getRealNetworkTime(bits=32),
+        }
+        data = json.dumps(header).encode()
+        self.file.write(self.magic + struct.pack("<I", len(data)) + data)
+
+        self.air.roundRecorders[self.zoneId] = self
+        self.notify.info("%s recording crane round to %s" % (boss.doId, self.filename))
+
+        # Anything already in the zone, in the order the boss keeps
+        # them, so a replay can match them up with its own.
+        self.recordGenerate(boss)
+        for objects in (boss.cranes, boss.safes, boss.goons):
+            for obj in objects or ():
+                self.recordGenerate(obj)
+        for treasure in boss.treasures.values():
+            self.recordGenerate(treasure)
+
+    def stop(self):
+        if not self.file:
+            return
+
+        self.__write(self.__makeRecord(self.END, 0))
+        if self.air.roundRecorders.get(self.zoneId) is self:
+            del self.air.roundRecorders[self.zoneId]
+        self.file.close()
+        self.file = None
+        self.notify.info(
+            "%s recorded %s records (%s bytes) to %s" % (self.boss.doId, self.numRecords, self.numBytes, self.filename)
+        )
+
+    def recordGenerate(self, do):
+        record = self.__makeRecord(self.GENERATE, do.doId)
+        record.addString(do.dclass.getName())
+        self.__write(record)
+
+    def recordInbound(self, do, avId, data):
+        # data is the field number and arguments, as the client packed
+        # them.
+        record = self.__makeRecord(self.INBOUND, do.doId)
+        record.addUint32(avId)
+        record.appendData(data)
+        self.__write(record)
+
+    def recordOutbound(self, do, fieldName, args):
+        field = do.dclass.getFieldByName(fieldName)
+        if field is None:
+            return
+
+        packer = DCPacker()
+        packer.rawPackUint16(field.getNumber())
+        packer.beginPack(field)
+        field.packArgs(packer, args)
+        if not packer.endPack():
+            # The send itself will complain about this.
+            return
+
+        record = self.__makeRecord(self.OUTBOUND, do.doId)
+        record.appendData(packer.getBytes())
+        self.__write(record)
+
+    def __makeRecord(self, kind, doId):
+        # Every record starts with its kind, the milliseconds since the
+        # round started, and the doId it's about.
+        record = PyDatagram()
+        record.addUint8(kind)
+        record.addUint32(round((globalClock.getFrameTime() - self.startTime) * 1000))
+        record.addUint32(doId)
+        return record
+
+    def __write(self, record):
+        data = record.getMessage()
+        self.file.write(struct.pack("<H", len(data)) + data)
+        self.numRecords += 1
+        self.numBytes += len(data) + 2
+
+    @classmethod
+    def readRecording(cls, filename):
+        # Returns (header, records) for the indicated recording.  Each
+        # record is (kind, seconds, doId, avId, data): avId is the
+        # sender of an inbound record, the dclass name for a generate,
+        # and None otherwise, and data is the packed field, if any.
+        with open(filename, "rb") as file:
+            contents = file.read()
+
+        if contents[: len(cls.magic)] != cls.magic:
+            raise ValueError("%s is not a crane round recording" % filename)
+
+        offset = len(cls.magic)
+        (headerLength,) = struct.unpack_from("<I", contents, offset)
+        offset += 4
+        header = json.loads(contents[offset : offset + headerLength])
+        header["modifiers"] = tuple(tuple(modifier) for modifier in header["modifiers"])
+        offset += headerLength
+
+        records = []
+        while offset + 2 <= len(contents):
+            (length,) = struct.unpack_from("<H", contents, offset)
+            offset += 2
+            if offset + length > len(contents):
+                # The last record was cut short.
+                break
+
+            datagram = PyDatagram(contents[offset : offset + length])
+            di = PyDatagramIterator(datagram)
+            offset += length
+            kind = di.getUint8()
+            seconds = di.getUint32() / 1000.0
+            doId = di.getUint32()
+            avId = None
+            if kind == cls.GENERATE:
+                avId = di.getString()
+            elif kind == cls.INBOUND:
+                avId = di.getUint32()
+            records.append((kind, seconds, doId, avId, di.getRemainingBytes()))
+            if kind == cls.END:
+                break
+
+        return header, records
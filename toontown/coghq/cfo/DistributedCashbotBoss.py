@@ -15,7 +15,7 @@ from panda3d.core import (
     VBase3,
     Vec3,
 )
-from panda3d.direct import ShowInterval
+from panda3d.direct import DCPacker, ShowInterval
 from panda3d.otp import CFSpeech
 from panda3d.physics import ForceNode, LinearEulerIntegrator, LinearVectorForce, PhysicsManager
 
@@ -25,6 +25,7 @@ from direct.task.Task import Task
 from . import CraneLeagueGlobals, GeneralCFOGlobals
 from direct.fsm import FSM
 from toontown.coghq import BossHealthBar, DistributedBossCog
+from .CashbotBossEventBatcher import CashbotBossEventBatcher
 from .CashbotBossScoreboard import CashbotBossScoreboard
 from .CraneLeagueHeatDisplay import CraneLeagueHeatDisplay
 from toontown.coghq.ActivityLog import ActivityLog
@@ -46,7 +47,7 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
     numFakeGoons = 3
     bossHealthBar = None
 
-    BASE_HEAT = 500
+    BASE_HEAT = CraneLeagueGlobals.BASE_HEAT
 
     def __init__(self, cr):
         DistributedBossCog.DistributedBossCog.__init__(self, cr)
@@ -62,7 +63,9 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         self.wantCustomCraneSpawns = False
         self.customSpawnPositions = {}
         self.ruleset = CraneLeagueGlobals.CFORuleset()  # Setup a default ruleset as a fallback
+        self.rulesetBaseline = self.ruleset.asStruct()  # The ruleset as the AI sent it at generate time
         self.scoreboard = None
+        self.scores = []  # The AI's latest totals; see setBattleSnapshot()
         self.modifiers = []
         self.heatDisplay = CraneLeagueHeatDisplay()
         self.heatDisplay.hide()
@@ -74,6 +77,7 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         self.latency = 0.5  # default latency for updating object posHpr
 
         self.activityLog = ActivityLog()
+        self.activitySubscriptions = 0
 
         self.toonSpawnpointOrder = list(range(8))
 
@@ -92,21 +96,59 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         msg += " %s" % content
         self.activityLog.addToLog(msg)
 
-    def debug(self, doId="system", content="null"):
-        if self.ruleset.GENERAL_DEBUG:
-            self.addToActivityLog(doId, content)
-
-    def goonStatesDebug(self, doId="system", content="null"):
-        if self.ruleset.GOON_STATES_DEBUG:
-            self.addToActivityLog(doId, content)
-
-    def safeStatesDebug(self, doId="system", content="null"):
-        if self.ruleset.SAFE_STATES_DEBUG:
-            self.addToActivityLog(doId, content)
+    def addActivityEvents(self, events):
+        # The AI is telling us about some things that happened, in the
+        # categories we subscribed to.
+        for code, doId, args in events:
+            self.addToActivityLog(doId, CraneLeagueGlobals.renderActivityEvent(code, args))
+
+    def updateActivitySubscriptions(self):
+        # Asks the AI for the activity events our ruleset wants to see.
+        mask = 0
+        for category, flag in CraneLeagueGlobals.ACTIVITY_CATEGORY_FLAGS.items():
+            if getattr(self.ruleset, flag):
+                mask |= 1 << category
+
+        if mask != self.activitySubscriptions:
+            self.activitySubscriptions = mask
+            self.sendUpdate("setActivitySubscriptions", [mask])
+
+            # Only the objects whose state changes we're logging need
+            # to hear about them.
+            for objects in (self.cranes.values(), self.safes.values(), self.goons):
+                for obj in list(objects):
+                    obj.updateStateDebug()
+
+    def isActivityEnabled(self, category):
+        return bool(self.activitySubscriptions & (1 << category))
+
+    # The debug functions below take content as a format string and args to go in it, and don't put them together
+    # unless the ruleset wants to see them.  An arg may also be a function, which is called for its value only then
+    def __formatDebug(self, content, args):
+        if not args:
+            return content
+        return content % tuple(arg() if callable(arg) else arg for arg in args)
+
+    def debug(self, doId="system", content="null", *args):
+        if self.activitySubscriptions & (1 << CraneLeagueGlobals.ACTIVITY_GENERAL):
+            self.addToActivityLog(doId, self.__formatDebug(content, args))
+
+    def goonStatesDebug(self, doId="system", content="null", *args):
+        if self.activitySubscriptions & (1 << CraneLeagueGlobals.ACTIVITY_GOON_STATES):
+            self.addToActivityLog(doId, self.__formatDebug(content, args))
+
+    def safeStatesDebug(self, doId="system", content="null", *args):
+        if self.activitySubscriptions & (1 << CraneLeagueGlobals.ACTIVITY_SAFE_STATES):
+            self.addToActivityLog(doId, self.__formatDebug(content, args))
+
+    def craneStatesDebug(self, doId="system", content="null", *args):
+        wantLog = self.activitySubscriptions & (1 << CraneLeagueGlobals.ACTIVITY_CRANE_STATES)
+        if not wantLog and not self.notify.getDebug():
+            return
 
-    def craneStatesDebug(self, doId="system", content="null"):
-        self.notify.debug(f"{doId}: {content}")
-        if self.ruleset.CRANE_STATES_DEBUG:
+        content = self.__formatDebug(content, args)
+        self.notify.debug("%s: %s" % (doId, content))
+        if wantLog:
             self.addToActivityLog(doId, content)
 
     def updateSpectators(self, specs):
@@ -226,6 +268,15 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         return self.BASE_HEAT + bonusHeat
 
     def updateRequiredElements(self):
+        self.__updateSpeedrunTimer()
+        # If the scoreboard was made then update the ruleset
+        if self.scoreboard:
+            self.scoreboard.set_ruleset(self.ruleset)
+
+        self.heatDisplay.update(self.calculateHeat(), self.modifiers)
+        self.__updateBackWall()
+
+    def __updateSpeedrunTimer(self):
         self.bossSpeedrunTimer.cleanup()
         self.bossSpeedrunTimer = (
             BossSpeedrunTimedTimer(time_limit=self.ruleset.TIMER_MODE_TIME_LIMIT)
@@ -233,22 +284,36 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
             else BossSpeedrunTimer()
         )
         self.bossSpeedrunTimer.hide()
-        # If the scoreboard was made then update the ruleset
-        if self.scoreboard:
-            self.scoreboard.set_ruleset(self.ruleset)
-
-        self.heatDisplay.update(self.calculateHeat(), self.modifiers)
 
+    def __updateBackWall(self):
         if self.ruleset.WANT_BACKWALL:
             self.enableBackWall()
         else:
             self.disableBackWall()
 
     def setRawRuleset(self, attrs):
+        self.rulesetBaseline = list(attrs)
         self.ruleset = CraneLeagueGlobals.CFORuleset.fromStruct(attrs)
         self.updateRequiredElements()
+        self.updateActivitySubscriptions()
         self.notify.info(("ruleset updated: " + str(self.ruleset)))
 
+    def updateRuleset(self, delta):
+        # The AI has changed some rules since we were generated.  We get
+        # every rule that differs from what setRawRuleset gave us, so we
+        # patch our ruleset in place and only redo what those rules touch.
+        changed = self.ruleset.applyDelta(self.rulesetBaseline, delta)
+        if not changed:
+            return
+
+        if "TIMER_MODE" in changed or "TIMER_MODE_TIME_LIMIT" in changed:
+            self.__updateSpeedrunTimer()
+        if "WANT_BACKWALL" in changed:
+            self.__updateBackWall()
+        if not changed.isdisjoint(CraneLeagueGlobals.ACTIVITY_CATEGORY_FLAGS.values()):
+            self.updateActivitySubscriptions()
+        self.notify.info("ruleset updated: %s" % ", ".join("%s=%s" % (n, getattr(self.ruleset, n)) for n in changed))
+
     def getRawRuleset(self):
         return self.ruleset.asStruct()
 
@@ -256,12 +321,11 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         return self.ruleset
 
     def setModifiers(self, mods):
-        modsToSet = []  # A list of CFORulesetModifierBase subclass instances
-        for modStruct in mods:
-            modsToSet.append(CraneLeagueGlobals.CFORulesetModifierBase.fromStruct(modStruct))
-
-        self.modifiers = modsToSet
+        # A list of CFORulesetModifierBase subclass instances, shared with anyone else using the same ones
+        modifierKey = tuple((modifierEnum, tier) for modifierEnum, tier in mods)
+        self.modifiers = list(CraneLeagueGlobals.getModifiers(modifierKey))
         self.modifiers.sort(key=lambda m: m.MODIFIER_TYPE)
+        self.heatDisplay.update(self.calculateHeat(), self.modifiers)
 
     def disable(self):
         """
@@ -588,6 +652,9 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
             if avId in base.cr.doId2do:
                 self.scoreboard.addToon(avId)
 
+        # If we've come in partway through, these are the totals so far.
+        self.scoreboard.setScores(self.scores)
+
     def saySomething(self, chatString):
         intervalName = "CFOTaunt"
         seq = Sequence(name=intervalName)
@@ -608,6 +675,7 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
 
     def exitBattleThree(self):
         DistributedBossCog.DistributedBossCog.exitBattleThree(self)
+        self.scores = []
         bossDoneEventName = self.uniqueName("DestroyedBoss")
         self.ignore(bossDoneEventName)
         self.stopAnimate()
@@ -620,9 +688,6 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         taskMgr.remove(self.uniqueName("physics"))
 
     def toonDied(self, avId):
-        self.scoreboard.addScore(
-            avId, self.ruleset.POINTS_PENALTY_GO_SAD, CraneLeagueGlobals.PENALTY_GO_SAD_TEXT, ignoreLaff=True
-        )
         self.scoreboard.toonDied(avId)
         DistributedBossCog.DistributedBossCog.toonDied(self, avId)
 
@@ -630,39 +695,73 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
         DistributedBossCog.DistributedBossCog.localToonDied(self)
         self.localToonIsSafe = 1
 
-    def killingBlowDealt(self, avId):
-        self.scoreboard.addScore(avId, self.ruleset.POINTS_KILLING_BLOW, CraneLeagueGlobals.KILLING_BLOW_TEXT)
-
-    def updateDamageDealt(self, avId, damageDealt):
-        self.scoreboard.addScore(avId, damageDealt)
-        self.scoreboard.addDamage(avId, damageDealt)
+    def updateScore(self, avId, amount, reason, extra):
+        # The AI has given (or taken away) some points.  It's done all
+        # of the work of applying the ruleset; we just show them.
+        self.scoreboard.addScore(avId, amount, CraneLeagueGlobals.getScoreReasonText(reason, extra))
 
-    def updateStunCount(self, avId, craneId):
-        crane = base.cr.doId2do.get(craneId)
-        if crane:
-            self.scoreboard.addScore(avId, crane.getPointsForStun(), CraneLeagueGlobals.STUN_TEXT)
+        # Some reasons also count toward the toon's stats.
+        if reason == CraneLeagueGlobals.SCORE_DAMAGE:
+            self.scoreboard.addDamage(avId, amount)
+        elif reason == CraneLeagueGlobals.SCORE_STUN:
             self.scoreboard.addStun(avId)
+        elif reason == CraneLeagueGlobals.SCORE_GOON_STOMP:
+            self.scoreboard.addStomp(avId)
+
+    def setTimerPaused(self, paused, elapsed):
+        # The AI has stopped the round while nobody is playing, or
+        # started it again; either way, elapsed is how far into the
+        # round it is.  Our timer runs on our own clock, so it has to
+        # be stopped and set to match.
+        self.bossSpeedrunTimer.set_elapsed(elapsed)
+        self.bossSpeedrunTimer.update_time()
+        if paused:
+            self.bossSpeedrunTimer.stop_updating()
+        else:
+            self.bossSpeedrunTimer.start_updating()
+
+    def setBattleSnapshot(self, bossDamage, scores):
+        # Where the battle stands: the CFO's damage and every toon's
+        # totals and combo, best first.  This is how we catch up if
+        # we've arrived partway through; otherwise it should match
+        # what the updates along the way have told us.  We keep the
+        # totals in case the scoreboard isn't set up yet.
+        if bossDamage != self.bossDamage:
+            self.bossDamage = bossDamage
+            self.updateHealthBar()
+            if self.bossHealthBar:
+                self.bossHealthBar.update(self.ruleset.CFO_MAX_HP - bossDamage, self.ruleset.CFO_MAX_HP)
+
+        self.scores = scores
+        if self.scoreboard:
+            self.scoreboard.setScores(scores)
 
-    def updateGoonsStomped(self, avId):
-        self.scoreboard.addScore(avId, self.ruleset.POINTS_GOON_STOMP, CraneLeagueGlobals.GOON_STOMP_TEXT)
-        self.scoreboard.addStomp(avId)
-
-    def updateSafePoints(self, avId, points):
-        self.scoreboard.addScore(
-            avId, points, CraneLeagueGlobals.PENALTY_SAFEHEAD_TEXT if points < 0 else CraneLeagueGlobals.DESAFE_TEXT
-        )
-
-    def updateMaxImpactHits(self, avId):
-        self.scoreboard.addScore(avId, self.ruleset.POINTS_IMPACT, CraneLeagueGlobals.IMPACT_TEXT)
-
-    def updateLowImpactHits(self, avId):
-        self.scoreboard.addScore(avId, self.ruleset.POINTS_PENALTY_SANDBAG, CraneLeagueGlobals.PENALTY_SANDBAG_TEXT)
+    def setStandings(self, avIds):
+        self.scoreboard.setStandings(avIds)
 
     def updateCombo(self, avId, comboLength):
         self.scoreboard.setCombo(avId, comboLength)
 
-    def awardCombo(self, avId, comboLength, amount):
-        self.scoreboard.addScore(avId, amount, reason="COMBO x" + str(comboLength) + "!")
+    def applyEventBatch(self, data):
+        # The AI has sent a frame's worth of updates in one message;
+        # see CashbotBossEventBatcher.  Each one is a field number
+        # followed by the field's arguments, and we handle them in
+        # order as though they had come one at a time.
+        packer = DCPacker()
+        packer.setUnpackData(data)
+        while packer.getNumUnpackedBytes() < packer.getUnpackLength():
+            field = self.cr.dcFile.getFieldByIndex(packer.rawUnpackUint16())
+            if field is None or field.getName() not in CashbotBossEventBatcher.batchedFields:
+                self.notify.warning("Unexpected field in event batch; dropping the rest.")
+                return
+
+            packer.beginUnpack(field)
+            args = field.unpackArgs(packer)
+            if not packer.endUnpack():
+                self.notify.warning("Could not unpack %s from event batch." % field.getName())
+                return
+
+            getattr(self, field.getName())(*args)
 
     def announceCraneRestart(self):
         restartingOrEnding = "Restarting " if self.ruleset.RESTART_CRANE_ROUND_ON_FAIL else "Ending "
@@ -716,16 +815,6 @@ class DistributedCashbotBoss(DistributedBossCog.DistributedBossCog, FSM.FSM):
             self.localToonIsSafe = False
             base.localAvatar.stunToon()
 
-    def goonKilledBySafe(self, avId):
-        self.scoreboard.addScore(
-            avId, amount=self.ruleset.POINTS_GOON_KILLED_BY_SAFE, reason=CraneLeagueGlobals.GOON_KILLED_BY_SAFE_TEXT
-        )
-
-    def updateUnstun(self, avId):
-        self.scoreboard.addScore(
-            avId, amount=self.ruleset.POINTS_PENALTY_UNSTUN, reason=CraneLeagueGlobals.PENALTY_UNSTUN_TEXT
-        )
-
     def timesUp(self):
         restartingOrEnding = "Restarting " if self.ruleset.RESTART_CRANE_ROUND_ON_FAIL else "Ending "
 
@@ -1,8 +1,14 @@
 from panda3d.core import *
 from direct.showbase.PythonUtil import clamp
 from direct.fsm import FSM
-import random
 import math
+import time
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from toontown.coghq import DistributedBossCogAI
 from toontown.coghq.cfo import (
@@ -15,37 +21,97 @@ from toontown.coghq.cfo import (
     DistributedCashbotBossTreasureAI,
     GeneralCFOGlobals,
 )
+from toontown.coghq.cfo.CashbotBossActivityStream import CashbotBossActivityStream
 from toontown.coghq.cfo.CashbotBossComboTracker import CashbotBossComboTracker
+from toontown.coghq.cfo.CashbotBossEventBatcher import CashbotBossEventBatcher
+from toontown.coghq.cfo.CashbotBossGoonScheduler import CashbotBossGoonScheduler
+from toontown.coghq.cfo.CashbotBossHibernator import CashbotBossHibernator
+from toontown.coghq.cfo.CashbotBossObstacleGrid import CashbotBossObstacleGrid
+from toontown.coghq.cfo.CashbotBossRandom import CashbotBossRandom
+from toontown.coghq.cfo.CashbotBossSafeRelocator import CashbotBossSafeRelocator
+from toontown.coghq.cfo.CashbotBossScoreKeeper import CashbotBossScoreKeeper
+from toontown.coghq.cfo.CashbotBossTimerWheel import CashbotBossTimerWheel
+from toontown.coghq.cfo.CraneRoundRecorder import CraneRoundRecorder
 from toontown.toonbase.globals import TTGlobalsBosses
 
 
 class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FSM):
     notify = directNotify.newCategory("DistributedCashbotBossAI")
 
+    # If set, every crane round is recorded to a file in this directory;
+    # see CraneRoundRecorder.
+    recordingDirectory = ConfigVariableString("crane-round-recordings", "").value
+
+    # How long a late joiner's view of the damage, scores and combos
+    # may lag behind; see sendBattleSnapshotLater().
+    battleSnapshotDelay = 0.5
+
     def __init__(self, air):
         DistributedBossCogAI.DistributedBossCogAI.__init__(self, air, "m")
         FSM.FSM.__init__(self, "DistributedCashbotBossAI")
-        self.ruleset = CraneLeagueGlobals.CFORuleset()
-        self.rulesetFallback = self.ruleset  # A fallback ruleset for when we rcr, or change mods mid round
+        # Rulesets are compiled from this class and our modifiers, see CraneLeagueGlobals.compileRuleset
+        self.rulesetClass = CraneLeagueGlobals.CFORuleset
+        self.ruleset = CraneLeagueGlobals.compileRuleset(self.rulesetClass)
+        self.rulesetFallback = self.ruleset  # The ruleset without modifiers, for when we rcr, or change mods mid round
+
+        # The ruleset as the clients got it when we were generated.  Changes since then go out as deltas against
+        # this (see d_updateRuleset), so the required field never has to be sent again.
+        self.rulesetBaseline = self.ruleset.asStruct()
+        self.rulesetDelta = []
         self.modifiers = []  # A list of CFORulesetModifierBase instances
         self.cranes = None
         self.safes = None
         self.goons = None
+
+        # The goons in self.goons that are Off, waiting to be sent out
+        # again, oldest first; see makeGoon().
+        self.freeGoons = deque()
+
+        # True if we're one of a lobby manager's pooled offices, in
+        # which case our cranes and safes are built ahead of time and
+        # kept from one round (and one group) to the next, rather than
+        # made and deleted every time; see prewarmOffice().
+        self.keepBattleThreeObjects = False
         self.treasures = {}
         self.grabbingTreasures = {}
-        self.recycledTreasures = []
 
-        # We need a scene to do the collision detection in.
+        # The treasures nobody is using right now, waiting to be
+        # dropped by a goon; see makeTreasure().
+        self.recycledTreasures = deque()
+
+        # The short gameplay timers of the battle all run on this
+        # wheel, rather than as named do-laters; see getTimerStats().
+        self.timers = CashbotBossTimerWheel(self)
+        self.nextGoonTimer = None
+        self.recycleTimers = {}
+        self.reviveTimers = {}
+
+        # We need a scene to place our objects in.
         self.scene = NodePath("scene")
         self.reparentTo(self.scene)
 
-        # And some solids to keep the goons constrained to our room.
-        cn = CollisionNode("walls")
-        cs = CollisionSphere(0, 0, 0, 13)
-        cn.addSolid(cs)
-        cs = CollisionInvSphere(0, 0, 0, 42)
-        cn.addSolid(cs)
-        self.attachNewNode(cn)
+        # The goons steer around the safes, cranes and each other by
+        # casting their feelers against this grid; see placeWalls().
+        self.obstacleGrid = CashbotBossObstacleGrid()
+
+        # The goons waiting to choose their next direction this frame,
+        # by doId; see requestGoonDirection().
+        self.goonsToPlan = {}
+
+        # Walks the goons along their legs; see getGoonPositions().
+        self.goonScheduler = CashbotBossGoonScheduler(self)
+
+        # Stops the clock while nobody is playing; see
+        # getHibernationStats().
+        self.hibernator = CashbotBossHibernator(self)
+
+        # Who's holding what.  Maps avId -> the crane that toon is
+        # controlling, and craneId -> the doId of the object held by
+        # that crane's magnet.  The cranes keep these up to date; see
+        # getCraneAndObject().
+        self.avIdToCrane = {}
+        self.craneAvatars = {}
+        self.craneObjects = {}
 
         # By "heldObject", we mean the safe he's currently wearing as
         # a helmet, if any.  It's called a heldObject because this is
@@ -59,6 +125,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.wantCustomCraneSpawns = False
         self.wantAimPractice = False
         self.toonsWon = False
+        self.resultRecorded = False
 
         # Controlled RNG parameters, True to enable, False to disable
         self.wantOpeningModifications = False
@@ -71,8 +138,32 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.goonMaxScale = 2.4
         self.safesWanted = 5
 
+        # Moves the safes near the toon for safe rush practice; see
+        # checkNearby().
+        self.safeRelocator = CashbotBossSafeRelocator(self)
+
         self.comboTrackers = {}  # Maps avId -> CashbotBossComboTracker instance
 
+        # The points scored by the toons in battle three.
+        self.scores = CashbotBossScoreKeeper(self)
+
+        # The events for the activity log.
+        self.activity = CashbotBossActivityStream(self)
+
+        # Damage, score, combo and attack updates go out together at
+        # the end of each frame.
+        self.eventBatcher = CashbotBossEventBatcher(self)
+
+        # Those updates are only changes, so the damage, scores and
+        # combos as they stand are sent as well, for anyone who arrives
+        # later; see sendBattleSnapshotLater().
+        self.battleSnapshotTimer = None
+
+        # Every random roll of the battle comes from one of these
+        # streams, all seeded from the round seed in enterBattleThree.
+        self.rng = CashbotBossRandom()
+        self.progressRandom = self.rng.goons
+
         # A list of toon ids that are spectating
         self.spectators = []
 
@@ -84,6 +175,12 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         # if false, count up, if none, use the rule
         self.doTimer = None
         self.timerOverride = self.ruleset.TIMER_MODE_TIME_LIMIT  # Amount of time to override in seconds
+        # If set, the seed to play the next round with (to replay a round, or give everyone in a tournament the same
+        # rolls), if none, pick a new one each round
+        self.seedOverride = None
+
+        # Writing down the current round, if we're recording them.
+        self.recorder = None
 
         # Map of damage multipliers for toons
         self.toonDmgMultipliers = {}
@@ -107,27 +204,21 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         old = self.getToonOutgoingMultiplier(avId)
         self.toonDmgMultipliers[avId] = old + n
 
-    def updateActivityLog(self, doId, content):
-        self.sendUpdate("addToActivityLog", [doId, content])
-
-    def debug(self, doId=None, content="null"):
-        if not doId:
-            doId = self.doId
-
-        if self.ruleset.GENERAL_DEBUG:
-            self.updateActivityLog(doId, content)
-
-    def goonStatesDebug(self, doId="system", content="null"):
-        if self.ruleset.GOON_STATES_DEBUG:
-            self.updateActivityLog(doId, content)
-
-    def safeStatesDebug(self, doId="system", content="null"):
-        if self.ruleset.SAFE_STATES_DEBUG:
-            self.updateActivityLog(doId, content)
+    def setActivitySubscriptions(self, categoryMask):
+        # A client wants to see the activity events in the indicated
+        # categories (a bitmask of CraneLeagueGlobals.ACTIVITY_*).
+        # Only the toons in this fight, or watching it, may see it.
+        avId = self.air.getAvatarIdFromSender()
+        if avId not in self.involvedToons and avId not in self.spectators:
+            self.notify.warning("Activity subscription from %s, who isn't in boss %s" % (avId, self.doId))
+            return
+        if avId not in self.air.doId2do:
+            return
+        self.activity.setSubscriptions(avId, categoryMask)
 
-    def craneStatesDebug(self, doId="system", content="null"):
-        if self.ruleset.CRANE_STATES_DEBUG:
-            self.updateActivityLog(doId, content)
+    def d_addActivityEvents(self, avId, events):
+        events = [[code, doId, list(args)] for code, doId, args in events]
+        self.sendUpdateToAvatarId(avId, "addActivityEvents", [events])
 
     def clearObjectSpeedCaching(self):
         if self.safes:
@@ -153,6 +244,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             av.b_setGhostMode(True)
             av.b_setImmortalMode(True)
             self.d_updateSpectators()
+            self.hibernator.update()
 
     # Put a toon in the required state to be participant
     def disableSpectator(self, av):
@@ -161,6 +253,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             av.b_setGhostMode(False)
             av.b_setImmortalMode(False)
             self.d_updateSpectators()
+            self.hibernator.update()
 
     def d_updateSpectators(self):
         self.sendUpdate("updateSpectators", [self.spectators])
@@ -172,9 +265,25 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         t = max(t0, t1)
         return fromValue + (toValue - fromValue) * min(t, 1)
 
-    # Any time you change the ruleset, you should call this to sync the clients
-    def d_setRawRuleset(self):
-        self.sendUpdate("setRawRuleset", [self.getRawRuleset()])
+    # Any time you change the ruleset, you should call this to sync the clients.  Only the attributes that differ
+    # from what the clients got at generate time are sent, and nothing at all if that hasn't changed since last time
+    def d_updateRuleset(self):
+        self.updateActivityLogging()
+        delta = self.ruleset.getDelta(self.rulesetBaseline)
+        if delta == self.rulesetDelta:
+            return
+        self.rulesetDelta = delta
+        self.sendUpdate("updateRuleset", [delta])
+
+    # The ruleset's debug flags decide what goes in the activity log.  Only the objects whose state changes are being
+    # logged get a state change hook at all, so the rest pay nothing for it
+    def updateActivityLogging(self):
+        if not self.activity.updateEnabled():
+            return
+
+        for objects in (self.cranes, self.safes, self.goons):
+            for obj in objects or ():
+                obj.updateStateChangeHook()
 
     def __getRawModifierList(self):
         mods = []
@@ -186,80 +295,79 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
     def d_setModifiers(self):
         self.sendUpdate("setModifiers", [self.__getRawModifierList()])
 
-    # Call to update the ruleset with the modifiers active, note calling more than once can cause unexpected behavior
-    # if the ruleset doesn't fallback to an initial value, for example if a cfo hp increasing modifier is active and we
-    # call this multiply times, his hp will be 1500 * 1.5 * 1.5 * 1.5 etc etc
+    # Call to update the ruleset with the modifiers active.  The ruleset is compiled from scratch (or more likely found
+    # in the cache) every time, so this is safe to call as often as you like
     def applyModifiers(self, updateClient=False):
-        for modifier in self.modifiers:
-            modifier.apply(self.ruleset)
+        self.ruleset = self.compileRuleset(CraneLeagueGlobals.getModifierKey(self.modifiers))
+        self.updateActivityLogging()
 
         if updateClient:
-            self.d_setRawRuleset()
+            self.d_updateRuleset()
 
     # Clears all current modifiers and restores the ruleset before modifiers were applied
     def resetModifiers(self):
         self.modifiers = []
         self.ruleset = self.rulesetFallback
-        self.d_setRawRuleset()
+        self.d_updateRuleset()
 
     def getRawRuleset(self):
-        return self.ruleset.asStruct()
+        return self.rulesetBaseline
 
     def getRuleset(self):
         return self.ruleset
 
-    def setupTimer(self):
+    # Returns our ruleset class compiled with the given modifier key, with any timer override applied on top
+    def compileRuleset(self, modifierKey=()):
+        return self.setupTimer(CraneLeagueGlobals.compileRuleset(self.rulesetClass, modifierKey))
+
+    # Returns the ruleset with the timer forced into whatever state a command asked for
+    def setupTimer(self, ruleset):
         # If command says we should force the timer into a certain state
         # Nothing changed, don't do anything
         if self.doTimer is None:
-            return
+            return ruleset
 
         # Timer should always count up
         if not self.doTimer:
-            self.ruleset.TIMER_MODE = False
-            return
+            return ruleset.derive(TIMER_MODE=False)
 
         # Timer should always go down
-        self.ruleset.TIMER_MODE = True
-        self.ruleset.TIMER_MODE_TIME_LIMIT = (
-            self.timerOverride if self.timerOverride > 0 else self.ruleset.TIMER_MODE_TIME_LIMIT
+        return ruleset.derive(
+            TIMER_MODE=True,
+            TIMER_MODE_TIME_LIMIT=self.timerOverride if self.timerOverride > 0 else ruleset.TIMER_MODE_TIME_LIMIT,
         )
 
     def setupRuleset(self):
-        self.ruleset = CraneLeagueGlobals.CFORuleset()
-
-        self.setupTimer()
-
-        self.rulesetFallback = self.ruleset
+        self.ruleset = self.rulesetFallback = self.compileRuleset()
 
         # Should we randomize some modifiers?
         if self.rollModsOnStart:
             self.rollRandomModifiers()
 
+        # The compiled ruleset has already been validated, so they can't have done anything bad
         self.applyModifiers()
-        # Make sure they didn't do anything bad
-        self.ruleset.validate()
-        self.debug(content="Applied %s modifiers" % len(self.modifiers))
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_APPLIED_MODIFIERS, None, len(self.modifiers))
 
         # Update the client
-        self.d_setRawRuleset()
+        self.d_updateRuleset()
         self.d_setModifiers()
 
     def rollRandomModifiers(self):
         tierLeftBound = self.ruleset.MODIFIER_TIER_RANGE[0]
         tierRightBound = self.ruleset.MODIFIER_TIER_RANGE[1]
         pool = [
-            c(random.randint(tierLeftBound, tierRightBound)) for c in CraneLeagueGlobals.NON_SPECIAL_MODIFIER_CLASSES
+            c(self.rng.modifiers.randint(tierLeftBound, tierRightBound))
+            for c in CraneLeagueGlobals.NON_SPECIAL_MODIFIER_CLASSES
         ]
-        random.shuffle(pool)
+        self.rng.modifiers.shuffle(pool)
 
         self.modifiers = [pool.pop() for _ in range(self.numModsWanted)]
 
         # If we roll a % roll, go ahead and make this a special cfo
         # Doing this last also ensures any rules that the special mod needs to set override
-        if random.randint(0, 99) < CraneLeagueGlobals.SPECIAL_MODIFIER_CHANCE:
-            cls = random.choice(CraneLeagueGlobals.SPECIAL_MODIFIER_CLASSES)
-            tier = random.randint(tierLeftBound, tierRightBound)
+        if self.rng.modifiers.randint(0, 99) < CraneLeagueGlobals.SPECIAL_MODIFIER_CHANCE:
+            cls = self.rng.modifiers.choice(CraneLeagueGlobals.SPECIAL_MODIFIER_CLASSES)
+            tier = self.rng.modifiers.randint(tierLeftBound, tierRightBound)
             mod_instance = cls(tier)
             self.modifiers.append(mod_instance)
 
@@ -273,6 +381,35 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         if __dev__:
             self.scene.reparentTo(self.getRender())
 
+            # Make sure nobody forgot to regenerate the DC struct after changing the ruleset schema.
+            for problem in CraneLeagueGlobals.CFORuleset.checkDCStruct(
+                self.air.dcFile.getClassByName("CraneLeagueRuleset")
+            ):
+                self.notify.warning(problem)
+
+    def delete(self):
+        # A pooled office still has its cranes, safes, goons and
+        # treasures.
+        self.__deleteBattleThreeObjects()
+        self.deleteAllTreasures()
+        self.hibernator.cleanup()
+        self.timers.cleanup()
+        self.goonScheduler.cleanup()
+        self.__cleanupComboTrackers()
+        self.scores.cleanup()
+        self.activity.cleanup()
+        self.eventBatcher.cleanup()
+        self.stopRecording()
+        taskMgr.remove(self.uniqueName("planGoons"))
+        DistributedBossCogAI.DistributedBossCogAI.delete(self)
+
+    def placeWalls(self):
+        # Some solids to keep the goons constrained to our room: the
+        # boss himself in the middle, and the outer wall around him.
+        pos = self.getPos()
+        self.obstacleGrid.setSphere("walls", pos[0], pos[1], pos[2], 13)
+        self.obstacleGrid.setBoundary(pos[0], pos[1], pos[2], 42)
+
     def removeToon(self, avId, died=False):
         # The toon leaves the zone, either through disconnect, death,
         # or something else.  Tell all of the safes, cranes, and goons.
@@ -290,14 +427,151 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
                 goon.removeToon(avId)
 
         DistributedBossCogAI.DistributedBossCogAI.removeToon(self, avId, died=died)
+        self.hibernator.update()
+
+        if avId not in self.involvedToons and avId not in self.spectators:
+            # Nor does the toon get to keep watching the activity log.
+            self.activity.setSubscriptions(avId, 0)
+
+    def setCraneAvatar(self, crane, avId):
+        # Called by a crane when a toon takes control of it (or lets
+        # go of it, with avId 0).
+        oldAvId = self.craneAvatars.pop(crane.doId, 0)
+        if oldAvId and self.avIdToCrane.get(oldAvId) is crane:
+            del self.avIdToCrane[oldAvId]
+        if avId:
+            self.craneAvatars[crane.doId] = avId
+            self.avIdToCrane[avId] = crane
+
+        if __dev__:
+            self.__checkCraneOwnership()
+
+    def setCraneObject(self, crane, objectId):
+        # Called by a crane when its magnet grabs an object (or lets
+        # go of it, with objectId 0).
+        if objectId:
+            self.craneObjects[crane.doId] = objectId
+        else:
+            self.craneObjects.pop(crane.doId, None)
+
+        if __dev__:
+            self.__checkCraneOwnership()
+
+    def getControlledCrane(self, avId):
+        # Returns the crane that the indicated avatar is controlling,
+        # or None if none.
+        return self.avIdToCrane.get(avId)
+
+    def getCraneAndObject(self, avId):
+        # Returns the pair (craneId, objectId) representing the crane
+        # that the indicated avatar is controlling, or 0 if none, and
+        # the object currently held by that crane's magnet, or 0 if
+        # none.  If the object is in Dropped state, it is not listed
+        # here.
+        crane = self.avIdToCrane.get(avId)
+        if crane is None:
+            return (0, 0)
+        return (crane.doId, self.craneObjects.get(crane.doId, 0))
+
+    def __checkCraneOwnership(self):
+        # Makes sure the ownership index agrees with the cranes
+        # themselves.  Only done in dev builds.
+        cranes = self.cranes or []
+        for crane in cranes:
+            if crane.avId:
+                assert self.avIdToCrane.get(crane.avId) is crane, "crane %s lost avId %s" % (crane.doId, crane.avId)
+            assert self.craneObjects.get(crane.doId, 0) == crane.objectId, "crane %s lost object %s" % (
+                crane.doId,
+                crane.objectId,
+            )
+        for avId, crane in self.avIdToCrane.items():
+            assert crane.avId == avId, "avId %s indexed to crane %s held by %s" % (avId, crane.doId, crane.avId)
+
+    def prewarmOffice(self):
+        # We're going in a lobby manager's pool: build the cranes and
+        # safes now, so there's nothing to generate when the toons come
+        # in, and keep them from here on.
+        self.keepBattleThreeObjects = True
+        self.__makeBattleThreeObjects()
+        self.__parkBattleThreeObjects()
+
+    def resetOffice(self):
+        # Our toons have all gone.  Put back everything they (or their
+        # magic words) might have changed, so the next group gets the
+        # office as it was when it was first made.
+        DistributedBossCogAI.DistributedBossCogAI.resetOffice(self)
+        self.stopCheckNearby()
+        self.hibernator.cleanup()
+
+        self.doTimer = None
+        self.seedOverride = None
+        self.rollModsOnStart = False
+        self.numModsWanted = 5
+
+        self.wantSafeRushPractice = False
+        self.wantCustomCraneSpawns = False
+        self.wantAimPractice = False
+        self.wantOpeningModifications = False
+        self.wantMaxSizeGoons = False
+        self.wantLiveGoonPractice = False
+        self.wantNoStunning = False
+        self.customSpawnPositions = {}
+        self.goonMinScale = 0.8
+        self.goonMaxScale = 2.4
+        self.safesWanted = 5
+
+        self.toonsWon = False
+        self.resultRecorded = False
+        self.toonDmgMultipliers = {}
+        self.__cleanupComboTrackers()
+        self.scores.cleanup()
+        self.activity.cleanup()
+        self.eventBatcher.cleanup()
+
+        # Back to the plain ruleset, which is the one the clients got
+        # when we were generated, so the delta goes back to nothing.
+        self.modifiers = []
+        self.ruleset = self.rulesetFallback = self.compileRuleset()
+        self.timerOverride = self.ruleset.TIMER_MODE_TIME_LIMIT
+        self.d_updateRuleset()
+        self.d_setModifiers()
+
+        self.spectators = []
+        self.d_updateSpectators()
+        self.toonSpawnpointOrder = list(range(8))
+        self.d_setToonSpawnpointOrder()
+        self.b_setBossDamage(0)
+
+        # And the cranes and safes the ruleset calls for, all back in
+        # their places.
+        self.__makeBattleThreeObjects()
+        self.__parkBattleThreeObjects()
+
+    def __battleThreeObjectsMatchRuleset(self):
+        # Returns true if the cranes and safes we have are the ones the
+        # current ruleset asks for.
+        numCranes = len(CraneLeagueGlobals.NORMAL_CRANE_POSHPR)
+        if self.ruleset.WANT_SIDECRANES:
+            numCranes += len(CraneLeagueGlobals.SIDE_CRANE_POSHPR)
+        if self.ruleset.WANT_HEAVY_CRANES:
+            numCranes += len(CraneLeagueGlobals.HEAVY_CRANE_POSHPR)
+        numSafes = min(self.ruleset.SAFES_TO_SPAWN, len(CraneLeagueGlobals.SAFE_POSHPR))
+
+        return len(self.cranes or ()) == numCranes and len(self.safes or ()) == numSafes
 
     def __makeBattleThreeObjects(self):
+        if self.cranes is not None and not self.__battleThreeObjectsMatchRuleset():
+            # Kept from a round with different rules.
+            self.__deleteBattleThreeObjects()
+
         if self.cranes is None:
             # Generate all of the cranes.
             self.cranes = []
             ind = 0
 
-            self.debug(content="Generating %s normal cranes" % len(CraneLeagueGlobals.NORMAL_CRANE_POSHPR))
+            self.activity.log(
+                CraneLeagueGlobals.ACTIVITY_GENERATING_CRANES, None, len(CraneLeagueGlobals.NORMAL_CRANE_POSHPR)
+            )
             for _ in CraneLeagueGlobals.NORMAL_CRANE_POSHPR:
                 crane = DistributedCashbotBossCraneAI.DistributedCashbotBossCraneAI(self.air, self, ind)
                 crane.generateWithRequired(self.zoneId)
@@ -306,7 +580,9 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
             # Generate the sidecranes if wanted
             if self.ruleset.WANT_SIDECRANES:
-                self.debug(content="Generating %s sidecranes" % len(CraneLeagueGlobals.SIDE_CRANE_POSHPR))
+                self.activity.log(
+                    CraneLeagueGlobals.ACTIVITY_GENERATING_SIDECRANES, None, len(CraneLeagueGlobals.SIDE_CRANE_POSHPR)
+                )
                 for _ in CraneLeagueGlobals.SIDE_CRANE_POSHPR:
                     crane = DistributedCashbotBossSideCraneAI.DistributedCashbotBossSideCraneAI(self.air, self, ind)
                     crane.generateWithRequired(self.zoneId)
@@ -315,7 +591,11 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
             # Generate the heavy cranes if wanted
             if self.ruleset.WANT_HEAVY_CRANES:
-                self.debug(content="Generating %s heavy cranes" % len(CraneLeagueGlobals.HEAVY_CRANE_POSHPR))
+                self.activity.log(
+                    CraneLeagueGlobals.ACTIVITY_GENERATING_HEAVY_CRANES,
+                    None,
+                    len(CraneLeagueGlobals.HEAVY_CRANE_POSHPR),
+                )
                 for _ in CraneLeagueGlobals.HEAVY_CRANE_POSHPR:
                     crane = DistributedCashbotBossHeavyCraneAI.DistributedCashbotBossHeavyCraneAI(self.air, self, ind)
                     crane.generateWithRequired(self.zoneId)
@@ -328,12 +608,26 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             for index in range(min(self.ruleset.SAFES_TO_SPAWN, len(CraneLeagueGlobals.SAFE_POSHPR))):
                 safe = DistributedCashbotBossSafeAI.DistributedCashbotBossSafeAI(self.air, self, index)
                 safe.generateWithRequired(self.zoneId)
+                safe.updateObstacle()
                 self.safes.append(safe)
 
-        if not self.goons:
-            # We don't actually make the goons right now, but we make
-            # a place to hold them.
+        if self.goons is None:
             self.goons = []
+            self.freeGoons.clear()
+
+        # Make all of the goons and treasures the round could want now,
+        # parked, so they only need to be sent out when the time comes.
+        for _ in range(len(self.goons), int(math.ceil(self.getMostGoons()))):
+            self.recycleGoon(self.__makeNewGoon())
+        for _ in range(
+            len(self.treasures) + len(self.grabbingTreasures) + len(self.recycledTreasures),
+            int(math.ceil(self.ruleset.MAX_TREASURE_AMOUNT)),
+        ):
+            treasure = DistributedCashbotBossTreasureAI.DistributedCashbotBossTreasureAI(
+                self.air, self, None, 0, 0, 0, 0, 0
+            )
+            treasure.generateWithRequired(self.zoneId)
+            self.recycledTreasures.append(treasure)
 
     def __resetBattleThreeObjects(self):
         if self.cranes is not None:
@@ -344,25 +638,66 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             for safe in self.safes:
                 safe.request("Initial")
 
-    def __deleteBattleThreeObjects(self):
+    def __parkBattleThreeObjects(self):
+        # Puts the cranes, safes, goons and treasures of a pooled office
+        # back the way they were when they were first made.
         if self.cranes is not None:
             for crane in self.cranes:
+                # Through Free, so the clients let go of it too.
+                crane.request("Free")
                 crane.request("Off")
-                crane.requestDelete()
 
-            self.cranes = None
         if self.safes is not None:
             for safe in self.safes:
-                safe.request("Off")
-                safe.requestDelete()
+                safe.request("Initial")
 
-            self.safes = None
+        self.__parkGoons()
+        self.parkAllTreasures()
+
+    def __parkGoons(self):
+        # Sends all of the goons Off, without blowing them up, to wait
+        # until they're wanted again.
+        if self.goons is not None:
+            for goon in self.goons:
+                if goon.state != "Off":
+                    goon.request("Off")
+                    goon.d_setObjectState("O", 0, 0)
+
+    def __putAwayBattleThreeObjects(self):
+        # The round is over.
+        if self.keepBattleThreeObjects:
+            self.__parkBattleThreeObjects()
+        else:
+            self.__deleteBattleThreeObjects()
+
+    def __deleteGoons(self):
         if self.goons is not None:
             for goon in self.goons:
                 goon.request("Off")
+                self.obstacleGrid.remove(goon)
                 goon.requestDelete()
 
             self.goons = None
+            self.freeGoons.clear()
+
+    def __deleteBattleThreeObjects(self):
+        if self.cranes is not None:
+            for crane in self.cranes:
+                crane.request("Off")
+                crane.requestDelete()
+
+            self.cranes = None
+            self.avIdToCrane = {}
+            self.craneAvatars = {}
+            self.craneObjects = {}
+        if self.safes is not None:
+            for safe in self.safes:
+                safe.request("Off")
+                self.obstacleGrid.remove(safe)
+                safe.requestDelete()
+
+            self.safes = None
+        self.__deleteGoons()
 
     def doNextAttack(self, task):
         # Choose an attack and do it.
@@ -372,7 +707,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             self.waitForNextHelmet()
 
         # Rare chance to do a jump attack if we want it
-        if self.ruleset.WANT_CFO_JUMP_ATTACK and random.randint(0, 99) < self.ruleset.CFO_JUMP_ATTACK_CHANCE:
+        if self.ruleset.WANT_CFO_JUMP_ATTACK and self.rng.attacks.randint(0, 99) < self.ruleset.CFO_JUMP_ATTACK_CHANCE:
             self.__doAreaAttack()
             return
 
@@ -387,7 +722,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             self.toonsToAttack = self.getInvolvedToonsNotSpectating()
             # Shuffle the toons if we want random gear throws
             if self.ruleset.RANDOM_GEAR_THROW_ORDER:
-                random.shuffle(self.toonsToAttack)
+                self.rng.attacks.shuffle(self.toonsToAttack)
             # remove people who are dead or gone
             for toonId in self.toonsToAttack[:]:
                 toon = self.air.doId2do.get(toonId)
@@ -430,6 +765,17 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
         self.waitForNextAttack(delayTime)
 
+    def d_setAttackCode(self, attackCode, avId=0):
+        self.eventBatcher.sendUpdate("setAttackCode", [attackCode, avId])
+
+    def sendUpdate(self, fieldName, args=()):
+        # Anything we send right away has to go after the batched
+        # updates from earlier in the frame, or the clients would see
+        # them out of order.
+        if self.eventBatcher.pending:
+            self.eventBatcher.flush()
+        DistributedBossCogAI.DistributedBossCogAI.sendUpdate(self, fieldName, args)
+
     def getDamageMultiplier(self, allowFloat=False):
         mult = self.progressValue(1, self.ruleset.CFO_ATTACKS_MULTIPLIER + (0 if allowFloat else 1))
         if not allowFloat:
@@ -449,7 +795,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         isStunned = self.attackCode == TTGlobalsBosses.BossCogDizzy
         # Are we setting to swat?
         if isStunned and attackCode == TTGlobalsBosses.BossCogElectricFence:
-            self.d_updateUnstun(avId)
+            self.scores.addScore(avId, self.ruleset.POINTS_PENALTY_UNSTUN, CraneLeagueGlobals.SCORE_PENALTY_UNSTUN)
 
         self.d_showZapToon(avId, x, y, z, h, p, r, attackCode, timestamp)
 
@@ -463,7 +809,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         # Clamp the damage to make sure it at least does 1
         damage = max(int(damage), 1)
 
-        self.debug(doId=avId, content="Damaged for %s" % damage)
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_TOON_DAMAGED, avId, damage)
 
         self.damageToon(toon, damage)
         currState = self.getCurrentOrNextState()
@@ -481,34 +827,31 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
     def makeTreasure(self, goon):
         # Places a treasure, as pooped out by the given goon.  We
-        # place the treasure at the goon's current position, or at
-        # least at the beginning of its current path.  Actually, we
-        # ignore Z, and always place the treasure at Z == 0,
-        # presumably the ground.
+        # place the treasure at the goon's current position, even if
+        # he's partway along his current path.  Actually, we ignore
+        # Z, and always place the treasure at Z == 0, presumably the
+        # ground.
 
         if self.state != "BattleThree":
             return
 
         # Too many treasures on the field?
         if len(self.treasures) >= self.ruleset.MAX_TREASURE_AMOUNT:
-            self.debug(
-                doId=goon.doId, content="Not spawning treasure, already %s present" % self.ruleset.MAX_TREASURE_AMOUNT
-            )
+            self.activity.log(CraneLeagueGlobals.ACTIVITY_TREASURE_LIMIT, goon.doId, self.ruleset.MAX_TREASURE_AMOUNT)
             return
 
         # Drop chance?
         if self.ruleset.GOON_TREASURE_DROP_CHANCE < 1.0:
-            r = random.random()
-            self.debug(
-                doId=goon.doId,
-                content="Rolling for treasure drop, need > %s, got %s" % (self.ruleset.GOON_TREASURE_DROP_CHANCE, r),
+            r = self.rng.treasure.random()
+            self.activity.log(
+                CraneLeagueGlobals.ACTIVITY_TREASURE_ROLL, goon.doId, self.ruleset.GOON_TREASURE_DROP_CHANCE, r
             )
             if r > self.ruleset.GOON_TREASURE_DROP_CHANCE:
                 return
 
         # The BossCog acts like a treasure planner as far as the
         # treasure is concerned.
-        pos = goon.getPos(self)
+        pos = self.getRelativePoint(self.scene, Point3(*self.goonScheduler.getPos(goon)))
 
         # The treasure pops out and lands somewhere nearby.  Let's
         # start by choosing a point on a ring around the boss, based
@@ -520,7 +863,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
         # Then perterb that point by a distance in some random
         # direction.
-        angle = random.uniform(0.0, 2.0 * math.pi)
+        angle = self.rng.treasure.uniform(0.0, 2.0 * math.pi)
         radius = 10
         dx = radius * math.cos(angle)
         dy = radius * math.sin(angle)
@@ -537,11 +880,11 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         treasureHealIndex = int(clamp(treasureHealIndex, 0, len(self.ruleset.GOON_HEALS) - 1))
         healAmount = self.ruleset.GOON_HEALS[treasureHealIndex]
         availStyles = self.ruleset.TREASURE_STYLES[treasureHealIndex]
-        style = random.choice(availStyles)
+        style = self.rng.treasure.choice(availStyles)
 
         if self.recycledTreasures:
             # Reuse a previous treasure object
-            treasure = self.recycledTreasures.pop(0)
+            treasure = self.recycledTreasures.popleft()
             treasure.d_setGrab(0)
             treasure.b_setGoonId(goon.doId)
             treasure.b_setStyle(style)
@@ -569,13 +912,12 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
                 self.grabbingTreasures[treasureId] = treasure
                 # Wait a few seconds for the animation to play, then
                 # recycle the treasure.
-                taskMgr.doMethodLater(
-                    5, self.__recycleTreasure, treasure.uniqueName("recycleTreasure"), extraArgs=[treasure]
-                )
+                self.recycleTimers[treasureId] = self.timers.schedule(5, self.__recycleTreasure, treasure)
             else:
                 treasure.d_setReject()
 
     def __recycleTreasure(self, treasure):
+        self.recycleTimers.pop(treasure.doId, None)
         if treasure.doId in self.grabbingTreasures:
             del self.grabbingTreasures[treasure.doId]
             self.recycledTreasures.append(treasure)
@@ -586,23 +928,37 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
         self.treasures = {}
         for treasure in list(self.grabbingTreasures.values()):
-            taskMgr.remove(treasure.uniqueName("recycleTreasure"))
+            self.timers.cancel(self.recycleTimers.pop(treasure.doId, None))
             treasure.requestDelete()
 
         self.grabbingTreasures = {}
         for treasure in self.recycledTreasures:
             treasure.requestDelete()
 
-        self.recycledTreasures = []
+        self.recycledTreasures.clear()
+
+    def parkAllTreasures(self):
+        # Takes back all of the treasures, for the next round.
+        for treasure in list(self.treasures.values()) + list(self.grabbingTreasures.values()):
+            self.timers.cancel(self.recycleTimers.pop(treasure.doId, None))
+            treasure.b_setGoonId(0)
+            self.recycledTreasures.append(treasure)
+
+        self.treasures = {}
+        self.grabbingTreasures = {}
 
     def getMaxGoons(self):
         return self.progressValue(self.ruleset.MAX_GOON_AMOUNT_START, self.ruleset.MAX_GOON_AMOUNT_END)
 
+    def getMostGoons(self):
+        # The most goons the round will ever want out at once.
+        return max(self.ruleset.MAX_GOON_AMOUNT_START, self.ruleset.MAX_GOON_AMOUNT_END)
+
     def makeGoon(self, side=None):
         self.goonMovementTime = globalClock.getFrameTime()
         if side is None:
             if not self.wantOpeningModifications:
-                side = random.choice(["EmergeA", "EmergeB"])
+                side = self.rng.goons.choice(["EmergeA", "EmergeB"])
             else:
                 for t in self.involvedToons:
                     avId = t
@@ -610,16 +966,17 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
                 pos = toon.getPos()[1]
                 side = "EmergeB" if pos < -315 else "EmergeA"
 
-        # First, look to see if we have a goon we can recycle.
-        goon = self.__chooseOldGoon()
-        if goon is None:
-            # No, no old goon; is there room for a new one?
-            if len(self.goons) >= self.getMaxGoons():
-                return
-            # make a new one.
-            goon = DistributedCashbotBossGoonAI.DistributedCashbotBossGoonAI(self.air, self)
-            goon.generateWithRequired(self.zoneId)
-            self.goons.append(goon)
+        # Is there room for another goon?
+        if len(self.goons) - len(self.freeGoons) >= self.getMaxGoons():
+            return
+
+        # Send out one of the goons waiting for us, or if there aren't
+        # any (the rules changed mid-round), make a new one.
+        if self.freeGoons:
+            goon = self.freeGoons.popleft()
+            goon.isParked = False
+        else:
+            goon = self.__makeNewGoon()
 
         # Attributes for desperation mode goons
         goon_stun_time = 4
@@ -652,33 +1009,137 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         )
         goon.request(side)
 
-        self.debug(
-            doId=goon.doId,
-            content="Spawning on %s, stun=%.2f, vel=%.2f, hfov=%.2f, attRadius=%.2f, str=%s, scale=%.2f"
-            % (side, goon_stun_time, goon_velocity, goon_hfov, goon_attack_radius, goon_strength, goon_scale),
-        )
+        if self.activity.wants(CraneLeagueGlobals.ACTIVITY_GOON_SPAWNED):
+            self.activity.log(
+                CraneLeagueGlobals.ACTIVITY_GOON_SPAWNED,
+                goon.doId,
+                CraneLeagueGlobals.getActivityStateIndex(side),
+                goon_stun_time,
+                goon_velocity,
+                goon_hfov,
+                goon_attack_radius,
+                goon_strength,
+                goon_scale,
+            )
 
-    def __chooseOldGoon(self):
-        # Walks through the list of goons managed by the boss to see
-        # if any of them have recently been deleted and can be
-        # recycled.
+    def __makeNewGoon(self):
+        # Makes another goon, which starts out Off.
+        goon = DistributedCashbotBossGoonAI.DistributedCashbotBossGoonAI(self.air, self)
+        goon.generateWithRequired(self.zoneId)
+        self.goons.append(goon)
+        return goon
+
+    def recycleGoon(self, goon):
+        # Called by a goon when it goes Off, to be sent out again later.
+        if not goon.isParked:
+            goon.isParked = True
+            self.freeGoons.append(goon)
+
+    def unparkGoon(self, goon):
+        # Called by a goon that was waiting in freeGoons when it leaves
+        # Off some other way than through makeGoon().  That shouldn't
+        # happen, so it's fine that this isn't O(1).
+        goon.isParked = False
+        self.freeGoons.remove(goon)
+
+    def requestGoonDirection(self, goon):
+        # Called by a goon that needs to choose a new direction to
+        # walk in.  Rather than have each goon cast its own feelers,
+        # we collect all of the goons that finish a leg in the same
+        # frame and plan them together at the end of it.
+        if not self.goonsToPlan:
+            taskMgr.add(self.__planGoons, self.uniqueName("planGoons"), sort=1)
+        self.goonsToPlan[goon.doId] = goon
+
+    def cancelGoonDirection(self, goon):
+        self.goonsToPlan.pop(goon.doId, None)
+
+    def __planGoons(self, task):
+        goons = list(self.goonsToPlan.values())
+        self.goonsToPlan = {}
+        if not goons:
+            return task.done
+
+        if numpy is not None:
+            directions = self.chooseGoonDirections(goons)
+        else:
+            directions = [goon.chooseDirection() for goon in goons]
+
+        for goon, direction in zip(goons, directions):
+            goon.setNextDirection(direction)
+        return task.done
+
+    def chooseGoonDirections(self, goons):
+        # The same choice DistributedCashbotBossGoonAI.chooseDirection()
+        # makes for one goon, made for a whole list of goons at once
+        # with numpy: we cast every feeler of every goon against every
+        # obstacle in one pass, weigh the clear distances by the goon
+        # directionTable, and draw a heading for each goon from the
+        # result.  Returns a list of (heading, dist) or None.
+        table = DistributedCashbotBossGoonAI.DistributedCashbotBossGoonAI.directionTable
+        headings = numpy.array([heading for heading, _weight in table])
+        weights = numpy.array([weight for _heading, weight in table], dtype=float)
+
+        feelerStart = goons[0].feelerStart
+        feelerLength = goons[0].feelerLength
+        casters = []
+        for goon in goons:
+            pos = goon.getPos()
+            casters.append((goon, pos[0], pos[1], pos[2], goon.getH()))
+
+        dists = self.obstacleGrid.castFeelersBatch(casters, headings, feelerStart, feelerLength)
+
+        # A clear path is as long as the feeler, and a path blocked
+        # right in front of the goon is no good at all.
+        dists = numpy.where(numpy.isnan(dists), feelerLength, dists)
+        dists = numpy.where(dists < 1.2, 0.0, dists)
+        scores = numpy.cumsum(dists * weights, axis=1)
+
+        directions = []
+        for i, goon in enumerate(goons):
+            netScore = scores[i, -1]
+            if netScore == 0:
+                # If no paths were any good, bail.
+                goon.notify.info("Could not find a path for %s" % goon.doId)
+                directions.append(None)
+                continue
 
-        for goon in self.goons:
-            if goon.state == "Off":
-                return goon
-        return None
+            # Choose a random direction from the table, with a random
+            # distribution weighted by score.
+            s = self.rng.goons.uniform(0, netScore)
+            reached = scores[i] >= s
+            if not reached.any():
+                goon.notify.warning("Fell off end of weighted table.")
+                directions.append((0, goon.legLength))
+                continue
+
+            index = int(numpy.argmax(reached))
+            directions.append((int(headings[index]), float(dists[i, index])))
+
+        return directions
+
+    def getGoonPositions(self):
+        # Returns a dictionary of doId -> (x, y, z) for all of the
+        # goons in the room, where they are right now, even if they're
+        # partway along a leg of their walk.
+        positions = {}
+        if self.goons:
+            for goon in self.goons:
+                if goon.state != "Off":
+                    positions[goon.doId] = tuple(goon.getPos())
+        positions.update(self.goonScheduler.getPositions())
+        return positions
 
     def waitForNextGoon(self, delayTime):
         currState = self.getCurrentOrNextState()
         if currState == "BattleThree":
-            taskName = self.uniqueName("NextGoon")
-            taskMgr.remove(taskName)
-            taskMgr.doMethodLater(delayTime, self.doNextGoon, taskName)
-            self.debug(content="Spawning goon in %.2fs" % delayTime)
+            self.timers.cancel(self.nextGoonTimer)
+            self.nextGoonTimer = self.timers.schedule(delayTime, self.doNextGoon, None)
+            self.activity.log(CraneLeagueGlobals.ACTIVITY_NEXT_GOON, None, delayTime)
 
     def stopGoons(self):
-        taskName = self.uniqueName("NextGoon")
-        taskMgr.remove(taskName)
+        self.timers.cancel(self.nextGoonTimer)
+        self.nextGoonTimer = None
 
     def doNextGoon(self, task):
         if self.attackCode != TTGlobalsBosses.BossCogDizzy:
@@ -695,7 +1156,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             taskMgr.remove(taskName)
             delayTime = self.progressValue(45, 15)
             taskMgr.doMethodLater(delayTime, self.__donHelmet, taskName)
-            self.debug(content="Next auto-helmet in %s seconds" % delayTime)
+            self.activity.log(CraneLeagueGlobals.ACTIVITY_NEXT_HELMET, None, delayTime)
             self.waitingForHelmet = 1
 
     def setObjectID(self, objId):
@@ -765,12 +1226,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         # Resets all of the goons.
         # Called only by the magic word "~bossBattle goons"
         if self.state == "BattleThree":
-            if self.goons is not None:
-                for goon in self.goons:
-                    goon.request("Off")
-                    goon.requestDelete()
-
-                self.goons = None
+            self.__deleteGoons()
             self.__makeBattleThreeObjects()
 
     # Given a crane, the damage dealt from the crane, and the impact of the hit, should we stun the CFO?
@@ -811,17 +1267,18 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
 
         # Award bonus points for hits with maximum impact
         if impact == 1.0:
-            self.d_updateMaxImpactHits(avId)
-        self.d_updateDamageDealt(avId, damage)
+            self.scores.addScore(avId, self.ruleset.POINTS_IMPACT, CraneLeagueGlobals.SCORE_IMPACT)
+        self.scores.addScore(avId, damage, CraneLeagueGlobals.SCORE_DAMAGE)
 
-        comboTracker = self.comboTrackers[avId]
-        comboTracker.incrementCombo((comboTracker.combo + 1.0) / 10.0 * damage)
+        comboTracker = self.comboTrackers.get(avId)
+        if comboTracker:
+            comboTracker.incrementCombo((comboTracker.combo + 1.0) / 10.0 * damage)
 
-        self.debug(doId=avId, content="Damaged for %s with impact: %.2f" % (damage, impact))
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_BOSS_DAMAGED, avId, damage, impact)
 
         # The CFO has been defeated, proceed to Victory state
         if self.bossDamage >= self.ruleset.CFO_MAX_HP:
-            self.d_killingBlowDealt(avId)
+            self.scores.addScore(avId, self.ruleset.POINTS_KILLING_BLOW, CraneLeagueGlobals.SCORE_KILLING_BLOW)
             self.toonsWon = True
             return
 
@@ -839,7 +1296,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             # A particularly good hit (when he's not already
             # dizzy) will make the boss dizzy for a little while.
             self.b_setAttackCode(TTGlobalsBosses.BossCogDizzy)
-            self.d_updateStunCount(avId, craneId)
+            self.scores.addScore(avId, crane.getPointsForStun(), CraneLeagueGlobals.SCORE_STUN)
         else:
             if self.ruleset.CFO_FLINCHES_ON_HIT:
                 self.b_setAttackCode(TTGlobalsBosses.BossCogNoAttack)
@@ -859,29 +1316,41 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.bossDamage = bossDamage
 
     def d_setBossDamage(self, bossDamage):
-        self.sendUpdate("setBossDamage", [bossDamage])
-
-    def d_killingBlowDealt(self, avId):
-        self.sendUpdate("killingBlowDealt", [avId])
-
-    def d_updateDamageDealt(self, avId, damageDealt):
-        self.sendUpdate("updateDamageDealt", [avId, damageDealt])
-
-    def d_updateStunCount(self, avId, craneId):
-        self.sendUpdate("updateStunCount", [avId, craneId])
-
-    def d_updateGoonsStomped(self, avId):
-        self.sendUpdate("updateGoonsStomped", [avId])
-
-    # call with 10 when we take a safe off, -20 when we put a safe on
-    def d_updateSafePoints(self, avId, amount):
-        self.sendUpdate("updateSafePoints", [avId, amount])
-
-    def d_updateMaxImpactHits(self, avId):
-        self.sendUpdate("updateMaxImpactHits", [avId])
-
-    def d_updateLowImpactHits(self, avId):
-        self.sendUpdate("updateLowImpactHits", [avId])
+        self.eventBatcher.sendUpdate("setBossDamage", [bossDamage])
+        self.sendBattleSnapshotLater()
+
+    def d_updateScore(self, avId, amount, reason, extra=0):
+        self.eventBatcher.sendUpdate("updateScore", [avId, amount, reason, extra])
+        self.sendBattleSnapshotLater()
+
+    def sendBattleSnapshotLater(self):
+        # The damage, score and combo updates are all changes, which a
+        # toon who joins (or comes to spectate) partway through would
+        # have missed.  So when any of them changes we also send where
+        # things stand, in the one ram field the state server hands to
+        # anyone arriving later.  However many changes there are in a
+        # short while (a chain of stuns, say), that only needs to go
+        # out once; the clients already here have heard them all.
+        if self.battleSnapshotTimer is None or not self.battleSnapshotTimer.isPending():
+            self.battleSnapshotTimer = self.timers.schedule(self.battleSnapshotDelay, self.__sendBattleSnapshot)
+
+    def __sendBattleSnapshot(self):
+        self.battleSnapshotTimer = None
+        toons = []
+        for avId, points in self.scores.getStandings():
+            damage, stuns, stomps = self.scores.getStats(avId)
+            comboTracker = self.comboTrackers.get(avId)
+            combo = comboTracker.combo if comboTracker else 0
+            toons.append([avId, points, damage, stuns, stomps, min(combo, 255)])
+        self.d_setBattleSnapshot(self.bossDamage, toons)
+
+    def d_setBattleSnapshot(self, bossDamage, toons):
+        # Not batched, so this goes out right away, after the batched
+        # updates it sums up.
+        self.sendUpdate("setBattleSnapshot", [bossDamage, toons])
+
+    def d_setStandings(self, avIds):
+        self.eventBatcher.sendUpdate("setStandings", [avIds])
 
     def d_setCraneSpawn(self, want, spawn, toonId):
         self.sendUpdate("setCraneSpawn", [want, spawn, toonId])
@@ -908,15 +1377,22 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
     def setupSpawnpoints(self):
         self.toonSpawnpointOrder = list(range(8))
         if self.ruleset.RANDOM_SPAWN_POSITIONS:
-            random.shuffle(self.toonSpawnpointOrder)
+            self.rng.spawns.shuffle(self.toonSpawnpointOrder)
         self.d_setToonSpawnpointOrder()
 
     def waitForNextAttack(self, delayTime):
         DistributedBossCogAI.DistributedBossCogAI.waitForNextAttack(self, delayTime)
-        self.debug(content="Next attack in %.2fs" % delayTime)
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_NEXT_ATTACK, None, delayTime)
 
     ##### BattleThree state #####
     def enterBattleThree(self):
+        # Start all of the random streams over from this round's seed,
+        # and write it down so the round can be played again.
+        seed = self.rng.reseed(self.seedOverride)
+        self.notify.info("%s starting crane round with seed %s" % (self.doId, seed))
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_ROUND_SEED, None, seed)
+        self.startRecording()
+
         # Force unstun the CFO if he was stunned in a previous Battle Three round
         if self.attackCode in (TTGlobalsBosses.BossCogDizzy, TTGlobalsBosses.BossCogDizzyNow):
             self.b_setAttackCode(TTGlobalsBosses.BossCogNoAttack)
@@ -924,6 +1400,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         # It's important to set our position correctly even on the AI,
         # so the goons can orient to the center of the room.
         self.setPosHpr(*GeneralCFOGlobals.CashbotBossBattleThreePosHpr)
+        self.placeWalls()
 
         # Just in case we didn't pass through PrepareBattleThree state.
         self.__makeBattleThreeObjects()
@@ -936,7 +1413,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.toonsToAttack = self.getInvolvedToonsNotSpectating()
 
         if self.ruleset.RANDOM_GEAR_THROW_ORDER:
-            random.shuffle(self.toonsToAttack)
+            self.rng.attacks.shuffle(self.toonsToAttack)
 
         self.b_setBossDamage(0)
         self.battleThreeStart = globalClock.getFrameTime()
@@ -947,9 +1424,8 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         # beginning.
         self.makeGoon(side="EmergeA")
         self.makeGoon(side="EmergeB")
-        taskName = self.uniqueName("NextGoon")
-        taskMgr.remove(taskName)
-        taskMgr.doMethodLater(2, self.__doInitialGoons, taskName)
+        self.timers.cancel(self.nextGoonTimer)
+        self.nextGoonTimer = self.timers.schedule(2, self.__doInitialGoons, None)
         self.battleThreeTimeStarted = globalClock.getFrameTime()
 
         self.oldMaxLaffs = {}
@@ -958,31 +1434,38 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         taskMgr.remove(self.uniqueName("failedCraneRound"))
         self.cancelReviveTasks()
 
-        for comboTracker in list(self.comboTrackers.values()):
-            comboTracker.cleanup()
+        self.__cleanupComboTrackers()
+        self.scores.cleanup()
 
-        # heal all toons and setup a combo tracker for them
+        # heal all toons and start tracking their combos and scores
         for avId in self.getInvolvedToonsNotSpectating():
             if avId in self.air.doId2do:
                 self.comboTrackers[avId] = CashbotBossComboTracker(self, avId)
+                self.scores.addToon(avId)
                 av = self.air.doId2do[avId]
 
                 if self.ruleset.FORCE_MAX_LAFF:
                     self.oldMaxLaffs[avId] = av.getMaxHp()
                     av.b_setMaxHp(self.ruleset.FORCE_MAX_LAFF_AMOUNT)
-                    self.debug(content="Forcing max laff to %s" % self.ruleset.FORCE_MAX_LAFF_AMOUNT)
+                    self.activity.log(
+                        CraneLeagueGlobals.ACTIVITY_FORCE_MAX_LAFF, None, self.ruleset.FORCE_MAX_LAFF_AMOUNT
+                    )
 
                 if self.ruleset.HEAL_TOONS_ON_START:
                     av.b_setHp(av.getMaxHp())
-                    self.debug(content="Healing all toons")
+                    self.activity.log(CraneLeagueGlobals.ACTIVITY_HEAL_TOONS, None)
 
         self.toonsWon = False
+        self.resultRecorded = False
         taskMgr.remove(self.uniqueName("times-up-task"))
         taskMgr.remove(self.uniqueName("post-times-up-task"))
         # If timer mode is active, end the crane round later
         if self.ruleset.TIMER_MODE:
             taskMgr.doMethodLater(self.ruleset.TIMER_MODE_TIME_LIMIT, self.__timesUp, self.uniqueName("times-up-task"))
-            self.debug(content="Time will run out in %ss" % self.ruleset.TIMER_MODE_TIME_LIMIT)
+            self.activity.log(CraneLeagueGlobals.ACTIVITY_TIME_LIMIT, None, self.ruleset.TIMER_MODE_TIME_LIMIT)
+
+        # In case everyone is already spectating.
+        self.hibernator.update()
 
     # Called when we actually run out of time, simply tell the clients we ran out of time then handle it later
     def __timesUp(self, task=None):
@@ -995,6 +1478,7 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.sendUpdate("timesUp", [])
 
         self.toonsWon = False
+        self.recordResult()
         taskMgr.remove(self.uniqueName("times-up-task"))
         taskMgr.doMethodLater(10.0, self.__handlePostTimesUp, self.uniqueName("post-times-up-task"))
 
@@ -1017,11 +1501,18 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
             self.waitForNextGoon(10)
 
     def exitBattleThree(self):
+        # Put everything back the way it was before we clean it up.
+        self.hibernator.update()
         helmetName = self.uniqueName("helmet")
         taskMgr.remove(helmetName)
         if self.newState != "Victory":
-            self.__deleteBattleThreeObjects()
-        self.deleteAllTreasures()
+            # The recording ends with the round, before the teardown.
+            self.stopRecording()
+            self.__putAwayBattleThreeObjects()
+        if self.keepBattleThreeObjects:
+            self.parkAllTreasures()
+        else:
+            self.deleteAllTreasures()
         self.stopAttacks()
         self.stopGoons()
         self.stopHelmets()
@@ -1029,6 +1520,9 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         self.cancelReviveTasks()
         taskMgr.remove(self.uniqueName("times-up-task"))
         taskMgr.remove(self.uniqueName("post-times-up-task"))
+        taskMgr.remove(self.uniqueName("planGoons"))
+        self.goonsToPlan = {}
+        self.goonScheduler.cleanup()
 
     ##### Victory state #####
     def enterVictory(self):
@@ -1044,32 +1538,81 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         craneTime = globalClock.getFrameTime()
         actualTime = craneTime - self.battleThreeTimeStarted
         timeToSend = 0.0 if self.ruleset.TIMER_MODE and not self.toonsWon else actualTime
-        self.debug(content="Crane round over in %ss" % timeToSend)
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_ROUND_OVER, None, timeToSend)
         self.d_updateTimer(timeToSend)
+        self.recordResult()
 
         self.barrier = self.beginBarrier("Victory", self.involvedToons, 30, self.__doneVictory)
 
     def d_updateTimer(self, time):
         self.sendUpdate("updateTimer", [time])
 
-    def __doneVictory(self, avIds):
+    def d_setTimerPaused(self, paused):
+        # Tells the clients to stop (or restart) their round timers,
+        # which otherwise run on their own clocks, at the game time
+        # we've reached.  See CashbotBossHibernator.
+        elapsed = max(0.0, globalClock.getFrameTime() - self.battleThreeTimeStarted)
+        self.sendUpdate("setTimerPaused", [paused, elapsed])
+
+    def calculateHeat(self):
+        return CraneLeagueGlobals.BASE_HEAT + sum(modifier.getHeat() for modifier in self.modifiers)
+
+    def recordResult(self):
+        # Hands the result of the crane round that just finished to the
+        # AI's result store, to be written out at the next flush.
+        if self.resultRecorded:
+            return
+        self.resultRecorded = True
+
+        toons = []
+        for avId, points in self.scores.getStandings():
+            damage, stuns, stomps = self.scores.getStats(avId)
+            toons.append((avId, damage, stuns, stomps, points))
+
+        self.air.craneLeagueResults.addResult(
+            self.rulesetFallback.__class__.__name__,
+            [modifier.asStruct() for modifier in self.modifiers],
+            self.calculateHeat(),
+            globalClock.getFrameTime() - self.battleThreeTimeStarted,
+            self.toonsWon,
+            toons,
+            time.time(),
+            self.rng.seed,
+        )
+
+    def __cleanupComboTrackers(self):
         for comboTracker in list(self.comboTrackers.values()):
             comboTracker.cleanup()
+        self.comboTrackers = {}
+
+    def __doneVictory(self, avIds):
+        self.__cleanupComboTrackers()
 
         # First, move the clients into the reward start.  They'll
         # build the reward movies immediately.
         self.b_setState("Reward")
 
     def exitVictory(self):
-        self.__deleteBattleThreeObjects()
+        self.stopRecording()
+        self.__putAwayBattleThreeObjects()
+
+    def startRecording(self):
+        # Starts writing the round down, if we keep recordings.
+        self.stopRecording()
+        if self.recordingDirectory:
+            self.recorder = CraneRoundRecorder(self, CraneRoundRecorder.makeFilename(self.recordingDirectory, self))
+            self.recorder.start()
+
+    def stopRecording(self):
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
 
     def checkNearby(self, task=None):
         # Prevent helmets, stun CFO, destroy goons
         self.stopHelmets()
         self.b_setAttackCode(TTGlobalsBosses.BossCogDizzy)
-        for goon in self.goons:
-            goon.request("Off")
-            goon.requestDelete()
+        self.__parkGoons()
 
         nearbyDistance = 22
 
@@ -1113,52 +1656,59 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         taskMgr.remove(taskName)
 
     def relocateSafes(self, farSafes, numRelocate, toonX, toonY):
-        for safe in farSafes[:numRelocate]:
-            randomDistance = 22 * random.random()
-            randomAngle = 2 * math.pi * random.random()
-            newX = toonX + randomDistance * math.cos(randomAngle)
-            newY = toonY + randomDistance * math.sin(randomAngle)
-            while not self.isLocationInBounds(newX, newY):
-                randomDistance = 22 * random.random()
-                randomAngle = 2 * math.pi * random.random()
-                newX = toonX + randomDistance * math.cos(randomAngle)
-                newY = toonY + randomDistance * math.sin(randomAngle)
-
-            safe.move(newX, newY, 0, 360 * random.random())
+        # Returns the number of spots tried for each safe moved.
+        return self.safeRelocator.relocate(farSafes[:numRelocate], toonX, toonY)
+
+    def getSafeRelocationStats(self):
+        # Returns how many safes safe rush practice has moved, and how
+        # hard it was to find places for them.
+        return self.safeRelocator.getStats()
 
     def __restartCraneRoundTask(self, task):
-        self.__deleteBattleThreeObjects()
+        self.stopRecording()
+        self.__putAwayBattleThreeObjects()
         self.b_setState("BattleThree")
 
     def __reviveToonLater(self, toon):
-        taskMgr.doMethodLater(
-            self.ruleset.REVIVE_TOONS_TIME,
-            self.__reviveToon,
-            self.uniqueName("revive-toon-" + str(toon.doId)),
-            extraArgs=[toon],
-        )
-        self.debug(doId=toon.doId, content="Reviving in %ss" % self.ruleset.REVIVE_TOONS_TIME)
+        self.timers.cancel(self.reviveTimers.get(toon.doId))
+        self.reviveTimers[toon.doId] = self.timers.schedule(self.ruleset.REVIVE_TOONS_TIME, self.__reviveToon, toon)
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_REVIVING, toon.doId, self.ruleset.REVIVE_TOONS_TIME)
 
     def __reviveToon(self, toon, task=None):
+        self.reviveTimers.pop(toon.doId, None)
         if toon.getHp() > 0:
             return
 
         hpToGive = self.ruleset.REVIVE_TOONS_LAFF_PERCENTAGE * toon.getMaxHp()
         toon.b_setHp(hpToGive)
         self.sendUpdate("revivedToon", [toon.doId])
-        self.debug(doId=toon.doId, content="Revived")
+        self.activity.log(CraneLeagueGlobals.ACTIVITY_REVIVED, toon.doId)
 
     def cancelReviveTasks(self):
-        for avId in self.involvedToons:
-            taskMgr.remove(self.uniqueName("revive-toon-" + str(avId)))
+        for timer in self.reviveTimers.values():
+            self.timers.cancel(timer)
+        self.reviveTimers = {}
+
+    def getTimerStats(self):
+        # Returns the number of gameplay timers pending on our wheel,
+        # and how many are scheduled, cancelled and fired per second.
+        return self.timers.getStats()
+
+    def getHibernationStats(self):
+        # Returns whether the round is paused for want of players, and
+        # how often and how long it has been.
+        return self.hibernator.getStats()
 
     def toonDied(self, toon):
         DistributedBossCogAI.DistributedBossCogAI.toonDied(self, toon)
 
-        # Reset the toon's combo
+        # Reset the toon's combo, and take points away for going sad
         ct = self.comboTrackers.get(toon.doId)
         if ct:
             ct.resetCombo()
+        self.scores.addScore(
+            toon.doId, self.ruleset.POINTS_PENALTY_GO_SAD, CraneLeagueGlobals.SCORE_PENALTY_GO_SAD, ignoreLaff=True
+        )
 
         # If we want to revive toons, revive this toon later and don't do anything else past this point
         if self.ruleset.REVIVE_TOONS_UPON_DEATH and toon.doId in self.getInvolvedToonsNotSpectating():
@@ -1210,13 +1760,5 @@ class DistributedCashbotBossAI(DistributedBossCogAI.DistributedBossCogAI, FSM.FS
         return True
 
     def d_updateCombo(self, avId, comboLength):
-        self.sendUpdate("updateCombo", [avId, comboLength])
-
-    def d_awardCombo(self, avId, comboLength, amount):
-        self.sendUpdate("awardCombo", [avId, comboLength, amount])
-
-    def d_updateGoonKilledBySafe(self, avId):
-        self.sendUpdate("goonKilledBySafe", [avId])
-
-    def d_updateUnstun(self, avId):
-        self.sendUpdate("updateUnstun", [avId])
+        self.eventBatcher.sendUpdate("updateCombo", [avId, comboLength])
+        self.sendBattleSnapshotLater()
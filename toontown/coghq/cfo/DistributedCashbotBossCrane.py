@@ -30,6 +30,7 @@ from panda3d.otp import NametagGlobals
 from panda3d.physics import ActorNode, PhysicsCollisionHandler
 
 from toontown.coghq.cfo import CraneLeagueGlobals, DistributedCashbotBossGoon, GeneralCFOGlobals
+from toontown.coghq.cfo.CashbotBossCableSync import CashbotBossCableSync
 from toontown.toonbase import TTLocalizer
 import random
 
@@ -120,7 +121,11 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
         self.armSmoother.setSmoothMode(SmoothMover.SMOn)
         self.linkSmoothers = []
         self.smoothStarted = 0
-        self.__broadcastPeriod = 0.05
+        self.cableSync = CashbotBossCableSync()
+
+        # The local time of the last cable position we were sent, so
+        # we can tell when the sender went quiet for a while.
+        self.lastCableSample = None
 
         # Since the cable might not calculate its bounding volume
         # correctly, let's say that anything that passes the outer
@@ -146,13 +151,22 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
 
         self.fadeTrack = None
 
-        self.setBroadcastStateChanges(True)
-        self.accept(self.getStateChangeEvent(), self._doDebug)
+    def updateStateDebug(self):
+        # As DistributedCashbotBossObject.updateStateDebug().
+        wantDebug = self.boss.isActivityEnabled(CraneLeagueGlobals.ACTIVITY_CRANE_STATES)
+        self.setBroadcastStateChanges(wantDebug)
+        if wantDebug:
+            self.accept(self.getStateChangeEvent(), self._doDebug)
+        else:
+            self.ignore(self.getStateChangeEvent())
 
     def _doDebug(self, _=None):
-        self.boss.craneStatesDebug(
-            doId=self.doId, content="(Client) state change %s ---> %s" % (self.oldState, self.newState)
-        )
+        self.boss.craneStatesDebug(self.doId, "(Client) state change %s ---> %s", self.oldState, self.newState)
+
+    def getHeldObjectName(self):
+        if self.heldObject:
+            return self.heldObject.getName()
+        return "Nothing"
 
     def getName(self):
         return "NormalCrane-%s" % self.index
@@ -226,6 +240,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
         self.boss.craneArm.copyTo(self.crane)
 
         self.boss.cranes[self.index] = self
+        self.updateStateDebug()
 
     def disable(self):
         DistributedObject.DistributedObject.disable(self)
@@ -894,11 +909,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
             return
 
         if obj and obj.state != "LocalDropped" and (obj.state != "Dropped" or obj.craneId != self.doId):
-            self.boss.craneStatesDebug(
-                doId=self.doId,
-                content="Sniffed something, held obj %s"
-                % (self.heldObject.getName() if self.heldObject else "Nothing"),
-            )
+            self.boss.craneStatesDebug(self.doId, "Sniffed something, held obj %s", self.getHeldObjectName)
 
             obj.d_requestGrab()
             # See if we should do anything with this object when sniffing it
@@ -917,9 +928,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
     def grabObject(self, obj):
         # This is only called by DistributedCashbotBossObject.enterGrabbed().
         self.boss.craneStatesDebug(
-            doId=self.doId,
-            content="pre-Grabbing object %s, currently holding: %s"
-            % (obj.getName(), self.heldObject.getName() if self.heldObject else "Nothing"),
+            self.doId, "pre-Grabbing object %s, currently holding: %s", obj.getName, self.getHeldObjectName
         )
         if self.state == "Off":
             return
@@ -955,9 +964,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
             self.releaseObject()
 
         self.boss.craneStatesDebug(
-            doId=self.doId,
-            content="post-Grabbing object %s, currently holding: %s"
-            % (obj.getName(), self.heldObject.getName() if self.heldObject else "Nothing"),
+            self.doId, "post-Grabbing object %s, currently holding: %s", obj.getName, self.getHeldObjectName
         )
 
     def dropObject(self, obj):
@@ -965,9 +972,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
 
         if self.boss:
             self.boss.craneStatesDebug(
-                doId=self.doId,
-                content="pre-Dropping object %s, currently holding: %s"
-                % (obj.getName(), self.heldObject.getName() if self.heldObject else "Nothing"),
+                self.doId, "pre-Dropping object %s, currently holding: %s", obj.getName, self.getHeldObjectName
             )
         if obj.lerpInterval:
             obj.lerpInterval.finish()
@@ -995,9 +1000,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
 
         if self.boss:
             self.boss.craneStatesDebug(
-                doId=self.doId,
-                content="post-Dropping object %s, currently holding: %s"
-                % (obj.getName(), self.heldObject.getName() if self.heldObject else "Nothing"),
+                self.doId, "post-Dropping object %s, currently holding: %s", obj.getName, self.getHeldObjectName
             )
 
     def releaseObject(self):
@@ -1009,11 +1012,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
         # appropriately.  A side-effect of this call will be an
         # eventual call to dropObject() by the newly-released object.
         if self.boss:
-            self.boss.craneStatesDebug(
-                doId=self.doId,
-                content="pre-Releasing object, currently holding: %s"
-                % (self.heldObject.getName() if self.heldObject else "Nothing"),
-            )
+            self.boss.craneStatesDebug(self.doId, "pre-Releasing object, currently holding: %s", self.getHeldObjectName)
 
         if self.heldObject:
             obj = self.heldObject
@@ -1031,9 +1030,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
 
         if self.boss:
             self.boss.craneStatesDebug(
-                doId=self.doId,
-                content="post-Releasing object, currently holding: %s"
-                % (self.heldObject.getName() if self.heldObject else "Nothing"),
+                self.doId, "post-Releasing object, currently holding: %s", self.getHeldObjectName
             )
 
     def __hitTrigger(self, event):
@@ -1082,6 +1079,7 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
     def clearSmoothing(self, bogus=None):
         # Call this to invalidate all the old position reports
         # (e.g. just before popping to a new position).
+        self.lastCableSample = None
         self.armSmoother.clearPositions(1)
         for smoother in self.linkSmoothers:
             smoother.clearPositions(1)
@@ -1173,9 +1171,20 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
                 smoother.applySmoothPos(anp)
             smoother.clearPositions(1)
 
-    def setCablePos(self, changeSeq, y, h, links, timestamp):
+    def __markCablePositions(self, timestamp):
+        self.armSmoother.setTimestamp(timestamp)
+        self.armSmoother.markPosition()
+        for smoother in self.linkSmoothers:
+            smoother.setTimestamp(timestamp)
+            smoother.markPosition()
+
+    def setCablePos(self, changeSeq, y, h, magnet, offsets, timestamp):
         h -= self.armMaxH  # can't send negative numbers over an update, get real value
 
+        # The magnet comes in as is, and the links above it relative to
+        # the magnet.
+        links = CashbotBossCableSync.unpackLinks(magnet, offsets)
+
         self.changeSeq = changeSeq
         if self.smoothStarted:
             if len(links) > self.numLinks:
@@ -1183,37 +1192,50 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
                 return
             now = globalClock.getFrameTime()
             local = globalClockDelta.networkToLocalTime(timestamp, now)
+
+            # The sender stops sending while the cable is at rest.  If
+            # it's been quiet for a while, mark where we were just
+            # before this update, so the smoothers don't stretch the
+            # whole quiet spell into one slow drift.
+            if self.lastCableSample is not None and local - self.lastCableSample > 2 * self.cableSync.normalPeriod:
+                self.__markCablePositions(local - self.cableSync.normalPeriod)
+            self.lastCableSample = local
+
             self.armSmoother.setY(y)
             self.armSmoother.setH(h)
-            self.armSmoother.setTimestamp(local)
-            self.armSmoother.markPosition()
-            for linkNum in range(self.numLinks):
-                smoother = self.linkSmoothers[linkNum]
-                lp = links[linkNum]
-                smoother.setPos(*lp)
-                smoother.setTimestamp(local)
-                smoother.markPosition()
+            for linkNum, lp in enumerate(links):
+                self.linkSmoothers[linkNum].setPos(*lp)
+            self.__markCablePositions(local)
 
         else:
             self.crane.setY(y)
             self.arm.setH(h)
 
-    def d_sendCablePos(self):
-        timestamp = globalClockDelta.getFrameNetworkTime()
+    def __getCableLinks(self):
         links = []
         for linkNum in range(self.numLinks):
             an, anp, cnp = self.activeLinks[linkNum]
             p = anp.getPos()
             links.append((p[0], p[1], p[2]))
+        return links
 
+    def d_sendCablePos(self, links=None):
+        if links is None:
+            links = self.__getCableLinks()
+        timestamp = globalClockDelta.getFrameNetworkTime()
+        y = self.crane.getY()
+        h = self.arm.getH()
+        self.cableSync.markSent(globalClock.getFrameTime(), y, h, links)
+
+        magnet, offsets = CashbotBossCableSync.packLinks(links)
         self.sendUpdate(
             "setCablePos",
             [
                 self.changeSeq,
-                self.crane.getY(),
-                self.arm.getH()
-                + self.armMaxH,  # don't let this number go negative, can't send negative # over an update
-                links,
+                y,
+                h + self.armMaxH,  # don't let this number go negative, can't send negative # over an update
+                magnet,
+                offsets,
                 timestamp,
             ],
         )
@@ -1227,17 +1249,21 @@ class DistributedCashbotBossCrane(DistributedObject.DistributedObject, FSM.FSM):
 
         # Broadcast our initial position
         self.b_clearSmoothing()
+        self.cableSync.reset()
         self.d_sendCablePos()
 
         # remove any old tasks
         taskMgr.remove(taskName)
-        taskMgr.doMethodLater(self.__broadcastPeriod, self.__posHprBroadcast, taskName)
+        taskMgr.add(self.__posHprBroadcast, taskName)
 
     def __posHprBroadcast(self, task):
-        self.d_sendCablePos()
-        taskName = self.posHprBroadcastName
-        taskMgr.doMethodLater(self.__broadcastPeriod, self.__posHprBroadcast, taskName)
-        return Task.done
+        # We look at the cable every frame, but only send it when it has
+        # moved enough, and often enough, to be worth it; see
+        # CashbotBossCableSync.
+        links = self.__getCableLinks()
+        if self.cableSync.shouldSend(globalClock.getFrameTime(), self.crane.getY(), self.arm.getH(), links):
+            self.d_sendCablePos(links)
+        return Task.cont
 
     ### FSM States ###
 
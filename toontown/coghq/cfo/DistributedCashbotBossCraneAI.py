@@ -1,39 +1,47 @@
 from panda3d.core import *
 from direct.distributed import DistributedObjectAI
-from direct.fsm import FSM
 
 from toontown.coghq.cfo import CraneLeagueGlobals
+from toontown.coghq.cfo.CashbotBossStateMachine import CashbotBossStateMachine
 
 
-class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, FSM.FSM):
+class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, CashbotBossStateMachine):
 
     """This is one of four/six/eight magnet cranes in the corner of the CFO
     boss battle room."""
 
+    activityCategory = CraneLeagueGlobals.ACTIVITY_CRANE_STATES
+
     def __init__(self, air, boss, index):
         DistributedObjectAI.DistributedObjectAI.__init__(self, air)
-        FSM.FSM.__init__(self, "DistributedCashbotBossCraneAI")
+        CashbotBossStateMachine.__init__(self)
 
         self.boss = boss
         self.index = index
 
         # A collision bubble to discourage the goons from walking
         # through the control area.
-        cn = CollisionNode("controls")
-        cs = CollisionSphere(0, -6, 0, 6)
-        cn.addSolid(cs)
-        self.goonShield = NodePath(cn)
+        self.goonShield = NodePath("controls")
         self.goonShield.setPosHpr(*CraneLeagueGlobals.ALL_CRANE_POSHPR[self.index])
 
         self.avId = 0
         self.objectId = 0
 
-        self.setBroadcastStateChanges(True)
-        self.accept(self.getStateChangeEvent(), self._doDebug)
+        self.updateStateChangeHook()
+
+    def updateStateChangeHook(self):
+        # As DistributedCashbotBossObjectAI.updateStateChangeHook().
+        if self.boss.activity.isEnabled(self.activityCategory):
+            self.stateChangeHook = self._doDebug
+        else:
+            self.stateChangeHook = None
 
     def _doDebug(self, _=None):
-        self.boss.craneStatesDebug(
-            doId=self.doId, content="(Server) state change %s ---> %s" % (self.oldState, self.newState)
+        self.boss.activity.log(
+            CraneLeagueGlobals.ACTIVITY_CRANE_STATE,
+            self.doId,
+            CraneLeagueGlobals.getActivityStateIndex(self.oldState),
+            CraneLeagueGlobals.getActivityStateIndex(self.newState),
         )
 
     def getName(self):
@@ -41,7 +49,8 @@ class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, FSM
 
     def setObjectID(self, objId):
         self.objectId = objId
-        self.boss.craneStatesDebug(doId=self.doId, content="(Server) grabbing object: %s" % objId)
+        self.boss.setCraneObject(self, objId)
+        self.boss.activity.log(CraneLeagueGlobals.ACTIVITY_CRANE_GRAB, self.doId, objId)
 
     # Should we multiply any damage done from this crane?
     def getDamageMultiplier(self):
@@ -66,12 +75,15 @@ class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, FSM
             return
 
         av = self.air.doId2do[avId]
-        if av.getHp() > 0 and avId in self.boss.involvedToons and self.avId == 0:
-            # Also make sure the client isn't controlling some other
-            # crane.
-            craneId = self.__getCraneId(avId)
-            if craneId == 0:
-                self.request("Controlled", avId)
+        # Also make sure the client isn't controlling some other
+        # crane.
+        if (
+            av.getHp() > 0
+            and avId in self.boss.involvedToons
+            and self.avId == 0
+            and self.boss.getControlledCrane(avId) is None
+        ):
+            self.request("Controlled", avId)
 
     def requestFree(self):
         # The client is done controlling the crane.
@@ -83,27 +95,20 @@ class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, FSM
         if avId == self.avId:
             self.request("Free")
 
-    def __getCraneId(self, avId):
-        # Returns the craneId for the crane that the indicated avatar
-        # is controlling, or 0 if none.
-
-        if self.boss and self.boss.cranes is not None:
-            for crane in self.boss.cranes:
-                if crane.avId == avId:
-                    return crane.doId
-
-        return 0
-
     ### FSM States ###
 
     def enterOff(self):
-        self.goonShield.detachNode()
+        self.avId = 0
+        self.boss.setCraneAvatar(self, 0)
+        self.boss.obstacleGrid.remove(self)
 
     def exitOff(self):
-        self.goonShield.reparentTo(self.boss.scene)
+        center = self.goonShield.getMat().xformPoint(Point3(0, -6, 0))
+        self.boss.obstacleGrid.setSphere(self, center[0], center[1], center[2], 6)
 
     def enterControlled(self, avId):
         self.avId = avId
+        self.boss.setCraneAvatar(self, avId)
         self.d_setState("C", avId)
 
     def exitControlled(self):
@@ -115,6 +120,7 @@ class DistributedCashbotBossCraneAI(DistributedObjectAI.DistributedObjectAI, FSM
 
     def enterFree(self):
         self.avId = 0
+        self.boss.setCraneAvatar(self, 0)
         self.d_setState("F", 0)
 
     def exitFree(self):
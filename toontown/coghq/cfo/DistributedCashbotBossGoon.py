@@ -6,7 +6,7 @@ from direct.task.Task import Task
 from direct.showbase import PythonUtil
 
 from toontown.coghq import DistributedGoon
-from toontown.coghq.cfo import DistributedCashbotBossObject, GeneralCFOGlobals
+from toontown.coghq.cfo import CraneLeagueGlobals, DistributedCashbotBossObject, GeneralCFOGlobals
 from toontown.toonbase.globals.TTGlobalsRender import *
 
 
@@ -20,6 +20,8 @@ class DistributedCashbotBossGoon(
 
     notify = directNotify.newCategory("DistributedCashbotBossGoon")
 
+    activityCategory = CraneLeagueGlobals.ACTIVITY_GOON_STATES
+
     walkGrabZ = -3.6
     stunGrabZ = -2.2
 
@@ -50,9 +52,7 @@ class DistributedCashbotBossGoon(
         self.name = "goon"
 
     def _doDebug(self, _=None):
-        self.boss.goonStatesDebug(
-            doId=self.doId, content="(Client) state change %s ---> %s" % (self.oldState, self.newState)
-        )
+        self.boss.goonStatesDebug(self.doId, "(Client) state change %s ---> %s", self.oldState, self.newState)
 
     def generate(self):
         DistributedCashbotBossObject.DistributedCashbotBossObject.generate(self)
@@ -84,6 +84,7 @@ class DistributedCashbotBossGoon(
         self.wiggleFreeName = self.uniqueName("wiggleFree")
 
         self.boss.goons.append(self)
+        self.updateStateDebug()
 
         self.reparentTo(render)
 
@@ -1,25 +1,25 @@
-from direct.fsm.FSM import FSM
 from panda3d.core import *
 from direct.task.TaskManagerGlobal import *
 from direct.distributed.ClockDelta import *
 from direct.task.Task import Task
 from direct.showbase import PythonUtil
 import math
-import random
 
 from toontown.coghq import DistributedGoonAI
-from toontown.coghq.cfo import DistributedCashbotBossObjectAI
+from toontown.coghq.cfo import CraneLeagueGlobals, DistributedCashbotBossObjectAI
 from toontown.toonbase.globals import TTGlobalsMovement
 
 
 class DistributedCashbotBossGoonAI(
-    DistributedGoonAI.DistributedGoonAI, DistributedCashbotBossObjectAI.DistributedCashbotBossObjectAI, FSM
+    DistributedGoonAI.DistributedGoonAI, DistributedCashbotBossObjectAI.DistributedCashbotBossObjectAI
 ):
 
     """This is a goon that walks around in the Cashbot CFO final
     battle scene, tormenting Toons, and also providing ammo for
     defeating the boss."""
 
+    activityCategory = CraneLeagueGlobals.ACTIVITY_GOON_STATES
+
     legLength = 10
 
     # A table of likely directions for the next choice at each point.
@@ -43,48 +43,44 @@ class DistributedCashbotBossGoonAI(
         (180, 1),
     ]
 
-    offMask = BitMask32(0)
-    onMask = CollisionNode.getDefaultCollideMask()
-
     def __init__(self, air, boss):
         DistributedGoonAI.DistributedGoonAI.__init__(self, air)
         DistributedCashbotBossObjectAI.DistributedCashbotBossObjectAI.__init__(self, air, boss)
-        FSM.__init__(self, "CashbotBossGoonAI")
-
-        # A tube covering our intended path, so other goons will see
-        # and avoid us.
-        cn = CollisionNode("tubeNode")
-        self.tube = CollisionTube(0, 0, 0, 0, 0, 0, 2)
-        cn.addSolid(self.tube)
-        self.tubeNode = cn
-        self.tubeNodePath = self.attachNewNode(self.tubeNode)
-
-        # A spray of feeler wires so we can choose an empty path.
-        self.feelers = []
-        cn = CollisionNode("feelerNode")
+
+        # The length of the feelers we send out to choose an empty
+        # path; see chooseDirection().
         self.feelerLength = self.legLength * 1.5
-        feelerStart = 1
-        for heading, _weight in self.directionTable:
-            rad = deg2Rad(heading)
-            x = -math.sin(rad)
-            y = math.cos(rad)
-            seg = CollisionSegment(x * feelerStart, y * feelerStart, 0, x * self.feelerLength, y * self.feelerLength, 0)
-            cn.addSolid(seg)
-            self.feelers.append(seg)
-
-        cn.setIntoCollideMask(self.offMask)
-        self.feelerNodePath = self.attachNewNode(cn)
+        self.feelerStart = 1
+        self.feelerHeadings = [heading for heading, _weight in self.directionTable]
+
+        # Whether other goons should see and avoid us.  While we're
+        # walking, we cover our intended path; see updateObstacle().
+        # Not while we're Off, which is how we start.
+        self.isObstacle = 0
         self.isWalking = 0
-        self.cTrav = CollisionTraverser("goon")
-        self.cQueue = CollisionHandlerQueue()
-        self.cTrav.addCollider(self.feelerNodePath, self.cQueue)
+        self.announceWalk = 0
+
+        # True while we're in the boss's freeGoons, waiting to be sent
+        # out again; see DistributedCashbotBossAI.makeGoon().
+        self.isParked = False
+        self.recoverTimer = None
+        self.target = None
+        self.departureTime = None
+        self.arrivalTime = None
 
     def _doDebug(self, _=None):
-        self.boss.goonStatesDebug(
-            doId=self.doId, content="(Server) state change %s ---> %s" % (self.oldState, self.newState)
+        self.boss.activity.log(
+            CraneLeagueGlobals.ACTIVITY_GOON_STATE,
+            self.doId,
+            CraneLeagueGlobals.getActivityStateIndex(self.oldState),
+            CraneLeagueGlobals.getActivityStateIndex(self.newState),
         )
 
     def requestBattle(self, pauseTime):
+        if self.state == "Off":
+            # A late report about a goon that's since been put away.
+            return
+
         avId = self.air.getAvatarIdFromSender()
 
         # Here we ask the boss to damage the toon, instead of asking
@@ -109,9 +105,25 @@ class DistributedCashbotBossGoonAI(
         else:
             self.notify.warning("Ignoring movie type %s" % movieType)
 
-    def __chooseTarget(self, extraDelay=0):
-        # Chooses a random point to walk towards.
-        direction = self.__chooseDirection()
+    def __requestDirection(self):
+        # Asks the boss to choose our next direction along with those
+        # of any other goons looking for one this frame.  He'll call
+        # setNextDirection() before the frame is out.
+        self.boss.requestGoonDirection(self)
+
+    def setNextDirection(self, direction):
+        # Called by the boss with the direction chosen for us.
+        if self.state != "Walk":
+            return
+
+        self.__chooseTarget(direction)
+        self.__startWalk()
+        if self.announceWalk:
+            self.announceWalk = 0
+            self.d_setObjectState("W", 0, 0)
+
+    def __chooseTarget(self, direction, extraDelay=0):
+        # Chooses a point to walk towards in the indicated direction.
         if direction is None:
             # No place to go; just blow up.
             self.target = None
@@ -141,33 +153,30 @@ class DistributedCashbotBossGoonAI(
         self.d_setTarget(self.target[0], self.target[1], h, globalClockDelta.localToNetworkTime(self.arrivalTime))
         return
 
-    def __chooseDirection(self):
+    def chooseDirection(self):
         # Chooses a direction to walk in next.  We do this by
         # examining a few likely directions, and we choose the one
         # with the clearest path (e.g. the fewest safes and other
         # goons in the way), with some randomness thrown in for fun.
+        # The boss makes this same choice for many goons at once in
+        # chooseGoonDirections() when numpy is available.
+
+        # Rather than traversing the whole scene with a spray of
+        # feeler segments, we ask the boss's obstacle grid to cast
+        # them against the safes, cranes, goons and walls nearby.
+        pos = self.getPos()
+        hits = self.boss.obstacleGrid.castFeelers(
+            pos[0], pos[1], pos[2], self.getH(), self.feelerHeadings, self.feelerStart, self.feelerLength, ignore=self
+        )
 
-        # Hack to prevent self-intersection.
-        self.tubeNode.setIntoCollideMask(self.offMask)
-        self.cTrav.traverse(self.boss.scene)
-        self.tubeNode.setIntoCollideMask(self.onMask)
-
-        entries = {}
-
-        # Walk through the entries from farthest to nearest, so that
-        # nearer collisions on the same segment will override farther
-        # ones.
-        self.cQueue.sortEntries()
-
-        for i in range(self.cQueue.getNumEntries() - 1, -1, -1):
-            entry = self.cQueue.getEntry(i)
-            dist = Vec3(entry.getSurfacePoint(self)).length()
-
-            if dist < 1.2:
+        dists = []
+        for dist in hits:
+            if dist is None:
+                dist = self.feelerLength
+            elif dist < 1.2:
                 # Too close; forget it.
                 dist = 0
-
-            entries[entry.getFrom()] = dist
+            dists.append(dist)
 
         # Now get the lengths of the various paths, and accumulate a
         # score table.  Each direction gets a score based on the
@@ -177,8 +186,7 @@ class DistributedCashbotBossGoonAI(
         scoreTable = []
         for i in range(len(self.directionTable)):
             heading, weight = self.directionTable[i]
-            seg = self.feelers[i]
-            dist = entries.get(seg, self.feelerLength)
+            dist = dists[i]
 
             score = dist * weight
             netScore += score
@@ -191,74 +199,86 @@ class DistributedCashbotBossGoonAI(
 
         # And finally, choose a random direction from the table,
         # with a random distribution weighted by score.
-        s = random.uniform(0, netScore)
+        s = self.boss.rng.goons.uniform(0, netScore)
         for i in range(len(self.directionTable)):
             s -= scoreTable[i]
             if s <= 0:
                 heading, weight = self.directionTable[i]
-                seg = self.feelers[i]
-                dist = entries.get(seg, self.feelerLength)
-                return (heading, dist)
+                return (heading, dists[i])
 
         # Shouldn't be possible to fall off the end, but maybe there
         # was a roundoff error.
         self.notify.warning("Fell off end of weighted table.")
         return (0, self.legLength)
 
-    def __startWalk(self):
-        # Generate a do-later method to "walk" the goon to his target
-        # square by the specified time.  Actually, on the AI the goon
-        # just stands where he is until the time expires, but no one
-        # cares about that.
+    def __startWalk(self, arrived=None):
+        # Ask the boss to "walk" the goon to his target square by the
+        # specified time, and to call arrived() (by default,
+        # __reachedTarget()) when he gets there.  Actually, on the AI
+        # the goon just stands where he is until the time expires, but
+        # the boss can tell anyone who asks where he would be by now.
         if self.arrivalTime is None:
             return
 
+        if arrived is None:
+            arrived = self.__reachedTarget
+
         now = globalClock.getFrameTime()
         availableTime = self.arrivalTime - now
 
         if availableTime > 0:
-            # Change the tube to encapsulate our path to our target point.
-            point = self.getRelativePoint(self.boss.scene, self.target)
-            self.tube.setPointB(point)
-            self.node().resetPrevTransform()
-
-            taskMgr.doMethodLater(availableTime, self.__reachedTarget, self.uniqueName("reachedTarget"))
+            # While isWalking is set, our obstacle shape encapsulates
+            # our path to our target point.
+            self.boss.goonScheduler.startLeg(
+                self, self.getPos(), self.target, self.departureTime, self.arrivalTime, arrived
+            )
 
             self.isWalking = 1
+            self.updateObstacle()
         else:
-            self.__reachedTarget(None)
+            arrived()
         return
 
     def __stopWalk(self, pauseTime=None):
         if self.isWalking:
-            # Stop the walk do-later.
-            taskMgr.remove(self.uniqueName("reachedTarget"))
-
-            # Place us at the appropriate point along the path.
-            if pauseTime is None:
-                now = globalClock.getFrameTime()
-                t = (now - self.departureTime) / (self.arrivalTime - self.departureTime)
-            else:
-                t = pauseTime / (self.arrivalTime - self.departureTime)
-
-            t = min(t, 1.0)
-            pos = self.getPos()
-            self.setPos(pos + (self.target - pos) * t)
-
-            # The tube is now a sphere.
-            self.tube.setPointB(0, 0, 0)
+            # Place us at the appropriate point along the path, and
+            # stop the walk.
+            pos = self.boss.goonScheduler.getPos(self, pauseTime)
+            self.boss.goonScheduler.stopLeg(self)
+            self.setPos(*pos)
 
+            # Our obstacle shape now covers just where we stand.
             self.isWalking = 0
+            self.updateObstacle()
+
+    def updateObstacle(self):
+        # Other goons avoid a tube covering our intended path while
+        # we're walking, or where we stand otherwise.  It's still a
+        # tube when we're standing still, just one of no length, so
+        # that a goon that finds itself inside it is pushed clear.
+        grid = self.boss.obstacleGrid
+        if not self.isObstacle:
+            grid.remove(self)
+            return
+
+        pos = self.getPos()
+        if self.isWalking:
+            grid.setTube(self, pos[0], pos[1], self.target[0], self.target[1], pos[2], 2)
+        else:
+            grid.setTube(self, pos[0], pos[1], pos[0], pos[1], pos[2], 2)
 
-    def __reachedTarget(self, task):
+    def __reachedTarget(self):
         self.__stopWalk()
-        self.__chooseTarget()
-        self.__startWalk()
+        self.__requestDirection()
 
     def __recoverWalk(self, task):
         self.demand("Walk")
         return Task.done
 
+    def __emerged(self):
+        # We've walked clear of the door.
+        self.demand("Walk")
+
     def doFree(self, task):
         # This method is fired as a do-later when we enter WaitFree.
         DistributedCashbotBossObjectAI.DistributedCashbotBossObjectAI.doFree(self, task)
@@ -278,14 +298,16 @@ class DistributedCashbotBossGoonAI(
             return
         if avId not in self.boss.involvedToons:
             return
-        if self.state in ("Stunned", "Grabbed"):
-            # Already stunned, or just picked up by a magnet; don't
-            # stun again.
+        if self.state in ("Off", "Stunned", "Grabbed"):
+            # Put away, already stunned, or just picked up by a magnet;
+            # don't stun.
             return
 
         if self.boss.ruleset.GOONS_DIE_ON_STOMP:
             self.b_destroyGoon()
-            self.boss.d_updateGoonKilledBySafe(avId)
+            self.boss.scores.addScore(
+                avId, self.boss.ruleset.POINTS_GOON_KILLED_BY_SAFE, CraneLeagueGlobals.SCORE_GOON_KILLED_BY_SAFE
+            )
             return
 
         # Stop the goon right where he is.
@@ -295,9 +317,10 @@ class DistributedCashbotBossGoonAI(
         self.boss.makeTreasure(self)
 
         # Update stats and add track combo for points
-        self.boss.d_updateGoonsStomped(avId)
-        comboTracker = self.boss.comboTrackers[avId]
-        comboTracker.incrementCombo(math.ceil((comboTracker.combo + 1.0) / 4.0))
+        self.boss.scores.addScore(avId, self.boss.ruleset.POINTS_GOON_STOMP, CraneLeagueGlobals.SCORE_GOON_STOMP)
+        comboTracker = self.boss.comboTrackers.get(avId)
+        if comboTracker:
+            comboTracker.incrementCombo(math.ceil((comboTracker.combo + 1.0) / 4.0))
 
         DistributedGoonAI.DistributedGoonAI.requestStunned(self, pauseTime)
 
@@ -310,10 +333,12 @@ class DistributedCashbotBossGoonAI(
         if avId not in self.boss.involvedToons:
             return
 
-        self.boss.debug(doId=avId, content="Goon hit with impact=%.2f" % impact)
+        self.boss.activity.log(CraneLeagueGlobals.ACTIVITY_GOON_HIT, avId, impact)
 
         if impact <= self.getMinImpact():
-            self.boss.d_updateLowImpactHits(avId)
+            self.boss.scores.addScore(
+                avId, self.boss.ruleset.POINTS_PENALTY_SANDBAG, CraneLeagueGlobals.SCORE_PENALTY_SANDBAG
+            )
             return
 
         self.air.doId2do.get(avId)
@@ -328,6 +353,20 @@ class DistributedCashbotBossGoonAI(
             self.boss.recordHit(max(damage, 2), impact, craneId)
         self.b_destroyGoon()
 
+    def delayWalk(self, delayTime):
+        # The boss stood still for delayTime seconds (see
+        # CashbotBossHibernator), and the goon scheduler has already
+        # pushed our leg back; tell the clients when we'll arrive now.
+        if self.arrivalTime is None:
+            return
+
+        self.departureTime += delayTime
+        self.arrivalTime += delayTime
+        if self.isWalking:
+            self.d_setTarget(
+                self.target[0], self.target[1], self.getH(), globalClockDelta.localToNetworkTime(self.arrivalTime)
+            )
+
     def d_setTarget(self, x, y, h, arrivalTime):
         self.sendUpdate("setTarget", [x, y, h, arrivalTime])
 
@@ -348,12 +387,17 @@ class DistributedCashbotBossGoonAI(
     ### FSM States ###
 
     def enterOff(self):
-        self.tubeNodePath.stash()
-        self.feelerNodePath.stash()
+        self.isObstacle = 0
+        self.updateObstacle()
+        if self.oldState != "Off":
+            self.boss.recycleGoon(self)
 
     def exitOff(self):
-        self.tubeNodePath.unstash()
-        self.feelerNodePath.unstash()
+        self.isObstacle = 1
+        self.updateObstacle()
+        if self.isParked:
+            # We're being sent out by something other than makeGoon().
+            self.boss.unparkGoon(self)
 
     def enterGrabbed(self, avId, craneId):
         simbase.air.doId2do.get(craneId)
@@ -371,11 +415,13 @@ class DistributedCashbotBossGoonAI(
         self.avId = 0
         self.craneId = 0
 
-        self.__chooseTarget()
-        self.__startWalk()
-        self.d_setObjectState("W", 0, 0)
+        # We tell the clients we're walking once we know where to.
+        self.announceWalk = 1
+        self.__requestDirection()
 
     def exitWalk(self):
+        self.boss.cancelGoonDirection(self)
+        self.announceWalk = 0
         self.__stopWalk()
 
     def enterEmergeA(self):
@@ -396,14 +442,11 @@ class DistributedCashbotBossGoonAI(
 
         self.d_setTarget(self.target[0], self.target[1], h, globalClockDelta.localToNetworkTime(self.arrivalTime))
 
-        self.__startWalk()
+        self.__startWalk(self.__emerged)
         self.d_setObjectState("a", 0, 0)
 
-        taskMgr.doMethodLater(walkTime, self.__recoverWalk, self.uniqueName("recoverWalk"))
-
     def exitEmergeA(self):
         self.__stopWalk()
-        taskMgr.remove(self.uniqueName("recoverWalk"))
 
     def enterEmergeB(self):
         # The goon is emerging from door b.
@@ -423,14 +466,11 @@ class DistributedCashbotBossGoonAI(
 
         self.d_setTarget(self.target[0], self.target[1], h, globalClockDelta.localToNetworkTime(self.arrivalTime))
 
-        self.__startWalk()
+        self.__startWalk(self.__emerged)
         self.d_setObjectState("b", 0, 0)
 
-        taskMgr.doMethodLater(walkTime, self.__recoverWalk, self.uniqueName("recoverWalk"))
-
     def exitEmergeB(self):
         self.__stopWalk()
-        taskMgr.remove(self.uniqueName("recoverWalk"))
 
     def enterBattle(self):
         self.d_setObjectState("B", 0, 0)
@@ -446,15 +486,16 @@ class DistributedCashbotBossGoonAI(
 
     def enterRecovery(self):
         self.d_setObjectState("R", 0, 0)
-        taskMgr.doMethodLater(2.0, self.__recoverWalk, self.uniqueName("recoverWalk"))
+        self.recoverTimer = self.boss.timers.schedule(2.0, self.__recoverWalk, None)
 
     def exitRecovery(self):
         self.__stopWalk()
-        taskMgr.remove(self.uniqueName("recoverWalk"))
+        self.boss.timers.cancel(self.recoverTimer)
+        self.recoverTimer = None
 
     def requestWalk(self):
         avId = self.air.getAvatarIdFromSender()
         if avId == self.avId and self.state == "Stunned":
-            craneId, objectId = self.__getCraneAndObject(avId)
+            craneId, objectId = self.boss.getCraneAndObject(avId)
             if craneId != 0 and objectId == self.doId:
-                self.demand("Walk", avId, craneId)
+                self.demand("Walk")
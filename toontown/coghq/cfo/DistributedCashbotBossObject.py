@@ -22,6 +22,9 @@ class DistributedCashbotBossObject(DistributedSmoothNode.DistributedSmoothNode,
     # from SlidingFloor to Free when they stop moving.
     wantsWatchDrift = 1
 
+    # The activity log category our state changes go under, if any.
+    activityCategory = None
+
     def __init__(self, cr):
         DistributedSmoothNode.DistributedSmoothNode.__init__(self, cr)
         FSM.FSM.__init__(self, "DistributedCashbotBossObject")
@@ -60,8 +63,20 @@ class DistributedCashbotBossObject(DistributedSmoothNode.DistributedSmoothNode,
         # object to the crane.
         self.lerpInterval = None
 
-        self.setBroadcastStateChanges(True)
-        self.accept(self.getStateChangeEvent(), self._doDebug)
+    def updateStateDebug(self):
+        # We only listen for our own state changes while the activity
+        # log wants to see them.  The boss calls this when that might
+        # have changed.
+        wantDebug = (
+            self.activityCategory is not None
+            and self.boss is not None
+            and self.boss.isActivityEnabled(self.activityCategory)
+        )
+        self.setBroadcastStateChanges(wantDebug)
+        if wantDebug:
+            self.accept(self.getStateChangeEvent(), self._doDebug)
+        else:
+            self.ignore(self.getStateChangeEvent())
 
     def _doDebug(self, _=None):
         pass
@@ -264,6 +279,10 @@ class DistributedCashbotBossObject(DistributedSmoothNode.DistributedSmoothNode,
                 self.demand("SlidingFloor", avId)
         elif state == "F":
             self.demand("Free")
+        elif state == "O":
+            # Put away by the AI until it's wanted again.
+            if self.state != "Off":
+                self.demand("Off")
         else:
             self.notify.error("Invalid state from AI: %s" % state)
 
@@ -1,9 +1,10 @@
 from direct.distributed import DistributedSmoothNodeAI
-from direct.fsm import FSM
 from direct.task import Task
 
+from toontown.coghq.cfo.CashbotBossStateMachine import CashbotBossStateMachine
 
-class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNodeAI, FSM.FSM):
+
+class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNodeAI, CashbotBossStateMachine):
 
     """This is an object that can be picked up an dropped in the
     final battle scene with the Cashbot CFO.  In particular, it's a
@@ -13,9 +14,12 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
     # from SlidingFloor to Free when they stop moving.
     wantsWatchDrift = 1
 
+    # The activity log category our state changes go under, if any.
+    activityCategory = None
+
     def __init__(self, air, boss):
         DistributedSmoothNodeAI.DistributedSmoothNodeAI.__init__(self, air)
-        FSM.FSM.__init__(self, "DistributedCashbotBossObjectAI")
+        CashbotBossStateMachine.__init__(self)
 
         self.boss = boss
 
@@ -30,13 +34,50 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
         self.avId = 0
         self.craneId = 0
         self.isHelmet = False
+        self.waitFreeTimer = None
 
-        self.setBroadcastStateChanges(True)
-        self.accept(self.getStateChangeEvent(), self._doDebug)
+        self.updateStateChangeHook()
+
+    def updateStateChangeHook(self):
+        # We only hear about our own state changes while the activity
+        # log is recording them.  The boss calls this when that might
+        # have changed.
+        if self.activityCategory is not None and self.boss.activity.isEnabled(self.activityCategory):
+            self.stateChangeHook = self._doDebug
+        else:
+            self.stateChangeHook = None
 
     def _doDebug(self, _=None):
         pass
 
+    def updateObstacle(self):
+        # Tells the boss's obstacle grid what the goons should steer
+        # around now, if anything.  The grid only ever learns this
+        # from us, so it must be called whenever that might change.
+        pass
+
+    # All of our movement, whether by the AI or by the clients through
+    # the setSm* fields, goes through one of these.
+    def setPos(self, *args):
+        DistributedSmoothNodeAI.DistributedSmoothNodeAI.setPos(self, *args)
+        self.updateObstacle()
+
+    def setPosHpr(self, *args):
+        DistributedSmoothNodeAI.DistributedSmoothNodeAI.setPosHpr(self, *args)
+        self.updateObstacle()
+
+    def setX(self, *args):
+        DistributedSmoothNodeAI.DistributedSmoothNodeAI.setX(self, *args)
+        self.updateObstacle()
+
+    def setY(self, *args):
+        DistributedSmoothNodeAI.DistributedSmoothNodeAI.setY(self, *args)
+        self.updateObstacle()
+
+    def setZ(self, *args):
+        DistributedSmoothNodeAI.DistributedSmoothNodeAI.setZ(self, *args)
+        self.updateObstacle()
+
     def cleanup(self):
         self.detachNode()
         self.stopWaitFree()
@@ -49,15 +90,14 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
         # Waits a certain amount of time, then automatically
         # transitions to 'Free' state.  The amount of time to wait
         # depends on what state we started in.
-        waitFreeEvent = self.uniqueName("waitFree")
-        taskMgr.remove(waitFreeEvent)
-        taskMgr.doMethodLater(delayTime, self.doFree, waitFreeEvent)
+        self.boss.timers.cancel(self.waitFreeTimer)
+        self.waitFreeTimer = self.boss.timers.schedule(delayTime, self.doFree, None)
 
     def stopWaitFree(self):
         # Interrupts the waiting started by a previous call to
         # startWaitFree().
-        waitFreeEvent = self.uniqueName("waitFree")
-        taskMgr.remove(waitFreeEvent)
+        self.boss.timers.cancel(self.waitFreeTimer)
+        self.waitFreeTimer = None
 
     def doFree(self, task):
         # This method is fired as a do-later when we enter WaitFree.
@@ -90,7 +130,7 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
         if self.state not in ("Grabbed", "Off"):
             # Also make sure the client is controlling some crane and
             # hasn't grabbed some other object already.
-            craneId, objectId = self.__getCraneAndObject(avId)
+            craneId, objectId = self.boss.getCraneAndObject(avId)
             if craneId != 0 and objectId == 0:
                 self.demand("Grabbed", avId, craneId)
                 return
@@ -104,7 +144,7 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
         avId = self.air.getAvatarIdFromSender()
 
         if avId == self.avId and self.state == "Grabbed":
-            craneId, objectId = self.__getCraneAndObject(avId)
+            craneId, objectId = self.boss.getCraneAndObject(avId)
             if craneId != 0 and objectId == self.doId:
                 self.demand("Dropped", avId, craneId)
 
@@ -134,20 +174,6 @@ class DistributedCashbotBossObjectAI(DistributedSmoothNodeAI.DistributedSmoothNo
         if avId == self.avId:
             self.doFree(None)
 
-    def __getCraneAndObject(self, avId):
-        # Returns the pair (craneId, objectId) representing the crane
-        # that the indicated avatar is controlling, or 0 if none, and
-        # the object currently held by that crane's magnet, or 0 if
-        # none.  If the object is in Dropped state, it is not listed
-        # here.
-
-        if self.boss and self.boss.cranes is not None:
-            for crane in self.boss.cranes:
-                if crane.avId == avId:
-                    return (crane.doId, crane.objectId)
-
-        return (0, 0)
-
     def __setCraneObject(self, craneId, objectId):
         # Marks the indicated crane as having grabbed the indicated
         # object.  An objectId of 0 indicates the crane holds nothing.
@@ -16,6 +16,8 @@ class DistributedCashbotBossSafe(DistributedCashbotBossObject.DistributedCashbot
 
     notify = directNotify.newCategory("DistributedCashbotBossSafe")
 
+    activityCategory = CraneLeagueGlobals.ACTIVITY_SAFE_STATES
+
     grabPos = (0, 0, -8.2)
 
     # What happens to the crane and its cable when this object is picked up?
@@ -48,9 +50,7 @@ class DistributedCashbotBossSafe(DistributedCashbotBossObject.DistributedCashbot
         self.name = "safe"
 
     def _doDebug(self, _=None):
-        self.boss.safeStatesDebug(
-            doId=self.doId, content="(Client) state change %s ---> %s" % (self.oldState, self.newState)
-        )
+        self.boss.safeStatesDebug(self.doId, "(Client) state change %s ---> %s", self.oldState, self.newState)
 
     def announceGenerate(self):
         DistributedCashbotBossObject.DistributedCashbotBossObject.announceGenerate(self)
@@ -75,6 +75,7 @@ class DistributedCashbotBossSafe(DistributedCashbotBossObject.DistributedCashbot
             self.collisionNode.setFromCollideMask(PieBitmask)
 
         self.boss.safes[self.index] = self
+        self.updateStateDebug()
 
         self.setupPhysics("safe")
         self.resetToInitialPosition()
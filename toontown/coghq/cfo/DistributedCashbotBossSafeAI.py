@@ -20,24 +20,34 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
     # goons to push safes out of the way.
     wantsWatchDrift = 0
 
+    activityCategory = CraneLeagueGlobals.ACTIVITY_SAFE_STATES
+
     def __init__(self, air, boss, index):
         DistributedCashbotBossObjectAI.DistributedCashbotBossObjectAI.__init__(self, air, boss)
         self.index = index
 
         self.avoidHelmet = 0
 
-        # A sphere so goons will see and avoid us.
-        cn = CollisionNode("sphere")
-        cs = CollisionSphere(0, 0, 0, 6)
-        cn.addSolid(cs)
-        self.attachNewNode(cn)
         self.bonusDmg = 0
 
     def _doDebug(self, _=None):
-        self.boss.safeStatesDebug(
-            doId=self.doId, content="(Server) state change %s ---> %s" % (self.oldState, self.newState)
+        self.boss.activity.log(
+            CraneLeagueGlobals.ACTIVITY_SAFE_STATE,
+            self.doId,
+            CraneLeagueGlobals.getActivityStateIndex(self.oldState),
+            CraneLeagueGlobals.getActivityStateIndex(self.newState),
         )
 
+    def updateObstacle(self):
+        # Goons avoid a sphere around us, except while we're stashed
+        # on the boss's head.
+        if self.isStashed():
+            self.boss.obstacleGrid.remove(self)
+            return
+
+        pos = self.getPos()
+        self.boss.obstacleGrid.setSphere(self, pos[0], pos[1], pos[2], 6)
+
     def resetToInitialPosition(self):
         posHpr = CraneLeagueGlobals.SAFE_POSHPR[self.index]
         self.setPosHpr(*posHpr)
@@ -70,10 +80,12 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
             # Ignore the helmet we just knocked off.
             return
 
-        self.boss.debug(doId=avId, content="Safe hit with impact=%.2f" % impact)
+        self.boss.activity.log(CraneLeagueGlobals.ACTIVITY_SAFE_HIT, avId, impact)
 
         if impact <= self.getMinImpact():
-            self.boss.d_updateLowImpactHits(avId)
+            self.boss.scores.addScore(
+                avId, self.boss.ruleset.POINTS_PENALTY_SANDBAG, CraneLeagueGlobals.SCORE_PENALTY_SANDBAG
+            )
             return
 
         # The client reports successfully striking the boss in the
@@ -100,11 +112,13 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
 
                 self.demand("Grabbed", self.boss.doId, self.boss.doId)
                 self.boss.heldObject = self
-                self.boss.d_updateSafePoints(avId, self.boss.ruleset.POINTS_PENALTY_SAFEHEAD)
+                self.boss.scores.addScore(
+                    avId, self.boss.ruleset.POINTS_PENALTY_SAFEHEAD, CraneLeagueGlobals.SCORE_PENALTY_SAFEHEAD
+                )
             self.updateBonus(-1)
 
         elif impact >= GeneralCFOGlobals.CashbotBossSafeKnockImpact:
-            self.boss.d_updateSafePoints(avId, self.boss.ruleset.POINTS_DESAFE)
+            self.boss.scores.addScore(avId, self.boss.ruleset.POINTS_DESAFE, CraneLeagueGlobals.SCORE_DESAFE)
             self.boss.heldObject.demand("Dropped", avId, self.boss.doId)
             self.boss.heldObject.avoidHelmet = 1
             self.boss.heldObject = None
@@ -133,7 +147,7 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
     def requestGrab(self):
         avId = self.air.getAvatarIdFromSender()
         if self.state not in ("Grabbed", "Off"):
-            craneId, objectId = self.__getCraneAndObject(avId)
+            craneId, objectId = self.boss.getCraneAndObject(avId)
             crane = simbase.air.doId2do.get(craneId)
             if crane and craneId != 0 and objectId == 0:
                 # If it is a sidecrane, dont pick up the safe
@@ -144,13 +158,6 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
                 return
             self.sendUpdateToAvatarId(avId, "rejectGrab", [])
 
-    def __getCraneAndObject(self, avId):
-        if self.boss and self.boss.cranes is not None:
-            for crane in self.boss.cranes:
-                if crane.avId == avId:
-                    return (crane.doId, crane.objectId)
-        return (0, 0)
-
     ### FSM States ###
 
     def enterGrabbed(self, avId, craneId):
@@ -166,12 +173,14 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
             # The special "helmet-only" safe goes away completely when
             # it's in Initial mode.
             self.stash()
+            self.updateObstacle()
 
         self.d_setObjectState("I", 0, 0)
 
     def exitInitial(self):
         if self.index == 0:
             self.unstash()
+            self.updateObstacle()
 
     def enterFree(self):
         # The safe is somewhere on the floor, but not under anyone's
@@ -188,5 +197,7 @@ class DistributedCashbotBossSafeAI(DistributedCashbotBossObjectAI.DistributedCas
     # Called from client when a safe destroys a goon
     def destroyedGoon(self, goonDmg):
         avId = self.air.getAvatarIdFromSender()
-        self.boss.d_updateGoonKilledBySafe(avId)
+        self.boss.scores.addScore(
+            avId, self.boss.ruleset.POINTS_GOON_KILLED_BY_SAFE, CraneLeagueGlobals.SCORE_GOON_KILLED_BY_SAFE
+        )
         self.updateBonus(goonDmg)
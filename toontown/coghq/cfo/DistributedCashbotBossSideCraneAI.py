@@ -1,12 +1,9 @@
-from direct.fsm import FSM
-
 from toontown.coghq.cfo import DistributedCashbotBossCraneAI
 
 
-class DistributedCashbotBossSideCraneAI(DistributedCashbotBossCraneAI.DistributedCashbotBossCraneAI, FSM.FSM):
+class DistributedCashbotBossSideCraneAI(DistributedCashbotBossCraneAI.DistributedCashbotBossCraneAI):
     def __init__(self, air, boss, index):
         DistributedCashbotBossCraneAI.DistributedCashbotBossCraneAI.__init__(self, air, boss, index)
-        FSM.FSM.__init__(self, "DistributedCashbotBossSideCraneAI")
 
     def getName(self):
         return "SideCrane-%s" % self.index
@@ -1,7 +1,6 @@
 from direct.interval.IntervalGlobal import *
 from panda3d.core import Point3
 
-from toontown.coghq.cfo import CraneLeagueGlobals
 from toontown.coghq.cfo.GeneralCFOGlobals import TreasureModels
 from toontown.world import DistributedTreasure
 
@@ -19,8 +18,27 @@ class DistributedCashbotBossTreasure(DistributedTreasure.DistributedTreasure):
                 self.loadModel(newModel)
             self.modelPath = newModel
 
+    def announceGenerate(self):
+        DistributedTreasure.DistributedTreasure.announceGenerate(self)
+        if not self.goonId:
+            self.hideTreasure()
+
+    def hideTreasure(self):
+        # With no goon, we're waiting in the boss's pool for one to
+        # drop us, and nobody should see us until then.
+        if self.treasureFlyTrack:
+            self.treasureFlyTrack.finish()
+            self.treasureFlyTrack = None
+        if self.nodePath:
+            self.nodePath.detachNode()
+            self.collNodePath.stash()
+
     def setGoonId(self, goonId):
         self.goonId = goonId
+        if not goonId:
+            self.hideTreasure()
+            return
+
         # lazy hacks xd set boss reference when we set goon id
         goon = self.cr.doId2do.get(goonId)
         if goon:
@@ -32,8 +50,10 @@ class DistributedCashbotBossTreasure(DistributedTreasure.DistributedTreasure):
         if self.treasureFlyTrack:
             self.treasureFlyTrack.finish()
             self.treasureFlyTrack = None
+        if not self.goonId:
+            return
         startPos = None
-        goon = self.cr.doId2do[self.goonId]
+        goon = self.cr.doId2do.get(self.goonId)
         if goon:
             startPos = goon.getPos()
         lerpTime = 1
@@ -48,7 +68,3 @@ class DistributedCashbotBossTreasure(DistributedTreasure.DistributedTreasure):
             Func(self.collNodePath.unstash),
         )
         self.treasureFlyTrack.start()
-
-    def deductScoreboardPoints(self, avId, amount):
-        if self.boss:
-            self.boss.scoreboard.addScore(avId, amount, CraneLeagueGlobals.PENALTY_TREASURE_TEXT)
@@ -1,11 +1,14 @@
+from toontown.coghq.cfo import CraneLeagueGlobals
 from toontown.world import DistributedTreasureAI
 
 
 class DistributedCashbotBossTreasureAI(DistributedTreasureAI.DistributedTreasureAI):
     def __init__(self, air, boss, goon, style, fx, fy, fz, healAmount):
-        pos = goon.getPos()
+        # With no goon, the treasure is made ahead of time, and waits
+        # (hidden) until the boss hands it to one; see makeTreasure().
+        pos = goon.getPos() if goon else (0, 0, 0)
         DistributedTreasureAI.DistributedTreasureAI.__init__(self, air, boss, pos[0], pos[1], 0)
-        self.goonId = goon.doId
+        self.goonId = goon.doId if goon else 0
         self.style = style
         self.finalPosition = (fx, fy, fz)
         self.healAmount = healAmount
@@ -65,8 +68,9 @@ class DistributedCashbotBossTreasureAI(DistributedTreasureAI.DistributedTreasure
                 boss = goon.boss
 
                 # Reset combo
-                if boss.ruleset.TREASURE_GRAB_RESETS_COMBO:
-                    boss.comboTrackers[avId].resetCombo()
+                comboTracker = boss.comboTrackers.get(avId)
+                if comboTracker and boss.ruleset.TREASURE_GRAB_RESETS_COMBO:
+                    comboTracker.resetCombo()
 
                 # Are we deducting points?
                 if boss.ruleset.TREASURE_POINT_PENALTY:
@@ -80,6 +84,6 @@ class DistributedCashbotBossTreasureAI(DistributedTreasureAI.DistributedTreasure
                     if boss.ruleset.TREASURE_POINT_PENALTY_FLAT_RATE > 0:
                         amount = boss.ruleset.TREASURE_POINT_PENALTY_FLAT_RATE
 
-                    self.sendUpdate("deductScoreboardPoints", [avId, -amount])
+                    boss.scores.addScore(avId, -amount, CraneLeagueGlobals.SCORE_PENALTY_TREASURE)
 
                 av.toonUp(self.healAmount)